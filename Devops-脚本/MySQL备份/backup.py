@@ -1,9 +1,24 @@
 import os
-from datetime import datetime, timedelta
+import sys
+from datetime import datetime
 import mysql.connector
 from mysql.connector import Error
 import config  # 导入配置文件
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backup_catalog import BackupCatalog
+
+# 备份索引与备份文件放在同一目录（当前工作目录）
+CATALOG_FILE = "backup_catalog.db"
+
+
+def record_backup(backup_type, backup_file):
+    """备份完成后登记到索引，清理时不再扫描目录"""
+    catalog = BackupCatalog(CATALOG_FILE)
+    catalog.record(config.MYSQL_CONFIG['database'], backup_type, os.path.abspath(backup_file),
+                   size=os.path.getsize(backup_file))
+    catalog.close()
+
 
 def full_backup():
     # 获取当前时间，用于备份文件命名
@@ -12,7 +27,13 @@ def full_backup():
 
     # 使用mysqldump命令进行完全备份
     command = f"mysqldump -h {config.MYSQL_CONFIG['host']} -u {config.MYSQL_CONFIG['user']} -p'{config.MYSQL_CONFIG['password']}' {config.MYSQL_CONFIG['database']} > {backup_file}"
-    os.system(command)
+    if os.system(command) != 0:
+        # mysqldump 失败时留下的是不完整的文件，不能登记为可用备份
+        print(f"完全备份失败，删除不完整的备份文件: {backup_file}")
+        if os.path.exists(backup_file):
+            os.remove(backup_file)
+        return None
+    record_backup('full', backup_file)
 
     print(f"完全备份完成，备份文件为: {backup_file}")
     return backup_file
@@ -27,7 +48,12 @@ def incremental_backup(last_position):
     command = f"mysqldump -h {config.MYSQL_CONFIG['host']} -u {config.MYSQL_CONFIG['user']} -p'{config.MYSQL_CONFIG['password']}' --single-transaction --master-data=2 --flush-logs {config.MYSQL_CONFIG['database']} > {backup_file}"
     if last_position is not None:
         command += f" --log-pos={last_position}"
-    os.system(command)
+    if os.system(command) != 0:
+        print(f"增量备份失败，删除不完整的备份文件: {backup_file}")
+        if os.path.exists(backup_file):
+            os.remove(backup_file)
+        return None, last_position
+    record_backup('inc', backup_file)
 
     # 获取新的二进制日志位置
     new_position = get_current_binlog_position()
@@ -58,36 +84,29 @@ def get_current_binlog_position():
 
 
 def cleanup_backups():
-    # 定义备份文件存储路径，这里假设与脚本在同一目录下
-    backup_dir = os.getcwd()
-    # 计算完全备份和增量备份的时间界限
-    full_cutoff_time = datetime.now() - timedelta(days=config.FULL_BACKUP_DAYS_TO_KEEP)
-    incremental_cutoff_time = datetime.now() - timedelta(days=config.INCREMENTAL_BACKUP_DAYS_TO_KEEP)
-
-    for filename in os.listdir(backup_dir):
-        file_path = os.path.join(backup_dir, filename)
-        try:
-            file_creation_time = datetime.fromtimestamp(os.path.getctime(file_path))
-        except OSError as e:
-            print(f"无法获取文件 {filename} 的创建时间: {e}")
-            continue
-
-        # 检查是否为完全备份文件并清理
-        if filename.startswith("full_backup_"):
-            if file_creation_time < full_cutoff_time:
-                os.remove(file_path)
-                print(f"已删除过期完全备份文件: {filename}")
-
-        # 检查是否为增量备份文件并清理
-        elif filename.startswith("incremental_backup_"):
-            if file_creation_time < incremental_cutoff_time:
-                os.remove(file_path)
-                print(f"已删除过期增量备份文件: {filename}")
+    catalog = BackupCatalog(CATALOG_FILE)
+    scope = config.MYSQL_CONFIG['database']
+    try:
+        # 首次使用索引时登记当前目录中已有的备份文件（只执行一次），之后只查询索引
+        catalog.import_directory(scope, os.getcwd(), {
+            'full': r'full_backup_.*\.sql$',
+            'inc': r'incremental_backup_.*\.sql$'
+        })
+        # 完全备份及依赖它的增量备份作为一条链整体过期，不会留下缺少基础备份的增量
+        expired = catalog.plan_age(scope, config.FULL_BACKUP_DAYS_TO_KEEP, config.INCREMENTAL_BACKUP_DAYS_TO_KEEP)
+        deleted, errors = catalog.delete(expired)
+        for error in errors:
+            print(f"删除过期备份失败: {error}")
+        print(f"已删除 {deleted} 个过期备份文件")
+    finally:
+        catalog.close()
 
 
 def main():
     # 执行完全备份
     full_backup_file = full_backup()
+    if full_backup_file is None:
+        return
 
     # 假设这是上次增量备份的位置
     last_position = get_current_binlog_position()
@@ -1,9 +1,16 @@
+import os
 import sys
 import configparser
 import subprocess
 from datetime import datetime
 from pathlib import Path
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backup_stream import stream_command
+from backup_catalog import BackupCatalog
+
+CATALOG_SCOPE = 'all-databases'
+
 
 def load_config():
     config = configparser.ConfigParser()
@@ -20,6 +27,10 @@ def setup_directories(config):
         sys.exit(1)
 
 
+def open_catalog(config):
+    return BackupCatalog(f"{config['backup']['full_backup_dir']}/catalog.db")
+
+
 def log_message(message, log_file):
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     log_entry = f"[{timestamp}] {message}\n"
@@ -30,7 +41,7 @@ def log_message(message, log_file):
 
 def perform_full_backup(config, log_file):
     timestamp = datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
-    backup_file = f"{config['backup']['full_backup_dir']}/full_backup_{timestamp}.sql"
+    backup_file = f"{config['backup']['full_backup_dir']}/full_backup_{timestamp}.sql.gz"
 
     cmd = [
         'mysqldump',
@@ -45,12 +56,13 @@ def perform_full_backup(config, log_file):
     ]
 
     try:
-        with open(backup_file, 'w') as f:
-            subprocess.run(cmd, stdout=f, stderr=subprocess.PIPE, check=True)
-
-        # Compress the backup file
-        subprocess.run(['gzip', backup_file], check=True)
-        log_message(f"备份完成: {backup_file}.gz", log_file)
+        # mysqldump 输出直接在进程内压缩写入 .gz，同时计算 SHA-256，完成后原子重命名
+        result = stream_command(cmd, backup_file)
+        catalog = open_catalog(config)
+        catalog.record(CATALOG_SCOPE, 'full', backup_file, result['bytes_out'], result['sha256'])
+        catalog.close()
+        log_message(f"备份完成: {backup_file} ({result['bytes_in']} -> {result['bytes_out']} 字节，"
+                    f"sha256 {result['sha256']}，耗时 {result['elapsed']} 秒)", log_file)
         return True
     except subprocess.CalledProcessError as e:
         log_message(f"错误：备份失败 - {e.stderr.decode().strip()}", log_file)
@@ -58,27 +70,19 @@ def perform_full_backup(config, log_file):
 
 
 def cleanup_old_backups(config, log_file):
-    backup_dir = config['backup']['full_backup_dir']
-    retention_days = config['backup']['full_backup_retention_days']
-
-    find_cmd = [
-        'find',
-        backup_dir,
-        '-name',
-        'full_backup_*.sql.gz',
-        '-mtime',
-        f"+{retention_days}",
-        '-exec',
-        'rm',
-        '{}',
-        ';'
-    ]
-
+    retention_days = config.getint('backup', 'full_backup_retention_days')
+    catalog = open_catalog(config)
     try:
-        subprocess.run(find_cmd, stderr=subprocess.PIPE, check=True)
-        log_message(f"已清理超过{retention_days}天的旧完全备份", log_file)
-    except subprocess.CalledProcessError as e:
-        log_message(f"清理旧备份时出错: {e.stderr.decode().strip()}", log_file)
+        # 首次使用索引时登记已有的备份（只执行一次），之后只查询索引，不再 find 整个目录
+        catalog.import_directory(CATALOG_SCOPE, config['backup']['full_backup_dir'], {
+            'full': r'full_backup_\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.sql\.gz$'
+        })
+        deleted, errors = catalog.delete(catalog.plan_age(CATALOG_SCOPE, retention_days))
+        for error in errors:
+            log_message(f"清理旧备份时出错: {error}", log_file)
+        log_message(f"已清理 {deleted} 个超过{retention_days}天的旧完全备份", log_file)
+    finally:
+        catalog.close()
 
 
 def main():
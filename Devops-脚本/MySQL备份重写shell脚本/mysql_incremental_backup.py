@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import argparse
 import os
 import sys
 import configparser
@@ -6,6 +7,9 @@ import subprocess
 from datetime import datetime
 from pathlib import Path
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from binlog_follower import BinlogFollower
+
 
 def load_config():
     config = configparser.ConfigParser()
@@ -133,11 +137,34 @@ def cleanup_old_incremental_backups(config, log_file):
         log_message(f"清理旧增量备份时出错: {e.stderr.strip()}", log_file)
 
 
+def follow_binary_logs(config, log_file):
+    """常驻模式：以从库身份持续拉取 binlog 并按大小/时间切分压缩，不再定时 FLUSH LOGS"""
+    follower = BinlogFollower(
+        config['mysql']['host'], config['mysql']['port'],
+        config['mysql']['user'], config['mysql']['password'],
+        f"{config['backup']['incremental_backup_dir']}/binlog",
+        segment_bytes=config.getint('backup', 'binlog_segment_mb', fallback=64) * 1024 * 1024,
+        segment_seconds=config.getint('backup', 'binlog_segment_seconds', fallback=300)
+    )
+    log_message("开始持续归档二进制日志", log_file)
+    try:
+        follower.run()
+    except KeyboardInterrupt:
+        log_message("二进制日志归档已停止", log_file)
+
+
 def main():
+    parser = argparse.ArgumentParser(description='MySQL 增量备份')
+    parser.add_argument('--follow', action='store_true', help='常驻运行，持续归档二进制日志')
+    args = parser.parse_args()
+
     config = load_config()
     log_file = f"{config['backup']['log_dir']}/mysql_incrbackup.log"
 
     setup_directories(config)
+    if args.follow:
+        follow_binary_logs(config, log_file)
+        return
     log_message("开始增量备份", log_file)
 
     backup_count = backup_binary_logs(config, log_file)
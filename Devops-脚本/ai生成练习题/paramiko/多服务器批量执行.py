@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from ssh_pool import SSHSessionPool
+
+
+def batch_execute(hosts, username, commands, key_filename="~/.ssh/id_rsa"):
+    # 每台服务器只认证一次，多条命令在同一连接的不同 channel 上并发执行
+    with SSHSessionPool(username=username, key_filename=key_filename,
+                        max_workers=20, max_per_host=4) as pool:
+        for result in pool.run(hosts, commands, timeout=30):
+            if result['error']:
+                print(f"[{result['host']}] {result['command']}: ERROR - {result['error']}")
+            else:
+                print(f"[{result['host']}] {result['command']} ({result['elapsed']}s):\n{result['stdout']}")
+
+
+if __name__ == '__main__':
+    batch_execute([f"192.168.1.{i}" for i in range(100, 105)], "root", ["uptime", "df -h", "free -m"])
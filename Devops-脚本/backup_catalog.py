@@ -0,0 +1,195 @@
+import os
+import re
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+
+class BackupCatalog:
+    """
+    备份目录索引（SQLite）
+    每次备份完成时登记类型、大小、校验和、时间和依赖链（全量 -> 增量）；
+    保留策略直接在索引上计算，清理时只删除过期条目对应的文件，不再遍历和 stat 备份目录
+    """
+
+    def __init__(self, db_file):
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS backups (
+                         id INTEGER PRIMARY KEY,
+                         scope TEXT,
+                         type TEXT,
+                         path TEXT UNIQUE,
+                         size INTEGER,
+                         sha256 TEXT,
+                         created REAL,
+                         parent INTEGER,
+                         chain INTEGER)''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_backups_scope ON backups (scope, type, created)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_backups_chain ON backups (chain)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+
+    def latest(self, scope, backup_type=None, before=None):
+        """返回某个备份集最新的一条记录（可按类型过滤，或只看 before 时间之前的）"""
+        row = self.conn.execute(
+            "SELECT id, chain, path FROM backups WHERE scope = ? AND type = COALESCE(?, type) AND created <= ? "
+            "ORDER BY created DESC, id DESC LIMIT 1",
+            (scope, backup_type, float('inf') if before is None else before)).fetchone()
+        return {'id': row[0], 'chain': row[1], 'path': row[2]} if row else None
+
+    def record(self, scope, backup_type, path, size=None, sha256=None, created=None, parent=None):
+        """
+        登记一个备份，返回其 id
+        全量备份自成一条链；增量备份默认挂在同一备份集中在它之前的最近一个备份之后，没有全量备份时不属于任何链
+        """
+        created = created or time.time()
+        chain = None
+        if backup_type != 'full':
+            previous = {'id': parent, 'chain': self._chain_of(parent)} if parent else self.latest(scope, before=created)
+            if previous:
+                parent, chain = previous['id'], previous['chain']
+        with self.conn:
+            # 同一路径重复登记（重试、重新导入）时原地更新，保留 id，已挂在它后面的增量仍在同一条链上
+            self.conn.execute(
+                "INSERT INTO backups (scope, type, path, size, sha256, created, parent, chain) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET scope = excluded.scope, type = excluded.type, "
+                "size = excluded.size, sha256 = excluded.sha256, created = excluded.created, "
+                "parent = excluded.parent, chain = excluded.chain",
+                (scope, backup_type, path, size, sha256, created, parent, chain))
+            backup_id = self.conn.execute("SELECT id FROM backups WHERE path = ?", (path,)).fetchone()[0]
+            if backup_type == 'full':
+                self.conn.execute("UPDATE backups SET chain = id WHERE id = ?", (backup_id,))
+        return backup_id
+
+    def _chain_of(self, backup_id):
+        row = self.conn.execute("SELECT chain FROM backups WHERE id = ?", (backup_id,)).fetchone()
+        return row[0] if row else None
+
+    def import_directory(self, scope, directory, patterns):
+        """
+        登记启用索引之前已有的备份文件：每个 (备份集, 目录) 只遍历一次，完成后在 state 表中记录标记，
+        之后调用直接返回 0；已登记过的路径（如本次刚完成的备份）保持不变
+        patterns: {类型: 文件名正则}，按修改时间顺序登记，增量备份自动挂到之前最近的全量备份链上
+        """
+        marker = f"imported:{scope}:{os.path.abspath(directory)}"
+        if self.conn.execute("SELECT 1 FROM state WHERE key = ?", (marker,)).fetchone():
+            return 0
+        found = []
+        if os.path.isdir(directory):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    for backup_type, pattern in patterns.items():
+                        if re.match(pattern, entry.name):
+                            st = entry.stat()
+                            size = st.st_size if entry.is_file() else None
+                            found.append((st.st_mtime, backup_type, entry.path, size))
+                            break
+        known = {row[0] for row in self.conn.execute("SELECT path FROM backups WHERE scope = ?", (scope,))}
+        found = [item for item in sorted(found) if item[2] not in known]
+        for mtime, backup_type, path, size in found:
+            self.record(scope, backup_type, path, size=size, created=mtime)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (marker, str(time.time())))
+        return len(found)
+
+    def _chains(self, scope):
+        """按时间从新到旧返回 [(链 id, 全量备份时间, 链内最新备份时间)]，孤立的增量备份链 id 为 None"""
+        return self.conn.execute(
+            "SELECT chain, MIN(CASE WHEN type = 'full' THEN created END), MAX(created) FROM backups "
+            "WHERE scope = ? GROUP BY chain ORDER BY MAX(created) DESC", (scope,)).fetchall()
+
+    def _members(self, scope, chains):
+        """返回若干条链的全部备份，增量在前，保证先删依赖方"""
+        rows = []
+        for chain in chains:
+            rows.extend(self.conn.execute(
+                "SELECT id, path FROM backups WHERE scope = ? AND chain IS ? ORDER BY created DESC, id DESC",
+                (scope, chain)))
+        return rows
+
+    def plan_age(self, scope, full_days, inc_days=None, now=None):
+        """
+        按时间保留：全量备份超过 full_days 天、且链内最后一个增量也超过 inc_days 天时，整条链过期；
+        不会单独删除链中间的备份，避免留下无法恢复的增量
+        """
+        now = now or datetime.now()
+        full_cutoff = (now - timedelta(days=full_days)).timestamp()
+        inc_cutoff = (now - timedelta(days=full_days if inc_days is None else inc_days)).timestamp()
+        newest = self.latest(scope, 'full')
+        expired = []
+        for chain, full_time, last_time in self._chains(scope):
+            if newest and chain == newest['chain']:
+                # 最新的一条全量链始终保留
+                continue
+            if (full_time is None or full_time < full_cutoff) and last_time < inc_cutoff:
+                expired.append(chain)
+        return self._members(scope, expired)
+
+    def plan_keep_full(self, scope, keep):
+        """保留最新的 keep 个全量备份及其增量，其余链（以及早于所有全量备份的孤立增量）全部过期"""
+        chains = [chain for chain, full_time, _ in sorted(self._chains(scope), key=lambda row: row[1] or 0)
+                  if full_time is not None]
+        expired = chains[:-keep] if keep else chains
+        if chains and keep:
+            expired.append(None)
+        return self._members(scope, expired)
+
+    def plan_gfs(self, scope, daily=7, weekly=4, monthly=12, now=None):
+        """
+        祖父-父-子（GFS）保留：最近 daily 天每天、最近 weekly 周每周、最近 monthly 个月每月
+        各保留最新的一个全量备份（连同其增量链），其余链及孤立增量过期
+        """
+        now = now or datetime.now()
+        fulls = self.conn.execute(
+            "SELECT chain, created FROM backups WHERE scope = ? AND type = 'full' ORDER BY created DESC",
+            (scope,)).fetchall()
+        # 把时间映射为递增的天/周/月序号，保留最近 count 个序号中每个序号最新的一个
+        buckets = [
+            (daily, lambda t: t.toordinal()),
+            (weekly, lambda t: (t.toordinal() - 1) // 7),
+            (monthly, lambda t: t.year * 12 + t.month - 1),
+        ]
+        keep = {fulls[0][0]} if fulls else set()
+        for count, bucket_of in buckets:
+            oldest = bucket_of(now) - count
+            seen = set()
+            for chain, created in fulls:
+                bucket = bucket_of(datetime.fromtimestamp(created))
+                if bucket > oldest and bucket not in seen:
+                    seen.add(bucket)
+                    keep.add(chain)
+        expired = [chain for chain, _ in fulls if chain not in keep]
+        if fulls:
+            expired.append(None)
+        return self._members(scope, expired)
+
+    def delete(self, rows, remove_files=True):
+        """批量删除计划中的备份文件（含 .sha256 校验文件）并在一个事务中移除索引记录，返回 (删除数, 错误列表)"""
+        deleted, errors = [], []
+        for backup_id, path in rows:
+            if remove_files:
+                try:
+                    if os.path.isdir(path):
+                        # 并行备份是一个目录
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    errors.append(f"{path}: {e}")
+                    continue
+                try:
+                    os.remove(path + '.sha256')
+                except FileNotFoundError:
+                    pass
+            deleted.append((backup_id,))
+        with self.conn:
+            self.conn.executemany("DELETE FROM backups WHERE id = ?", deleted)
+        return len(deleted), errors
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,315 @@
+import argparse
+import hashlib
+import os
+import struct
+import subprocess
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    # zstd 为可选压缩方式，未安装时只能使用 gzip
+    zstandard = None
+
+
+class LocalSink:
+    """写入本地文件：先写 .part 临时文件，完成后 fsync 并原子重命名"""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + '.part'
+        self.file = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.file = open(self.tmp_path, 'wb')
+
+    def write(self, data):
+        self.file.write(data)
+
+    def commit(self, checksum):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        with open(self.path + '.sha256', 'w') as f:
+            f.write(f"{checksum}  {os.path.basename(self.path)}\n")
+
+    def abort(self):
+        if self.file:
+            self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class SFTPSink:
+    """直接写到远程服务器（paramiko SFTPClient），流水线写入，完成后在远程原子重命名"""
+
+    def __init__(self, sftp, remote_path):
+        self.sftp = sftp
+        self.path = remote_path
+        self.tmp_path = remote_path + '.part'
+        self.file = None
+
+    def open(self):
+        self.file = self.sftp.open(self.tmp_path, 'wb')
+        self.file.set_pipelined(True)
+
+    def write(self, data):
+        self.file.write(data)
+
+    def commit(self, checksum):
+        self.file.close()
+        self.sftp.posix_rename(self.tmp_path, self.path)
+        with self.sftp.open(self.path + '.sha256', 'w') as f:
+            f.write(f"{checksum}  {os.path.basename(self.path)}\n")
+
+    def abort(self):
+        if self.file:
+            self.file.close()
+        try:
+            self.sftp.remove(self.tmp_path)
+        except IOError:
+            pass
+
+
+# 压缩方式对应的文件后缀
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst', 'none': ''}
+
+
+class ParallelGzipCompressor:
+    """
+    多线程 gzip（与 pigz 相同的做法）
+    输入按块切分，各块在线程池中独立压缩为以 Z_SYNC_FLUSH 结尾的 raw deflate 数据，
+    并以前一块末尾 32KB 作为预设字典，压缩率接近单线程；各块按顺序拼接后加上 gzip 头尾，
+    输出是标准的 gzip 文件。zlib 压缩时释放 GIL，所以线程可以占满多个核心
+    """
+
+    def __init__(self, level=6, workers=None, block_size=1024 * 1024):
+        self.level = level
+        self.workers = workers or os.cpu_count() or 1
+        self.block_size = block_size
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.dictionary = b''
+        self.crc = 0
+        self.size = 0
+        self.header_written = False
+
+    def _compress_block(self, block, dictionary):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15, zlib.DEF_MEM_LEVEL,
+                                      zlib.Z_DEFAULT_STRATEGY, *([dictionary] if dictionary else []))
+        return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def _submit(self, block):
+        self.crc = zlib.crc32(block, self.crc)
+        self.size += len(block)
+        self.pending.append(self.executor.submit(self._compress_block, block, self.dictionary))
+        self.dictionary = block[-32768:]
+
+    def _collect(self, wait_all=False):
+        """按提交顺序取回已完成的块；同时在压缩的块数限制为线程数的两倍，控制内存占用"""
+        output = []
+        if not self.header_written:
+            # gzip 头：魔数、deflate、无标志、mtime=0、XFL=0、OS=255（未知）
+            output.append(b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff')
+            self.header_written = True
+        while self.pending and (wait_all or self.pending[0].done() or len(self.pending) > self.workers * 2):
+            output.append(self.pending.popleft().result())
+        return b''.join(output)
+
+    def compress(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self._submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return self._collect()
+
+    def flush(self):
+        if self.buffer:
+            self._submit(bytes(self.buffer))
+            self.buffer = bytearray()
+        output = self._collect(wait_all=True)
+        self.shutdown()
+        # 以一个空的最终块结束 deflate 流，然后写入 CRC32 和原始长度
+        final = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        return output + final.flush(zlib.Z_FINISH) + struct.pack('<II', self.crc, self.size & 0xffffffff)
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class _NoCompressor:
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+def get_compressor(method='gzip', level=6, workers=1):
+    """
+    返回具有 compress(data) / flush() 接口的压缩器
+    :param method: gzip / zstd / none
+    :param workers: gzip 大于 1 时使用多线程分块压缩，zstd 使用自带的多线程模式
+    """
+    workers = workers or 1
+    if method == 'gzip':
+        if workers > 1:
+            return ParallelGzipCompressor(level, workers)
+        # gzip 格式（wbits=31），输出可直接用 gunzip / zcat 解压
+        return zlib.compressobj(level, zlib.DEFLATED, 31)
+    if method == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor(level=level, threads=workers if workers > 1 else 0).compressobj()
+    if method == 'none':
+        return _NoCompressor()
+    raise ValueError(f"Unknown compression method: {method}")
+
+
+class CompressedWriter:
+    """
+    类文件对象：写入的数据经压缩后写入 sink，同时计算压缩后数据的 SHA-256
+    可直接交给 tarfile.open(fileobj=..., mode='w|') 之类的流式写入方
+    """
+
+    def __init__(self, sink, method='gzip', level=6, workers=1):
+        if isinstance(sink, str):
+            sink = LocalSink(sink)
+        self.sink = sink
+        self.compressor = get_compressor(method, level, workers)
+        self.sha256 = hashlib.sha256()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.sink.open()
+
+    def _emit(self, data):
+        if data:
+            self.sha256.update(data)
+            self.sink.write(data)
+            self.bytes_out += len(data)
+
+    def write(self, data):
+        self.bytes_in += len(data)
+        self._emit(self.compressor.compress(data))
+        return len(data)
+
+    def close(self):
+        """写完压缩尾部并提交（原子重命名），返回 SHA-256"""
+        self._emit(self.compressor.flush())
+        self.sink.commit(self.sha256.hexdigest())
+        return self.sha256.hexdigest()
+
+    def abort(self):
+        if hasattr(self.compressor, 'shutdown'):
+            self.compressor.shutdown()
+        self.sink.abort()
+
+
+@contextmanager
+def command_output(command):
+    """
+    启动命令并返回其标准输出管道，stderr 在单独的线程中读取，避免错误输出写满管道导致命令阻塞
+    with 块正常结束后等待命令退出，返回非 0 时抛出带 stderr 的 CalledProcessError；with 块内出错时结束命令
+    """
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+    try:
+        yield process.stdout
+    except BaseException:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        stderr_reader.join()
+        raise
+    returncode = process.wait()
+    stderr_reader.join()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, stderr=b''.join(stderr_chunks))
+
+
+def stream_command(command, sink, compress=True, level=6, chunk_size=1024 * 1024, method='gzip', workers=1):
+    """
+    把命令的标准输出边读边压缩写入 sink，同时计算写入数据的 SHA-256，不产生未压缩的临时文件
+    :param command: 命令参数列表，如 mysqldump ...
+    :param sink: LocalSink / SFTPSink，或本地文件路径
+    :param method: 压缩方式 gzip / zstd，compress=False 时不压缩
+    :param workers: 压缩线程数
+    :return: {'path', 'bytes_in', 'bytes_out', 'sha256', 'elapsed'}
+    :raises subprocess.CalledProcessError: 命令返回非 0，此时不会留下不完整的备份文件
+    """
+    start = time.monotonic()
+    writer = None
+    try:
+        with command_output(command) as stdout:
+            writer = CompressedWriter(sink, method if compress else 'none', level, workers)
+            while True:
+                chunk = stdout.read(chunk_size)
+                if not chunk:
+                    break
+                writer.write(chunk)
+        checksum = writer.close()
+    except BaseException:
+        if writer:
+            writer.abort()
+        raise
+
+    return {
+        'path': writer.sink.path,
+        'bytes_in': writer.bytes_in,
+        'bytes_out': writer.bytes_out,
+        'sha256': checksum,
+        'elapsed': round(time.monotonic() - start, 2)
+    }
+
+
+def benchmark(path, level=6, workers=None, chunk_size=1024 * 1024):
+    """对同一个文件比较单线程 gzip、多线程 gzip 和 zstd 的耗时与压缩率"""
+    workers = workers or os.cpu_count() or 1
+    cases = [('gzip', 1), ('gzip', workers)]
+    if zstandard is not None:
+        cases += [('zstd', 1), ('zstd', workers)]
+
+    results = []
+    for method, threads in cases:
+        compressor = get_compressor(method, level, threads)
+        size_in = size_out = 0
+        start = time.monotonic()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                size_in += len(chunk)
+                size_out += len(compressor.compress(chunk))
+        size_out += len(compressor.flush())
+        elapsed = time.monotonic() - start
+        results.append({
+            'method': method,
+            'workers': threads,
+            'seconds': round(elapsed, 2),
+            'mb_per_second': round(size_in / 1048576 / elapsed, 1) if elapsed else 0,
+            'ratio': round(size_in / size_out, 2) if size_out else 0
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='备份压缩方式基准测试')
+    parser.add_argument('file', help='用于测试的文件，如一份未压缩的 mysqldump 输出')
+    parser.add_argument('--level', type=int, default=6, help='压缩级别')
+    parser.add_argument('--workers', type=int, default=None, help='线程数，默认 CPU 核心数')
+    args = parser.parse_args()
+
+    print(f"{'方式':<8}{'线程':>6}{'耗时(s)':>10}{'MB/s':>10}{'压缩率':>8}")
+    for row in benchmark(args.file, args.level, args.workers):
+        print(f"{row['method']:<8}{row['workers']:>6}{row['seconds']:>10}{row['mb_per_second']:>10}{row['ratio']:>8}")
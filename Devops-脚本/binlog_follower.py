@@ -0,0 +1,270 @@
+import os
+import sqlite3
+import struct
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+import pymysql
+
+from backup_stream import SUFFIXES, CompressedWriter
+from mysql_parallel import open_compressed
+
+BINLOG_MAGIC = b'\xfebin'
+# v4 事件头：timestamp(4) type(1) server_id(4) event_size(4) log_pos(4) flags(2)
+EVENT_HEADER = struct.Struct('<IBIII')
+HEADER_SIZE = 19
+STOP_EVENT = 3
+ROTATE_EVENT = 4
+
+
+class SegmentCatalog:
+    """
+    binlog 分段索引（SQLite）
+    每个压缩分段记录它覆盖的 binlog 文件、字节范围和事件时间范围；同步位置与分段在同一个事务中提交
+    """
+
+    def __init__(self, db_file):
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS segments (
+                         binlog TEXT,
+                         start_pos INTEGER,
+                         end_pos INTEGER,
+                         first_ts INTEGER,
+                         last_ts INTEGER,
+                         file TEXT,
+                         sha256 TEXT,
+                         PRIMARY KEY (binlog, start_pos))''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_segments_ts ON segments (last_ts)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+
+    def position(self):
+        """上次归档到的 (binlog 文件, 偏移)"""
+        rows = dict(self.conn.execute("SELECT key, value FROM state"))
+        if 'binlog' not in rows:
+            return None, 0
+        return rows['binlog'], int(rows['offset'])
+
+    def set_position(self, binlog, offset):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                                  [('binlog', binlog), ('offset', str(offset))])
+
+    def add(self, segment, binlog, offset):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO segments (binlog, start_pos, end_pos, first_ts, last_ts, file, sha256) "
+                "VALUES (:binlog, :start_pos, :end_pos, :first_ts, :last_ts, :file, :sha256)", segment)
+            self.conn.executemany("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                                  [('binlog', binlog), ('offset', str(offset))])
+
+    def locate(self, target_time, start_binlog=None, start_pos=4):
+        """
+        时间点恢复查找：返回从全量备份位置 (start_binlog, start_pos) 恢复到 target_time 所需的分段
+        起始 binlog 的分段总是从文件头开始返回，因为回放需要文件开头的格式描述事件
+        """
+        target = int(target_time.timestamp()) if isinstance(target_time, datetime) else int(target_time)
+        rows = self.conn.execute(
+            "SELECT binlog, start_pos, end_pos, first_ts, last_ts, file, sha256 FROM segments "
+            "WHERE binlog >= COALESCE(?, '') ORDER BY binlog, start_pos", (start_binlog,)).fetchall()
+        keys = ('binlog', 'start_pos', 'end_pos', 'first_ts', 'last_ts', 'file', 'sha256')
+        segments = []
+        for row in rows:
+            segment = dict(zip(keys, row))
+            if segment['first_ts'] > target and segments:
+                break
+            segments.append(segment)
+        if not segments or segments[-1]['last_ts'] < target:
+            covered = segments[-1]['last_ts'] if segments else None
+            raise LookupError(f"Binlog archive does not reach {target_time} (last event at {covered})")
+        return {
+            'start_binlog': start_binlog or segments[0]['binlog'],
+            'start_pos': start_pos,
+            'stop_datetime': datetime.fromtimestamp(target).strftime('%Y-%m-%d %H:%M:%S'),
+            'segments': segments
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+class BinlogFollower:
+    """
+    binlog 持续归档守护进程
+    mysqlbinlog --read-from-remote-server --raw --stop-never 以从库身份持续把 binlog 写入本地缓冲目录，
+    本进程按事件边界读取新写入的完整事件，压缩成分段文件，按大小或时间切换分段并在索引中记录位置；
+    不需要周期性 FLUSH BINARY LOGS，重启后从索引中记录的位置继续
+    """
+
+    def __init__(self, host, port, user, password, archive_dir, segment_bytes=64 * 1024 * 1024,
+                 segment_seconds=300, method='gzip', level=6, server_id=65535, poll_interval=1.0):
+        self.mysql_args = [f'--host={host}', f'--port={port}', f'--user={user}', f'--password={password}']
+        self.conn_args = {'host': host, 'port': int(port), 'user': user, 'password': password}
+        self.archive_dir = archive_dir
+        self.spool_dir = os.path.join(archive_dir, 'spool')
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.method = method
+        self.level = level
+        self.server_id = server_id
+        self.poll_interval = poll_interval
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.catalog = SegmentCatalog(os.path.join(archive_dir, 'segments.db'))
+        self.process = None
+        self.stopped = threading.Event()
+        self.segment = None
+        # 已读到 ROTATE/STOP 事件、等待下一个 binlog 文件出现
+        self.rotation_pending = False
+        self.reader_log = os.path.join(archive_dir, 'mysqlbinlog.log')
+
+    def _current_binlog(self):
+        """没有归档记录时从主库当前的 binlog 开始"""
+        conn = pymysql.connect(**self.conn_args)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SHOW MASTER STATUS")
+                row = cursor.fetchone()
+                if not row:
+                    raise RuntimeError("Binary logging is not enabled on the server")
+                return row[0]
+        finally:
+            conn.close()
+
+    def _start_reader(self, binlog):
+        """raw 模式下 mysqlbinlog 从文件头开始写，已归档的部分由本进程跳过"""
+        command = ['mysqlbinlog', '--read-from-remote-server', '--raw', '--stop-never',
+                   f'--stop-never-slave-server-id={self.server_id}',
+                   f'--result-file={self.spool_dir}/', *self.mysql_args, binlog]
+        # stderr 写入日志文件，长期运行时不会因管道写满而阻塞 mysqlbinlog
+        with open(self.reader_log, 'ab') as log:
+            self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=log)
+
+    def _open_segment(self, binlog, offset, timestamp):
+        name = f"{binlog}.{offset:012d}{SUFFIXES[self.method]}"
+        self.segment = {
+            'writer': CompressedWriter(os.path.join(self.archive_dir, name), self.method, self.level),
+            'binlog': binlog, 'start_pos': offset, 'end_pos': offset,
+            'first_ts': timestamp, 'last_ts': timestamp, 'file': name,
+            'opened': time.monotonic(), 'size': 0
+        }
+
+    def _close_segment(self):
+        segment, self.segment = self.segment, None
+        if segment is None:
+            return
+        segment['sha256'] = segment.pop('writer').close()
+        segment.pop('opened')
+        segment.pop('size')
+        self.catalog.add(segment, segment['binlog'], segment['end_pos'])
+
+    def _archive(self, binlog, offset):
+        """把 spool 中 binlog 文件从 offset 起的完整事件写入分段，返回新的偏移；遇到文件切换时置 rotation_pending"""
+        path = os.path.join(self.spool_dir, binlog)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            if offset == 0:
+                magic = f.read(4)
+                if len(magic) < 4:
+                    return offset
+                if magic != BINLOG_MAGIC:
+                    raise ValueError(f"{path} is not a binlog file")
+            while True:
+                header = f.read(HEADER_SIZE)
+                if len(header) < HEADER_SIZE:
+                    break
+                timestamp, event_type, _, event_size, _ = EVENT_HEADER.unpack_from(header)
+                body = f.read(event_size - HEADER_SIZE)
+                if len(body) < event_size - HEADER_SIZE:
+                    # 事件尚未写完，下一轮再读
+                    break
+
+                if self.segment is None:
+                    self._open_segment(binlog, offset, timestamp)
+                if offset == 0:
+                    self.segment['writer'].write(BINLOG_MAGIC)
+                    offset = 4
+                self.segment['writer'].write(header + body)
+                offset += event_size
+                self.segment['size'] += event_size
+                self.segment['end_pos'] = offset
+                # 格式描述等事件的时间戳可能为 0，不计入时间范围
+                if timestamp:
+                    self.segment['first_ts'] = self.segment['first_ts'] or timestamp
+                    self.segment['last_ts'] = timestamp
+                # 文件末尾的 ROTATE（或主库停止时的 STOP）事件表示该文件不会再增长
+                if event_type in (ROTATE_EVENT, STOP_EVENT) and timestamp:
+                    self.rotation_pending = True
+                if self.segment['size'] >= self.segment_bytes:
+                    self._close_segment()
+        return offset
+
+    def _next_binlog(self, binlog):
+        later = sorted(name for name in os.listdir(self.spool_dir) if name > binlog and '.' in name)
+        return later[0] if later else None
+
+    def run(self):
+        binlog, offset = self.catalog.position()
+        binlog = binlog or self._current_binlog()
+        self._start_reader(binlog)
+        print(f"开始归档 binlog: {binlog} 偏移 {offset}")
+
+        try:
+            while not self.stopped.is_set():
+                if self.process.poll() is not None:
+                    print(f"mysqlbinlog 退出 ({self.process.returncode})，详见 {self.reader_log}，5 秒后重连")
+                    self._close_segment()
+                    time.sleep(5)
+                    self._start_reader(binlog)
+
+                if os.path.exists(os.path.join(self.spool_dir, binlog)):
+                    offset = self._archive(binlog, offset)
+                # 切换事件可能早于下一个文件出现，标记保留到下一个文件被创建为止；
+                # 重启后切换事件已在偏移之前，此时下一个文件存在且当前文件已读完同样表示该文件结束
+                next_binlog = self._next_binlog(binlog)
+                path = os.path.join(self.spool_dir, binlog)
+                finished = self.rotation_pending or (os.path.exists(path) and offset >= os.path.getsize(path) > 0)
+                if next_binlog and finished:
+                    # 当前文件已结束：提交最后一个分段并删除缓冲文件
+                    self._close_segment()
+                    os.remove(path)
+                    binlog, offset = next_binlog, 0
+                    self.rotation_pending = False
+                    self.catalog.set_position(binlog, offset)
+                    continue
+
+                if self.segment and time.monotonic() - self.segment['opened'] >= self.segment_seconds:
+                    self._close_segment()
+                self.stopped.wait(self.poll_interval)
+        finally:
+            self._close_segment()
+            if self.process and self.process.poll() is None:
+                self.process.terminate()
+                self.process.wait()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def restore_binlogs(archive_dir, plan, output_dir):
+    """
+    把 locate() 返回的分段解压拼接回原始 binlog 文件，返回回放命令
+    用法：mysqlbinlog <返回的参数> | mysql -u root -p
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    files = []
+    for segment in plan['segments']:
+        path = os.path.join(output_dir, segment['binlog'])
+        if path not in files:
+            files.append(path)
+            open(path, 'wb').close()
+        with open(path, 'ab') as out, open_compressed(os.path.join(archive_dir, segment['file'])) as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                out.write(chunk)
+    return ['mysqlbinlog', f"--start-position={plan['start_pos']}",
+            f"--stop-datetime={plan['stop_datetime']}", *files]
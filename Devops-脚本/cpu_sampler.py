@@ -0,0 +1,149 @@
+import logging
+import os
+import threading
+import time
+
+import psutil
+
+from proc_table import ProcessTable
+
+logger = logging.getLogger(__name__)
+
+
+class CpuSampler(threading.Thread):
+    """
+    后台 CPU 采样线程
+    定期读取 /proc/stat 和进程表快照，用相邻两次读数的差值计算整机、每个核心和每个进程的 CPU 使用率，
+    调用方随时读取最近一次结果，不再需要 cpu_percent(interval=1) 这种阻塞等待
+    没有 /proc 的系统（如 Windows）退回到 psutil 的 cpu_times 计数器，计算方式相同
+    """
+
+    def __init__(self, interval=1.0, track_processes=True):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.track_processes = track_processes
+        self.use_proc = os.path.exists('/proc/stat')
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.host = 0.0
+        self.cores = []
+        self.processes = {}
+        self.table = None
+        self._last = None
+
+    @staticmethod
+    def _busy_total(fields):
+        """user nice system idle iowait irq softirq steal，guest 已计入 user"""
+        values = [int(value) for value in fields[:8]]
+        idle = values[3] + values[4]
+        total = sum(values)
+        return total - idle, total
+
+    def _read_host(self):
+        """返回 [整机, cpu0, cpu1, ...] 的 (busy, total) 计数"""
+        if not self.use_proc:
+            times = [psutil.cpu_times()] + psutil.cpu_times(percpu=True)
+            return [(sum(t) - t.idle, sum(t)) for t in times]
+        counters = []
+        with open('/proc/stat') as f:
+            for line in f:
+                if not line.startswith('cpu'):
+                    break
+                counters.append(self._busy_total(line.split()[1:]))
+        return counters
+
+    def sample(self):
+        """读取一次计数器，与上一次读数比较并更新结果"""
+        host = self._read_host()
+        # 进程表由 ProcessTable 一次遍历读取
+        table = ProcessTable.scan() if self.track_processes else None
+
+        if self._last is not None:
+            last_host, last_table = self._last
+            usage = []
+            for (busy, total), (last_busy, last_total) in zip(host, last_host):
+                delta = total - last_total
+                usage.append(round(100.0 * (busy - last_busy) / delta, 1) if delta > 0 else 0.0)
+
+            process_usage = {}
+            if table is not None and last_table is not None:
+                # 新出现的进程没有上一次读数，从下一轮开始计算；pid 被复用的进程由 cpu_percent 排除
+                for pid, percent in table.cpu_percent(last_table).items():
+                    process_usage[pid] = (table.names[table.by_pid[pid]], percent)
+
+            with self.lock:
+                self.host = usage[0] if usage else 0.0
+                self.cores = usage[1:]
+                self.processes = process_usage
+                self.table = table
+            self.ready.set()
+
+        self._last = (host, table)
+
+    def run(self):
+        # 基线读数在 start() 之前由 get_sampler 完成，这里先等一个周期再计算差值
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"CPU 采样失败: {e}")
+
+    def wait_ready(self, timeout=None):
+        """进程刚启动时需要等待第一个采样周期才有差值"""
+        return self.ready.wait(timeout)
+
+    def host_percent(self):
+        self.wait_ready()
+        with self.lock:
+            return self.host
+
+    def per_core(self):
+        self.wait_ready()
+        with self.lock:
+            return list(self.cores)
+
+    def process_percent(self, pid):
+        """单个进程占用单核的百分比，多线程进程可能超过 100"""
+        self.wait_ready()
+        with self.lock:
+            return self.processes.get(pid, (None, 0.0))[1]
+
+    def process_usage(self):
+        """{pid: (进程名, CPU 百分比)}"""
+        self.wait_ready()
+        with self.lock:
+            return dict(self.processes)
+
+    def process_table(self):
+        """最近一次采样读取的 ProcessTable，没有跟踪进程时为 None"""
+        self.wait_ready()
+        with self.lock:
+            return self.table
+
+    def top_processes(self, n=10):
+        return sorted(self.process_usage().items(), key=lambda item: item[1][1], reverse=True)[:n]
+
+
+_shared_sampler = None
+_shared_lock = threading.Lock()
+
+
+def get_sampler(interval=1.0, track_processes=True):
+    """
+    同一进程内的所有监控共用一个采样线程
+    采样间隔由第一次调用决定，之后要求不同间隔的调用会记录警告；
+    后来的调用方需要进程数据时，从下一轮采样开始补充采集
+    """
+    global _shared_sampler
+    with _shared_lock:
+        if _shared_sampler is None:
+            _shared_sampler = CpuSampler(interval, track_processes)
+            _shared_sampler.sample()
+            _shared_sampler.start()
+            return _shared_sampler
+        if interval != _shared_sampler.interval:
+            logger.warning(f"CPU 采样线程已按 {_shared_sampler.interval} 秒间隔运行，忽略 interval={interval}")
+        if track_processes and not _shared_sampler.track_processes:
+            _shared_sampler.track_processes = True
+        return _shared_sampler
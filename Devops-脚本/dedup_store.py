@@ -0,0 +1,285 @@
+import gzip
+import hashlib
+import json
+import os
+import random
+import stat
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    # 没有 numpy 时用纯 Python 计算同样的滚动哈希，切分结果完全一致，只是更慢
+    np = None
+
+from backup_stream import command_output
+
+MIN_CHUNK = 16 * 1024
+AVG_CHUNK = 64 * 1024
+MAX_CHUNK = 256 * 1024
+WINDOW = 48
+MASK64 = (1 << 64) - 1
+
+# 每个字节值对应一个固定的 64 位随机数，种子固定保证不同机器、不同版本的切分点一致
+_rng = random.Random(0x5EED)
+GEAR = [_rng.getrandbits(64) for _ in range(256)]
+GEAR_ARRAY = np.array(GEAR, dtype=np.uint64) if np is not None else None
+
+
+def find_cut(data, min_size=MIN_CHUNK, avg_size=AVG_CHUNK, max_size=MAX_CHUNK):
+    """
+    内容定义切分：块长度 L 满足 min_size <= L <= max_size，且结尾 WINDOW 个字节的随机值之和
+    的低位全为 0 时切分（期望平均块长约为 avg_size）。插入或删除数据只影响附近的块，其余块保持不变
+    """
+    if len(data) <= min_size:
+        return len(data)
+    mask = avg_size - 1
+    end = min(len(data), max_size)
+    start = min_size - WINDOW
+
+    if np is not None:
+        values = GEAR_ARRAY[np.frombuffer(data, dtype=np.uint8, count=end - start, offset=start)]
+        sums = np.cumsum(values, dtype=np.uint64)
+        # 窗口和 = 前缀和之差（uint64 自然按 2^64 取模）
+        windows = sums[WINDOW - 1:].copy()
+        windows[1:] -= sums[:-WINDOW]
+        hits = np.flatnonzero((windows & np.uint64(mask)) == 0)
+        return min_size + int(hits[0]) if len(hits) else end
+
+    window_sum = sum(GEAR[b] for b in data[start:min_size]) & MASK64
+    position = min_size
+    while True:
+        if window_sum & mask == 0:
+            return position
+        if position >= end:
+            return end
+        window_sum = (window_sum + GEAR[data[position]] - GEAR[data[position - WINDOW]]) & MASK64
+        position += 1
+
+
+def iter_chunks(stream, read_size=8 * 1024 * 1024):
+    """从二进制流中按内容定义边界产出数据块"""
+    buffer = bytearray()
+    pos = 0
+    eof = False
+    while True:
+        if not eof and len(buffer) - pos < MAX_CHUNK:
+            data = stream.read(read_size)
+            if data:
+                # 丢弃已产出的部分，避免缓冲区无限增长
+                del buffer[:pos]
+                pos = 0
+                buffer += data
+            else:
+                eof = True
+            continue
+        if pos >= len(buffer):
+            return
+        with memoryview(buffer) as view:
+            rest = view[pos:]
+            cut = find_cut(rest)
+            chunk = bytes(rest[:cut])
+            rest.release()
+        pos += cut
+        yield chunk
+
+
+def _store_chunks(repo_dir, stream, level=6):
+    """切块、哈希并写入仓库中尚不存在的块，返回 ([块 id], 原始字节数, 新写入的压缩字节数)"""
+    chunk_ids, size, written = [], 0, 0
+    for chunk in iter_chunks(stream):
+        chunk_id = hashlib.sha256(chunk).hexdigest()
+        chunk_ids.append(chunk_id)
+        size += len(chunk)
+        path = os.path.join(repo_dir, 'chunks', chunk_id[:2], chunk_id)
+        if os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(chunk, level)
+        # 多个进程可能同时写同一个块，各自写临时文件后原子替换
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        written += len(data)
+    return chunk_ids, size, written
+
+
+def _backup_file(args):
+    """进程池任务：处理单个文件"""
+    repo_dir, path, level = args
+    try:
+        with open(path, 'rb') as f:
+            return path, _store_chunks(repo_dir, f, level), None
+    except OSError as e:
+        return path, None, str(e)
+
+
+class BackupRepository:
+    """
+    去重备份仓库
+    chunks/ 下按 sha256 存放压缩后的唯一数据块，snapshots/ 下每次备份一个快照索引（文件 -> 块列表）；
+    未变化的文件（大小和 mtime 与上一个同名快照一致）直接复用上次的块列表，不再读取
+    """
+
+    def __init__(self, repo_dir, workers=None, level=6):
+        self.repo_dir = repo_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.level = level
+        os.makedirs(os.path.join(repo_dir, 'chunks'), exist_ok=True)
+        os.makedirs(os.path.join(repo_dir, 'snapshots'), exist_ok=True)
+
+    def snapshots(self, name=None):
+        """按时间顺序返回快照文件名，可按备份名过滤"""
+        result = []
+        for filename in sorted(os.listdir(os.path.join(self.repo_dir, 'snapshots'))):
+            if filename.endswith('.json.gz') and (name is None or filename[16:-8] == name):
+                result.append(filename)
+        return result
+
+    def load_snapshot(self, snapshot):
+        with gzip.open(os.path.join(self.repo_dir, 'snapshots', snapshot), 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_snapshot(self, snapshot):
+        filename = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{snapshot['name']}.json.gz"
+        path = os.path.join(self.repo_dir, 'snapshots', filename)
+        with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(path + '.tmp', path)
+        return filename
+
+    def backup(self, source_dir, name=None):
+        """对目录创建增量快照，变化的文件由进程池并行切块哈希"""
+        name = name or os.path.basename(os.path.abspath(source_dir))
+        start = time.monotonic()
+        previous = {}
+        history = self.snapshots(name)
+        if history:
+            previous = {entry['path']: entry for entry in self.load_snapshot(history[-1])['files']}
+
+        files, changed, errors = [], [], []
+        for root, _, names in os.walk(source_dir):
+            for filename in names:
+                path = os.path.join(root, filename)
+                try:
+                    st = os.lstat(path)
+                except FileNotFoundError as e:
+                    # 遍历期间被删除的文件（日志轮转、临时文件）记为错误，不中断整个备份
+                    errors.append(f"{path}: {e}")
+                    continue
+                if not stat.S_ISREG(st.st_mode):
+                    continue
+                rel = os.path.relpath(path, source_dir)
+                entry = {'path': rel, 'size': st.st_size, 'mode': stat.S_IMODE(st.st_mode),
+                         'mtime_ns': st.st_mtime_ns}
+                old = previous.get(rel)
+                if old and old['size'] == st.st_size and old['mtime_ns'] == st.st_mtime_ns:
+                    entry['chunks'] = old['chunks']
+                else:
+                    changed.append((self.repo_dir, path, self.level))
+                files.append(entry)
+
+        stats = {'files': len(files), 'changed': len(changed), 'bytes': sum(entry['size'] for entry in files),
+                 'bytes_read': 0, 'bytes_stored': 0, 'errors': errors}
+        results = {}
+        if changed:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                for path, result, error in executor.map(_backup_file, changed, chunksize=16):
+                    if error:
+                        stats['errors'].append(f"{path}: {error}")
+                        continue
+                    results[os.path.relpath(path, source_dir)] = result
+
+        kept = []
+        for entry in files:
+            if 'chunks' not in entry:
+                if entry['path'] not in results:
+                    continue
+                entry['chunks'], size, written = results[entry['path']]
+                entry['size'] = size
+                stats['bytes_read'] += size
+                stats['bytes_stored'] += written
+            kept.append(entry)
+
+        stats['elapsed'] = round(time.monotonic() - start, 2)
+        snapshot = {'name': name, 'source': os.path.abspath(source_dir), 'time': datetime.now().isoformat(),
+                    'files': kept, 'stats': stats}
+        snapshot['id'] = self._save_snapshot(snapshot)
+        return snapshot
+
+    def backup_command(self, name, command, filename=None):
+        """把命令输出（如未压缩的 mysqldump）作为单个文件存入快照，相邻两天的转储大部分块可以复用"""
+        start = time.monotonic()
+        with command_output(command) as stdout:
+            chunk_ids, size, written = _store_chunks(self.repo_dir, stdout, self.level)
+
+        entry = {'path': filename or f"{name}.sql", 'size': size, 'mode': 0o600,
+                 'mtime_ns': time.time_ns(), 'chunks': chunk_ids}
+        stats = {'files': 1, 'changed': 1, 'bytes': size, 'bytes_read': size, 'bytes_stored': written,
+                 'errors': [], 'elapsed': round(time.monotonic() - start, 2)}
+        snapshot = {'name': name, 'source': ' '.join(command[:1]), 'time': datetime.now().isoformat(),
+                    'files': [entry], 'stats': stats}
+        snapshot['id'] = self._save_snapshot(snapshot)
+        return snapshot
+
+    def read_chunk(self, chunk_id):
+        with open(os.path.join(self.repo_dir, 'chunks', chunk_id[:2], chunk_id), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != chunk_id:
+            raise ValueError(f"Chunk {chunk_id} is corrupted")
+        return data
+
+    def restore(self, snapshot, target_dir):
+        """把快照还原到目标目录，每个块读取时校验 sha256"""
+        snapshot = self.load_snapshot(snapshot) if isinstance(snapshot, str) else snapshot
+        for entry in snapshot['files']:
+            path = os.path.join(target_dir, entry['path'])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                for chunk_id in entry['chunks']:
+                    f.write(self.read_chunk(chunk_id))
+            os.chmod(path, entry['mode'])
+            os.utime(path, ns=(entry['mtime_ns'], entry['mtime_ns']))
+        return len(snapshot['files'])
+
+    def prune(self, name=None, keep=None, days=None, now=None):
+        """
+        清理旧快照：每个备份名只保留最新的 keep 个，并删除早于 days 天的快照，最新的一个始终保留
+        只删除快照索引，随后调用 gc() 回收不再被引用的块；返回删除的快照文件名
+        """
+        now = now or datetime.now()
+        groups = {}
+        for filename in self.snapshots(name):
+            groups.setdefault(filename[16:-8], []).append(filename)
+
+        removed = []
+        for history in groups.values():
+            expired = set(history[:-keep]) if keep else set()
+            if days is not None:
+                cutoff = now - timedelta(days=days)
+                expired.update(filename for filename in history[:-1]
+                               if datetime.strptime(filename[:15], '%Y%m%d-%H%M%S') < cutoff)
+            for filename in history:
+                if filename in expired:
+                    os.remove(os.path.join(self.repo_dir, 'snapshots', filename))
+                    removed.append(filename)
+        return removed
+
+    def gc(self):
+        """删除没有任何快照引用的块，返回删除的块数"""
+        referenced = set()
+        for snapshot in self.snapshots():
+            for entry in self.load_snapshot(snapshot)['files']:
+                referenced.update(entry['chunks'])
+        removed = 0
+        chunks_dir = os.path.join(self.repo_dir, 'chunks')
+        for prefix in os.listdir(chunks_dir):
+            for chunk_id in os.listdir(os.path.join(chunks_dir, prefix)):
+                if chunk_id not in referenced:
+                    os.remove(os.path.join(chunks_dir, prefix, chunk_id))
+                    removed += 1
+        return removed
@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+
+import psutil
+
+from cpu_sampler import get_sampler
+
+logger = logging.getLogger(__name__)
+
+
+class HostMetrics(threading.Thread):
+    """
+    主机指标缓存
+    唯一的后台线程按固定间隔生成一份完整快照：CPU 和进程来自共享的 CpuSampler（及其 ProcessTable），
+    内存、磁盘、网络来自 psutil。各监控脚本和 Prometheus exporter 只读取缓存的快照，不再各自采样
+    """
+
+    def __init__(self, interval=5, top_processes=10):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.top_processes = top_processes
+        self.cpu = get_sampler()
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.snapshot = None
+
+    def collect(self):
+        """读取一份快照，psutil 的命名元组原样保存"""
+        table = self.cpu.process_table()
+        top = []
+        for pid, (name, percent) in self.cpu.top_processes(self.top_processes):
+            index = table.by_pid.get(pid) if table else None
+            top.append({'pid': pid, 'name': name, 'cpu_percent': percent,
+                        'rss': table.rss[index] if index is not None else None})
+
+        disks = {}
+        for part in psutil.disk_partitions(all=False):
+            try:
+                disks[part.mountpoint] = (part, psutil.disk_usage(part.mountpoint))
+            except OSError:
+                continue
+
+        return {
+            'timestamp': time.time(),
+            'boot_time': psutil.boot_time(),
+            'cpu_percent': self.cpu.host_percent(),
+            'cpu_per_core': self.cpu.per_core(),
+            'load': psutil.getloadavg() if hasattr(psutil, 'getloadavg') else None,
+            'memory': psutil.virtual_memory(),
+            'swap': psutil.swap_memory(),
+            'disks': disks,
+            'disk_io': psutil.disk_io_counters(),
+            'network': psutil.net_io_counters(pernic=True),
+            'process_count': len(table) if table else len(psutil.pids()),
+            'top_processes': top
+        }
+
+    def refresh(self):
+        snapshot = self.collect()
+        with self.lock:
+            self.snapshot = snapshot
+            listeners = list(self.listeners)
+        for listener in listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"指标快照回调失败: {e}")
+
+    def add_listener(self, callback):
+        """每次刷新快照后在采样线程中调用 callback(snapshot)"""
+        with self.lock:
+            self.listeners.append(callback)
+
+    def latest(self):
+        with self.lock:
+            return self.snapshot
+
+    def run(self):
+        # 第一份快照在 start() 之前由 get_host_metrics 生成
+        elapsed = 0
+        while True:
+            time.sleep(max(0, self.interval - elapsed))
+            start = time.monotonic()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"主机指标采样失败: {e}")
+            elapsed = time.monotonic() - start
+
+
+_shared_metrics = None
+_shared_lock = threading.Lock()
+
+
+def get_host_metrics(interval=5):
+    """同一进程内的所有监控共用一个指标缓存，刷新间隔由第一次调用决定"""
+    global _shared_metrics
+    with _shared_lock:
+        if _shared_metrics is None:
+            _shared_metrics = HostMetrics(interval)
+            _shared_metrics.refresh()
+            _shared_metrics.start()
+        elif interval != _shared_metrics.interval:
+            logger.warning(f"主机指标缓存已按 {_shared_metrics.interval} 秒间隔刷新，忽略 interval={interval}")
+        return _shared_metrics
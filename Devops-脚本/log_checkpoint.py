@@ -0,0 +1,107 @@
+import glob
+import json
+import os
+
+
+class LogCheckpointStore:
+    """
+    日志增量扫描检查点
+    为每个日志文件记录 (inode, size, offset, 未完成的半行)，下次只读取新追加的字节，
+    并识别日志轮转（inode 变化）和截断（文件变小），同时保存调用方的累计统计结果
+    """
+
+    def __init__(self, path='log_checkpoints.json'):
+        self.path = path
+        self.state = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+
+    def _entry(self, key):
+        return self.state.setdefault(key, {
+            'inode': None,
+            'size': 0,
+            'offset': 0,
+            'carry': '',
+            'aggregates': {}
+        })
+
+    def aggregates(self, log_file, key=None):
+        """返回可直接修改的累计结果字典，save() 时一起持久化"""
+        return self._entry(key or os.path.abspath(log_file))['aggregates']
+
+    def reset(self, log_file, key=None):
+        """清空检查点和累计结果，下次从头扫描"""
+        self.state.pop(key or os.path.abspath(log_file), None)
+
+    def _find_rotated(self, log_file, inode):
+        """在同目录下查找 inode 与上次记录相同的未压缩轮转文件（如 app.log.1）"""
+        for path in glob.glob(glob.escape(log_file) + '*'):
+            if path != log_file and not path.endswith('.gz'):
+                try:
+                    if os.stat(path).st_ino == inode:
+                        return path
+                except OSError:
+                    continue
+        return None
+
+    @staticmethod
+    def _decode(data):
+        return data.decode('utf-8', errors='replace')
+
+    def _iter_lines(self, path, offset, carry, chunk_size):
+        """从 offset 开始按块读取，产出完整的行；读完后返回 (新偏移, 剩余半行字节)"""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                offset += len(data)
+                # 在字节层面按换行切分，避免多字节字符被块边界截断
+                head, sep, tail = data.rpartition(b'\n')
+                if not sep:
+                    carry += data
+                    continue
+                for line in (carry + head).split(b'\n'):
+                    yield self._decode(line) + '\n'
+                carry = tail
+        return offset, carry
+
+    def read_new_lines(self, log_file, key=None, chunk_size=1024 * 1024):
+        """
+        逐行产出自上次检查点以来新追加的完整行
+        生成器迭代结束后才会更新检查点，中途退出则下次重新读取这部分内容
+        """
+        entry = self._entry(key or os.path.abspath(log_file))
+        stat = os.stat(log_file)
+        offset = entry['offset']
+        # 半行以 surrogateescape 形式保存在 JSON 中，可无损还原为原始字节
+        carry = entry['carry'].encode('utf-8', errors='surrogateescape')
+
+        if entry['inode'] is not None and entry['inode'] != stat.st_ino:
+            # 文件被轮转：先把旧文件中上次之后写入的内容读完，再从新文件开头开始
+            rotated = self._find_rotated(log_file, entry['inode'])
+            if rotated:
+                _, carry = yield from self._iter_lines(rotated, offset, carry, chunk_size)
+            if carry:
+                yield self._decode(carry) + '\n'
+            offset, carry = 0, b''
+        elif stat.st_size < offset:
+            # 文件被截断（如 copytruncate），从头开始
+            offset, carry = 0, b''
+
+        offset, carry = yield from self._iter_lines(log_file, offset, carry, chunk_size)
+        entry.update({
+            'inode': stat.st_ino,
+            'size': offset,
+            'offset': offset,
+            'carry': carry.decode('utf-8', errors='surrogateescape')
+        })
+
+    def save(self):
+        """原子写入检查点文件"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,98 @@
+import mmap
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+
+def merge_results(total, part):
+    """
+    合并两个分块的统计结果（原地修改 total）
+    字典按键递归相加，列表按分块顺序拼接
+    """
+    for key, value in part.items():
+        if key not in total:
+            total[key] = value
+        elif isinstance(value, dict):
+            merge_results(total[key], value)
+        elif isinstance(value, list):
+            total[key].extend(value)
+        else:
+            total[key] += value
+    return total
+
+
+def split_ranges(path, chunk_size):
+    """把文件切分成以换行符对齐的字节区间 [(start, end)]"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    ranges = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                # 向后找到下一个换行符，保证每一行完整地落在一个区间内
+                newline = mm.find(b'\n', end - 1)
+                end = size if newline == -1 else newline + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _iter_range(mm, start, end, encoding):
+    mm.seek(start)
+    while mm.tell() < end:
+        yield mm.readline().decode(encoding, errors='replace')
+
+
+def _map_range(mapper, path, start, end, encoding):
+    """在子进程中处理一个区间：mmap 映射文件，只读取该区间内的行"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return path, mapper(_iter_range(mm, start, end, encoding))
+
+
+class LogMapReduce:
+    """
+    多进程日志分析
+    大文件按换行对齐切成多个区间分发到进程池，多个文件的区间共用同一个进程池并发处理，
+    最后把各区间的 mapper 结果按顺序合并
+    """
+
+    def __init__(self, mapper, workers=None, chunk_size=64 * 1024 * 1024, encoding='utf-8'):
+        """
+        :param mapper: 模块级函数，接收一个行迭代器，返回统计结果字典（需可被 pickle）
+        :param workers: 进程数，默认 CPU 核数
+        :param chunk_size: 每个区间的大致字节数
+        """
+        self.mapper = mapper
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+
+    def run(self, paths, per_file=False):
+        """处理一个或多个文件；per_file=True 时返回 {文件: 结果}，否则返回合并后的结果"""
+        if isinstance(paths, str):
+            paths = [paths]
+        jobs = [(path, start, end) for path in paths for start, end in split_ranges(path, self.chunk_size)]
+
+        results = defaultdict(dict)
+        if len(jobs) <= 1 or self.workers <= 1:
+            # 只有一个区间时不值得启动进程池
+            parts = (_map_range(self.mapper, path, start, end, self.encoding) for path, start, end in jobs)
+            for path, part in parts:
+                merge_results(results[path], part)
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                # map 按提交顺序返回结果，保证列表类结果的行顺序不变
+                parts = executor.map(_map_range, *zip(*[(self.mapper, path, start, end, self.encoding)
+                                                        for path, start, end in jobs]))
+                for path, part in parts:
+                    merge_results(results[path], part)
+
+        if per_file:
+            return {path: results.get(path, {}) for path in paths}
+        total = {}
+        for path in paths:
+            merge_results(total, results.get(path, {}))
+        return total
@@ -0,0 +1,60 @@
+import re
+from collections import Counter
+
+
+class MultiPatternMatcher:
+    """
+    多模式单次扫描匹配器
+    把所有模式合并成一个带命名分组的正则，每行只扫描一次即可知道命中了哪些模式
+    """
+
+    def __init__(self, patterns, ignore_case=False, literal=False):
+        """
+        :param patterns: {标签: 正则} 字典，或关键字列表（标签即关键字本身）
+        :param ignore_case: 是否忽略大小写
+        :param literal: 为 True 时按普通字符串匹配（自动转义）
+        """
+        if not isinstance(patterns, dict):
+            patterns = {keyword: keyword for keyword in patterns}
+        self.labels = list(patterns)
+        parts = []
+        for index, pattern in enumerate(patterns.values()):
+            pattern = re.escape(pattern) if literal else pattern
+            # 分组名只能是标识符，用序号命名，再映射回标签
+            parts.append(f"(?P<_{index}>{pattern})")
+        self.regex = re.compile('|'.join(parts), re.IGNORECASE if ignore_case else 0)
+
+    def _label(self, match):
+        return self.labels[int(match.lastgroup[1:])]
+
+    def search(self, line):
+        """返回第一个命中的标签，没有命中返回 None"""
+        match = self.regex.search(line)
+        return self._label(match) if match else None
+
+    def scan(self, line):
+        """返回一行中所有命中：[(标签, 起始偏移, 结束偏移, 命中文本)]"""
+        return [(self._label(m), m.start(), m.end(), m.group()) for m in self.regex.finditer(line)]
+
+    def first_matches(self, line):
+        """每个标签只取该行中第一次命中的文本：{标签: 命中文本}"""
+        found = {}
+        for match in self.regex.finditer(line):
+            found.setdefault(self._label(match), match.group())
+            if len(found) == len(self.labels):
+                break
+        return found
+
+    def classify(self, lines):
+        """
+        对多行做一次扫描，返回 (每个标签的命中次数, 命中位置列表)
+        命中位置为 (行号, 标签, 起始偏移, 结束偏移)
+        """
+        counts = Counter()
+        offsets = []
+        for line_no, line in enumerate(lines, 1):
+            for match in self.regex.finditer(line):
+                label = self._label(match)
+                counts[label] += 1
+                offsets.append((line_no, label, match.start(), match.end()))
+        return counts, offsets
@@ -0,0 +1,340 @@
+import gzip
+import json
+import logging
+import math
+import os
+import queue
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import pymysql
+import pymysql.cursors
+
+from backup_stream import SUFFIXES, CompressedWriter, stream_command
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 整数类型主键的表按主键范围切分，同一张大表也可以由多个连接同时导出
+INTEGER_TYPES = ('tinyint', 'smallint', 'mediumint', 'int', 'bigint')
+
+
+def quote(name):
+    return '`' + name.replace('`', '``') + '`'
+
+
+class ParallelDumper:
+    """
+    并行逻辑备份
+    协调连接执行 FLUSH TABLES WITH READ LOCK 并记录 binlog 位置，在锁内让每个工作连接
+    START TRANSACTION WITH CONSISTENT SNAPSHOT，随后立即解锁；所有连接看到的是同一时刻的数据，
+    各表（大表按主键范围切块）分配给工作连接并发导出，每块写成一个独立的压缩文件
+    """
+
+    def __init__(self, host, port, user, password, database, workers=4, chunk_rows=1000000,
+                 method='gzip', level=6, statement_size=1024 * 1024):
+        self.conn_args = {'host': host, 'port': int(port), 'user': user, 'password': password,
+                          'database': database, 'charset': 'utf8mb4'}
+        self.database = database
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.method = method
+        self.level = level
+        self.statement_size = statement_size
+
+    def _connect(self, **kwargs):
+        conn = pymysql.connect(**self.conn_args, **kwargs)
+        with conn.cursor() as cursor:
+            # 导出和恢复都按 UTC 处理 TIMESTAMP 列
+            cursor.execute("SET SESSION time_zone = '+00:00'")
+        return conn
+
+    def _snapshot(self):
+        """建立一致性快照，返回 (binlog 位置, 工作连接列表)"""
+        coordinator = self._connect()
+        connections = []
+        try:
+            with coordinator.cursor() as cursor:
+                cursor.execute("FLUSH TABLES WITH READ LOCK")
+                cursor.execute("SHOW MASTER STATUS")
+                row = cursor.fetchone()
+                position = {'file': row[0], 'position': row[1],
+                            'gtid_executed': row[4] if len(row) > 4 else ''} if row else {}
+                for _ in range(self.workers):
+                    conn = self._connect(cursorclass=pymysql.cursors.SSCursor)
+                    with conn.cursor() as worker_cursor:
+                        worker_cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                        worker_cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+                    connections.append(conn)
+                cursor.execute("UNLOCK TABLES")
+        except Exception:
+            for conn in connections:
+                conn.close()
+            raise
+        finally:
+            coordinator.close()
+        return position, connections
+
+    def _tables(self, conn):
+        """[(表名, 类型, 预估行数, 可导出的列, 整数主键列或 None)]"""
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT TABLE_NAME, TABLE_TYPE, COALESCE(TABLE_ROWS, 0) FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = %s", (self.database,))
+            tables = cursor.fetchall()
+            # 生成列不能插入，导出时跳过
+            cursor.execute(
+                "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, COLUMN_KEY, EXTRA FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME, ORDINAL_POSITION", (self.database,))
+            columns = {}
+            primary = {}
+            for table, column, data_type, key, extra in cursor.fetchall():
+                if 'GENERATED' not in (extra or '').upper():
+                    columns.setdefault(table, []).append(column)
+                if key == 'PRI':
+                    primary.setdefault(table, []).append((column, data_type))
+
+        result = []
+        for table, table_type, rows in tables:
+            keys = primary.get(table, [])
+            int_key = keys[0][0] if len(keys) == 1 and keys[0][1] in INTEGER_TYPES else None
+            result.append((table, table_type, rows, columns.get(table, []), int_key))
+        return result
+
+    def _plan(self, conn, tables):
+        """生成导出任务 [(表名, 列, WHERE 条件, 块序号)]，行数多的任务排在前面"""
+        tasks = []
+        for table, table_type, rows, columns, int_key in tables:
+            if table_type != 'BASE TABLE':
+                continue
+            chunks = max(1, math.ceil(rows / self.chunk_rows))
+            if int_key is None or chunks == 1:
+                tasks.append((rows, table, columns, None, 0))
+                continue
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT MIN({quote(int_key)}), MAX({quote(int_key)}) FROM {quote(table)}")
+                low, high = cursor.fetchone()
+                cursor.fetchall()
+            if low is None:
+                tasks.append((0, table, columns, None, 0))
+                continue
+            step = max(1, math.ceil((high - low + 1) / chunks))
+            for number, start in enumerate(range(low, high + 1, step)):
+                where = f"{quote(int_key)} >= {start} AND {quote(int_key)} < {start + step}"
+                tasks.append((rows / chunks, table, columns, where, number))
+        tasks.sort(key=lambda task: task[0], reverse=True)
+        return [task[1:] for task in tasks]
+
+    def _dump_chunk(self, conn, output_dir, table, columns, where, number):
+        """把一个任务的数据写成多行 INSERT 语句，每条语句占一行，恢复时可逐行执行"""
+        path = os.path.join(output_dir, f"{table}.{number:05d}.sql{SUFFIXES[self.method]}")
+        column_list = ', '.join(quote(column) for column in columns)
+        prefix = f"INSERT INTO {quote(table)} ({column_list}) VALUES ".encode('utf-8')
+        sql = f"SELECT {column_list} FROM {quote(table)}" + (f" WHERE {where}" if where else '')
+
+        writer = CompressedWriter(path, self.method, self.level)
+        rows = 0
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql)
+                values, size = [], 0
+                while True:
+                    batch = cursor.fetchmany(1000)
+                    if not batch:
+                        break
+                    for row in batch:
+                        literal = conn.escape(row).encode('utf-8', errors='surrogateescape')
+                        values.append(literal)
+                        size += len(literal) + 1
+                        if size >= self.statement_size:
+                            writer.write(prefix + b','.join(values) + b';\n')
+                            values, size = [], 0
+                    rows += len(batch)
+                if values:
+                    writer.write(prefix + b','.join(values) + b';\n')
+            checksum = writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        return {'table': table, 'file': os.path.basename(path), 'rows': rows, 'sha256': checksum}
+
+    def _dump_schema(self, conn, output_dir, tables):
+        """表结构和视图定义，视图单独存放以便在数据恢复后再创建"""
+        schema, views = [], []
+        with conn.cursor() as cursor:
+            for table, table_type, _, _, _ in tables:
+                if table_type == 'BASE TABLE':
+                    cursor.execute(f"SHOW CREATE TABLE {quote(table)}")
+                    schema.append(cursor.fetchone()[1] + ';')
+                else:
+                    cursor.execute(f"SHOW CREATE VIEW {quote(table)}")
+                    views.append(cursor.fetchone()[1] + ';')
+                cursor.fetchall()
+        for name, statements in (('schema', schema), ('views', views)):
+            with open(os.path.join(output_dir, f"{name}.sql"), 'w', encoding='utf-8') as f:
+                # 每条语句中的换行替换为空格，保持一行一条语句
+                f.write(''.join(statement.replace('\n', ' ') + '\n' for statement in statements))
+
+    def _dump_routines(self, output_dir):
+        """存储过程、函数、事件和触发器由 mysqldump 导出（不含数据，不影响一致性）"""
+        command = [
+            'mysqldump',
+            f"--host={self.conn_args['host']}",
+            f"--port={self.conn_args['port']}",
+            f"--user={self.conn_args['user']}",
+            f"--password={self.conn_args['password']}",
+            '--no-data', '--no-create-info', '--skip-opt',
+            '--routines', '--events', '--triggers',
+            self.database
+        ]
+        stream_command(command, os.path.join(output_dir, f"routines.sql{SUFFIXES[self.method]}"),
+                       level=self.level, method=self.method)
+
+    def dump(self, output_dir):
+        """执行并行导出，返回写入 metadata.json 的元数据"""
+        os.makedirs(output_dir, exist_ok=True)
+        started = datetime.now().isoformat(timespec='seconds')
+        start = time.monotonic()
+        position, connections = self._snapshot()
+        logger.info(f"Consistent snapshot taken at binlog position {position}")
+
+        try:
+            tables = self._tables(connections[0])
+            self._dump_schema(connections[0], output_dir, tables)
+            tasks = queue.Queue()
+            for task in self._plan(connections[0], tables):
+                tasks.put(task)
+
+            chunks, errors = [], []
+            lock = threading.Lock()
+
+            def worker(conn):
+                while not errors:
+                    try:
+                        table, columns, where, number = tasks.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        chunk = self._dump_chunk(conn, output_dir, table, columns, where, number)
+                    except Exception as e:
+                        errors.append(f"{table}.{number}: {e}")
+                        return
+                    with lock:
+                        chunks.append(chunk)
+                    logger.info(f"Dumped {chunk['file']} ({chunk['rows']} rows)")
+
+            threads = [threading.Thread(target=worker, args=(conn,)) for conn in connections]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if errors:
+                raise RuntimeError(f"Parallel dump failed: {errors[0]}")
+        finally:
+            for conn in connections:
+                conn.close()
+
+        self._dump_routines(output_dir)
+
+        metadata = {
+            'database': self.database,
+            'started': started,
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'elapsed': round(time.monotonic() - start, 2),
+            'binlog': position,
+            'method': self.method,
+            'chunks': sorted(chunks, key=lambda chunk: chunk['file'])
+        }
+        with open(os.path.join(output_dir, 'metadata.json'), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        return metadata
+
+
+def open_compressed(path):
+    """按后缀打开备份文件，返回二进制读取对象"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("Restoring .zst backups requires the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+class ParallelRestorer:
+    """
+    并行恢复 ParallelDumper 的备份
+    先建表，再用多个连接并发加载数据块（关闭外键和唯一性检查），最后创建视图和存储过程
+    """
+
+    def __init__(self, host, port, user, password, workers=4, disable_binlog=False):
+        self.conn_args = {'host': host, 'port': int(port), 'user': user, 'password': password,
+                          'charset': 'utf8mb4', 'autocommit': False}
+        self.workers = workers
+        self.disable_binlog = disable_binlog
+
+    def _connect(self, database):
+        conn = pymysql.connect(database=database, **self.conn_args)
+        with conn.cursor() as cursor:
+            cursor.execute("SET SESSION time_zone = '+00:00'")
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+            cursor.execute("SET SESSION unique_checks = 0")
+            if self.disable_binlog:
+                cursor.execute("SET SESSION sql_log_bin = 0")
+        return conn
+
+    def _execute_file(self, database, path):
+        """逐行执行语句文件，每个文件一个事务"""
+        conn = self._connect(database)
+        try:
+            with open_compressed(path) as f, conn.cursor() as cursor:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        cursor.execute(line.decode('utf-8', errors='surrogateescape'))
+            conn.commit()
+        finally:
+            conn.close()
+        return os.path.basename(path)
+
+    def restore(self, backup_dir, database=None):
+        with open(os.path.join(backup_dir, 'metadata.json')) as f:
+            metadata = json.load(f)
+        database = database or metadata['database']
+        start = time.monotonic()
+
+        conn = pymysql.connect(**self.conn_args)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"CREATE DATABASE IF NOT EXISTS {quote(database)}")
+        finally:
+            conn.close()
+
+        self._execute_file(database, os.path.join(backup_dir, 'schema.sql'))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._execute_file, database, os.path.join(backup_dir, chunk['file']))
+                       for chunk in metadata['chunks']]
+            for future in as_completed(futures):
+                logger.info(f"Restored {future.result()}")
+
+        self._execute_file(database, os.path.join(backup_dir, 'views.sql'))
+
+        # 存储过程文件包含 DELIMITER，交给 mysql 客户端执行
+        routines = os.path.join(backup_dir, f"routines.sql{SUFFIXES[metadata['method']]}")
+        if os.path.exists(routines):
+            command = ['mysql', f"--host={self.conn_args['host']}", f"--port={self.conn_args['port']}",
+                       f"--user={self.conn_args['user']}", f"--password={self.conn_args['password']}", database]
+            with open_compressed(routines) as f:
+                subprocess.run(command, input=f.read(), check=True, stderr=subprocess.PIPE)
+
+        elapsed = round(time.monotonic() - start, 2)
+        logger.info(f"Restore of {database} completed in {elapsed}s, binlog position {metadata['binlog']}")
+        return metadata
@@ -1,19 +1,26 @@
 # 统计各类错误码出现次数
 
 
-import re
 from collections import defaultdict
+from log_matcher import MultiPatternMatcher
+from log_mapreduce import LogMapReduce
 
-def analyze_nginx_errors(log_file):
+# 用定长后顾直接匹配 4xx/5xx 状态码，省去逐行的二次判断
+STATUS_MATCHER = MultiPatternMatcher({'status': r'(?<=HTTP/1\.\d" )[45]\d{2}'})
+
+def count_status(lines):
+    """统计一批行中的 4xx/5xx 状态码（也作为 map-reduce 的 map 阶段）"""
     error_counts = defaultdict(int)
+    for line in lines:
+        status = STATUS_MATCHER.first_matches(line).get('status')
+        if status:
+            error_counts[status] += 1
+    return {'error_counts': error_counts}
+
 
-    with open(log_file) as f:
-        for line in f:
-            match = re.search(r'HTTP/1.\d" (\d{3})', line)
-            if match:
-                status = match.group(1)
-                if status.startswith(('4', '5')):
-                    error_counts[status] += 1
+def analyze_nginx_errors(log_file, workers=None):
+    """log_file 可以是单个文件或文件列表，大文件按块分发到多个进程并行统计"""
+    error_counts = LogMapReduce(count_status, workers=workers).run(log_file).get('error_counts', {})
 
     print("Nginx错误统计:")
     for code,count in sorted(error_counts.items()):
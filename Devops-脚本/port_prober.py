@@ -0,0 +1,94 @@
+import asyncio
+import ipaddress
+import itertools
+
+
+async def probe_port(host, port, timeout=2, grab_banner=False, banner_bytes=128, banner_timeout=0.5):
+    """探测单个端口，返回状态、延迟和可选的 banner"""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = {'host': host, 'port': port, 'status': 'closed', 'banner': None, 'latency': None}
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except asyncio.TimeoutError:
+        result['status'] = 'timeout'
+        return result
+    except ConnectionRefusedError:
+        return result
+    except OSError as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+        return result
+
+    result['status'] = 'open'
+    result['latency'] = round((loop.time() - start) * 1000, 2)
+    try:
+        if grab_banner:
+            # 只读取服务主动发送的首包（SSH/FTP/SMTP/MySQL 等），不主动发送数据
+            data = await asyncio.wait_for(reader.read(banner_bytes), banner_timeout)
+            result['banner'] = data.decode('utf-8', errors='replace').strip() or None
+    except (asyncio.TimeoutError, OSError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+    return result
+
+
+async def probe_many(targets, concurrency=500, **options):
+    """
+    并发探测大量 (host, port)，按完成顺序流式产出结果
+    :param targets: (host, port) 可迭代对象，可以是惰性生成器
+    :param concurrency: 同时进行的连接数上限
+    :param options: 传给 probe_port 的 timeout / grab_banner 等参数
+    """
+    targets = iter(targets)
+    results = asyncio.Queue()
+
+    async def worker():
+        # 固定数量的 worker 共享一个目标迭代器，内存占用与目标总数无关
+        for host, port in targets:
+            await results.put(await probe_port(host, port, **options))
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    finished = asyncio.gather(*workers)
+    try:
+        while not (finished.done() and results.empty()):
+            getter = asyncio.ensure_future(results.get())
+            await asyncio.wait([getter, finished], return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+            else:
+                getter.cancel()
+        await finished
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+def expand_targets(hosts, ports):
+    """展开主机（支持 192.168.0.0/22 网段写法）与端口的组合"""
+    def iter_hosts():
+        for host in hosts:
+            try:
+                network = ipaddress.ip_network(host, strict=False)
+            except ValueError:
+                yield host
+                continue
+            if network.num_addresses == 1:
+                yield str(network.network_address)
+            else:
+                yield from (str(ip) for ip in network.hosts())
+
+    return ((host, port) for host, port in itertools.product(iter_hosts(), ports))
+
+
+def scan(targets, concurrency=500, **options):
+    """同步入口：探测全部目标并返回结果列表"""
+    async def collect():
+        return [result async for result in probe_many(targets, concurrency=concurrency, **options)]
+
+    return asyncio.run(collect())
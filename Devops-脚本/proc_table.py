@@ -0,0 +1,132 @@
+import os
+import time
+from array import array
+
+import psutil
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+# 内核 comm 字段最多保留 15 个字符
+COMM_LEN = 15
+
+
+def _full_name(pid, comm):
+    """comm 被截断时与 psutil 一样从 cmdline 取完整进程名"""
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            argv0 = f.read().split(b'\0', 1)[0].decode('utf-8', errors='replace')
+    except OSError:
+        return comm
+    # 部分进程会改写 argv[0]（如 "nginx: worker process"），只取第一个词
+    name = os.path.basename(argv0.split(' ', 1)[0]) if argv0 else ''
+    return name if name.startswith(comm) else comm
+
+
+class ProcessTable:
+    """
+    进程表快照
+    一次遍历 /proc 把所有进程读入按列存放的数组 (pid, ppid, name, rss, utime, stime)，
+    并建立按 pid 和按进程名的索引，内存、CPU 检查和进程名查询都基于同一份快照
+    """
+
+    def __init__(self):
+        self.timestamp = time.monotonic()
+        self.pids = array('q')
+        self.ppids = array('q')
+        self.rss = array('q')
+        self.utime = array('q')
+        self.stime = array('q')
+        self.names = []
+        self.by_pid = {}
+        self.by_name = {}
+
+    def _append(self, pid, ppid, name, rss, utime, stime):
+        row = len(self.names)
+        self.pids.append(pid)
+        self.ppids.append(ppid)
+        self.rss.append(rss)
+        self.utime.append(utime)
+        self.stime.append(stime)
+        self.names.append(name)
+        self.by_pid[pid] = row
+        self.by_name.setdefault(name, []).append(row)
+
+    @classmethod
+    def scan(cls):
+        """读取当前进程表，rss 单位为字节，utime/stime 单位为时钟滴答"""
+        table = cls()
+        if not os.path.exists('/proc/self/stat'):
+            # 没有 /proc 的系统使用 psutil，一次 process_iter 取齐所有字段
+            for proc in psutil.process_iter(['pid', 'ppid', 'name', 'memory_info', 'cpu_times']):
+                info = proc.info
+                if info['memory_info'] is None or info['cpu_times'] is None:
+                    continue
+                table._append(info['pid'], info['ppid'] or 0, info['name'] or '', info['memory_info'].rss,
+                              int(info['cpu_times'].user * CLK_TCK), int(info['cpu_times'].system * CLK_TCK))
+            return table
+
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat', 'rb') as f:
+                    data = f.read()
+            except OSError:
+                # 进程在遍历期间退出
+                continue
+            # 进程名可能包含空格和括号，以最后一个 ')' 为界；之后的字段从 state 开始编号
+            end = data.rfind(b')')
+            name = data[data.find(b'(') + 1:end].decode('utf-8', errors='replace')
+            if len(name) >= COMM_LEN:
+                name = _full_name(entry, name)
+            fields = data[end + 2:].split()
+            table._append(int(entry), int(fields[1]), name, int(fields[21]) * PAGE_SIZE,
+                          int(fields[11]), int(fields[12]))
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def row(self, index):
+        return {
+            'pid': self.pids[index],
+            'ppid': self.ppids[index],
+            'name': self.names[index],
+            'rss': self.rss[index],
+            'utime': self.utime[index],
+            'stime': self.stime[index]
+        }
+
+    def get(self, pid):
+        index = self.by_pid.get(pid)
+        return None if index is None else self.row(index)
+
+    def has_name(self, name):
+        return name in self.by_name
+
+    def find(self, name):
+        return [self.row(index) for index in self.by_name.get(name, [])]
+
+    def rss_above(self, limit_bytes):
+        """内存占用超过阈值的进程"""
+        return [self.row(index) for index, rss in enumerate(self.rss) if rss > limit_bytes]
+
+    def cpu_percent(self, previous):
+        """
+        与上一份快照比较，返回 {pid: CPU 百分比}（以单核为 100%）
+        只统计两份快照中都存在的进程
+        """
+        elapsed_ticks = (self.timestamp - previous.timestamp) * CLK_TCK
+        usage = {}
+        if elapsed_ticks <= 0:
+            return usage
+        for index, pid in enumerate(self.pids):
+            last = previous.by_pid.get(pid)
+            if last is None:
+                continue
+            ticks = (self.utime[index] + self.stime[index]) - (previous.utime[last] + previous.stime[last])
+            if ticks < 0:
+                # pid 被新进程复用
+                continue
+            usage[pid] = round(100.0 * ticks / elapsed_ticks, 1)
+        return usage
@@ -0,0 +1,290 @@
+import asyncio
+import os
+import select
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import paramiko
+
+try:
+    import asyncssh
+except ImportError:
+    # 没有安装 asyncssh 时，run_on_hosts 退回到线程池中执行 paramiko
+    asyncssh = None
+
+
+class SSHSessionPool:
+    """
+    SSH 连接池
+    每台主机只做一次密钥交换和认证，之后的命令都在同一个 Transport 上开新的 channel 执行；
+    空闲超时的连接自动关闭，并限制全局和单台主机的并发数
+    """
+
+    def __init__(self, username=None, password=None, key_filename=None, port=22,
+                 max_workers=50, max_per_host=4, idle_timeout=300, connect_timeout=10):
+        """
+        :param max_workers: 全局同时执行的命令数
+        :param max_per_host: 单台主机同时打开的 channel 数（sshd 默认 MaxSessions 为 10）
+        :param idle_timeout: 连接空闲多少秒后关闭
+        """
+        self.defaults = {
+            'username': username,
+            'password': password,
+            'key_filename': os.path.expanduser(key_filename) if key_filename else None,
+            'port': port
+        }
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+
+        self.lock = threading.Lock()
+        self.global_slots = threading.BoundedSemaphore(max_workers)
+        self.clients = {}      # key -> SSHClient
+        self.last_used = {}    # key -> 最后使用时间
+        self.host_locks = {}   # key -> 建立连接时使用的锁，避免同一主机并发握手
+        self.host_slots = {}   # key -> 单主机并发信号量
+        self.active = {}       # key -> 正在执行的命令数，执行中的连接不会被回收
+        self.closed = threading.Event()
+        threading.Thread(target=self._reaper, daemon=True).start()
+
+    def _server(self, server):
+        """主机可以是字符串，也可以是 {'host', 'port', 'username', 'password', 'key_file'} 字典"""
+        if isinstance(server, str):
+            server = {'host': server}
+        options = dict(self.defaults)
+        options.update({
+            'host': server['host'],
+            'port': server.get('port', options['port']),
+            'username': server.get('username', options['username']),
+            'password': server.get('password', options['password']),
+        })
+        if server.get('key_file'):
+            options['key_filename'] = os.path.expanduser(server['key_file'])
+        return options
+
+    @staticmethod
+    def _key(options):
+        return options['host'], options['port'], options['username']
+
+    def get_client(self, server):
+        """返回已认证的 SSHClient，连接断开时自动重连；调用方不要关闭它"""
+        options = self._server(server)
+        key = self._key(options)
+        with self.lock:
+            host_lock = self.host_locks.setdefault(key, threading.Lock())
+            self.host_slots.setdefault(key, threading.BoundedSemaphore(self.max_per_host))
+
+        with host_lock:
+            client = self.clients.get(key)
+            transport = client.get_transport() if client else None
+            if transport is None or not transport.is_active():
+                if client:
+                    client.close()
+                client = paramiko.SSHClient()
+                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                client.connect(
+                    hostname=options['host'],
+                    port=options['port'],
+                    username=options['username'],
+                    password=options['password'],
+                    key_filename=options['key_filename'],
+                    timeout=self.connect_timeout,
+                    banner_timeout=self.connect_timeout,
+                    auth_timeout=self.connect_timeout
+                )
+                client.get_transport().set_keepalive(30)
+                self.clients[key] = client
+            self.last_used[key] = time.monotonic()
+            return client
+
+    def open_sftp(self, server):
+        """在已有连接上打开 SFTP channel，用完只需关闭 SFTP，不会断开 SSH 连接"""
+        return self.get_client(server).open_sftp()
+
+    def exec_command(self, server, command, timeout=None):
+        """在复用的连接上执行一条命令，返回包含退出码、输出和耗时的字典"""
+        options = self._server(server)
+        key = self._key(options)
+        start = time.monotonic()
+        result = {'host': options['host'], 'command': command, 'exit_code': None,
+                  'stdout': '', 'stderr': '', 'error': None}
+
+        with self.lock:
+            self.active[key] = self.active.get(key, 0) + 1
+            host_slot = self.host_slots.setdefault(key, threading.BoundedSemaphore(self.max_per_host))
+        # 先占主机槽位再占全局槽位：等待繁忙主机的任务不会占着全局槽位，让其它主机的任务饿死
+        with host_slot, self.global_slots:
+            try:
+                client = self.get_client(server)
+                channel = client.get_transport().open_session(timeout=self.connect_timeout)
+                try:
+                    channel.exec_command(command)
+                    stdout, stderr = self._drain(channel, timeout)
+                    result['exit_code'] = channel.recv_exit_status()
+                finally:
+                    channel.close()
+                result['stdout'] = stdout.decode('utf-8', errors='replace').strip()
+                result['stderr'] = stderr.decode('utf-8', errors='replace').strip()
+            except Exception as e:
+                result['error'] = str(e)
+
+        with self.lock:
+            self.active[key] -= 1
+            self.last_used[key] = time.monotonic()
+        result['elapsed'] = round(time.monotonic() - start, 3)
+        return result
+
+    @staticmethod
+    def _drain(channel, timeout):
+        """同时读取 stdout 和 stderr，避免一方缓冲区写满导致远端阻塞"""
+        deadline = time.monotonic() + timeout if timeout else None
+        stdout, stderr = [], []
+        while True:
+            if channel.recv_ready():
+                stdout.append(channel.recv(32768))
+            elif channel.recv_stderr_ready():
+                stderr.append(channel.recv_stderr(32768))
+            elif channel.exit_status_ready() and channel.eof_received:
+                break
+            else:
+                wait = 1.0 if deadline is None else deadline - time.monotonic()
+                if wait <= 0:
+                    raise TimeoutError(f"command timed out after {timeout}s")
+                select.select([channel], [], [], min(wait, 1.0))
+        # 退出状态到达后把残留数据读完
+        while channel.recv_ready():
+            stdout.append(channel.recv(32768))
+        while channel.recv_stderr_ready():
+            stderr.append(channel.recv_stderr(32768))
+        return b''.join(stdout), b''.join(stderr)
+
+    def run(self, servers, commands, timeout=None):
+        """
+        在多台主机上执行一条或多条命令，按完成顺序逐个产出结果
+        同一主机的多条命令复用一个连接，并发受 max_workers 和 max_per_host 限制
+        """
+        if isinstance(commands, str):
+            commands = [commands]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # 按命令轮流提交到各主机，线程池前面的任务分散在不同主机上，不会集中排队等同一台主机
+            futures = [executor.submit(self.exec_command, server, command, timeout)
+                       for command in commands for server in servers]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def evict_idle(self):
+        """关闭空闲超过 idle_timeout 的连接"""
+        now = time.monotonic()
+        with self.lock:
+            idle = [key for key, used in self.last_used.items()
+                    if now - used > self.idle_timeout and not self.active.get(key)]
+        for key in idle:
+            with self.host_locks[key]:
+                if now - self.last_used.get(key, now) <= self.idle_timeout:
+                    continue
+                client = self.clients.pop(key, None)
+                self.last_used.pop(key, None)
+            if client:
+                client.close()
+
+    def _reaper(self):
+        while not self.closed.wait(min(60, self.idle_timeout)):
+            self.evict_idle()
+
+    def close(self):
+        self.closed.set()
+        with self.lock:
+            clients, self.clients = list(self.clients.values()), {}
+            self.last_used.clear()
+        for client in clients:
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+async def _run_asyncssh(options, command, connect_timeout):
+    """asyncssh 后端：每台主机一个协程，数千个连接也只占用一个线程"""
+    async with asyncssh.connect(
+            options['host'],
+            port=options['port'],
+            username=options['username'],
+            password=options['password'],
+            client_keys=[options['key_filename']] if options['key_filename'] else (),
+            known_hosts=None,
+            connect_timeout=connect_timeout) as conn:
+        completed = await conn.run(command, check=False)
+        return completed.exit_status, completed.stdout, completed.stderr
+
+
+async def run_on_hosts(hosts, command, concurrency=500, timeout=60, progress=None,
+                       username=None, password=None, key_filename=None, port=22,
+                       connect_timeout=10, backend=None):
+    """
+    异步并发在大量主机上执行同一条命令，按完成顺序产出每台主机的结果
+    :param hosts: 主机列表，元素为字符串或 {'host', 'port', 'username', 'password', 'key_file'} 字典
+    :param concurrency: 同时在执行的主机数
+    :param timeout: 单台主机的超时时间（连接 + 执行）
+    :param progress: 回调函数 progress(已完成数, 总数, 结果)
+    :param backend: 'asyncssh' 或 'paramiko'，默认有 asyncssh 时优先使用
+    用法：
+        async for result in run_on_hosts(hosts, 'uptime', concurrency=1000):
+            print(result['host'], result['exit_code'], result['elapsed'])
+    """
+    hosts = list(hosts)
+    backend = backend or ('asyncssh' if asyncssh else 'paramiko')
+    # 只用来解析主机参数，paramiko 后端同时用它复用连接
+    pool = SSHSessionPool(username=username, password=password, key_filename=key_filename, port=port,
+                          max_workers=concurrency, connect_timeout=connect_timeout)
+    executor = None
+    if backend == 'paramiko':
+        # paramiko 是阻塞的，线程数单独封顶，超出的主机在协程层排队
+        executor = ThreadPoolExecutor(max_workers=min(concurrency, 256))
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    pending = iter(hosts)
+
+    async def run_one(server):
+        options = pool._server(server)
+        start = time.monotonic()
+        result = {'host': options['host'], 'command': command, 'exit_code': None,
+                  'stdout': '', 'stderr': '', 'error': None}
+        try:
+            if backend == 'asyncssh':
+                exit_code, stdout, stderr = await asyncio.wait_for(
+                    _run_asyncssh(options, command, connect_timeout), timeout)
+                result.update(exit_code=exit_code, stdout=(stdout or '').strip(), stderr=(stderr or '').strip())
+            else:
+                result.update(await asyncio.wait_for(
+                    loop.run_in_executor(executor, pool.exec_command, server, command, timeout), timeout))
+        except asyncio.TimeoutError:
+            result['error'] = f"timed out after {timeout}s"
+        except Exception as e:
+            result['error'] = str(e)
+        result['elapsed'] = round(time.monotonic() - start, 3)
+        return result
+
+    async def worker():
+        # 从同一个迭代器取主机，不会一次性为所有主机创建协程
+        for server in pending:
+            await queue.put(await run_one(server))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(hosts)))]
+    try:
+        for done in range(1, len(hosts) + 1):
+            result = await queue.get()
+            if progress:
+                progress(done, len(hosts), result)
+            yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        if executor:
+            executor.shutdown(wait=False)
+        pool.close()
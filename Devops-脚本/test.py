@@ -1,13 +1,20 @@
 import os
 import subprocess
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 import configparser
 import argparse
-import gzip
+import re
 import shutil
+import json
 import pymysql
 
+from backup_stream import SUFFIXES, stream_command
+from mysql_parallel import ParallelDumper, ParallelRestorer, open_compressed
+from binlog_follower import BinlogFollower, SegmentCatalog
+from dedup_store import BackupRepository
+from backup_catalog import BackupCatalog
+
 
 # 配置日志记录
 logging.basicConfig(
@@ -39,7 +46,16 @@ class MySQLNativeBackup:
         self.backup_dir = self.config.get('backup', 'backup_dir', fallback='./backups')
         self.full_backup_retention = self.config.getint('backup', 'full_backup_retention', fallback=7)
         self.inc_backup_retention = self.config.getint('backup', 'inc_backup_retention', fallback=15)
+        # 保留策略：age（按天数）、keep（保留最近 N 个全量及其增量）、gfs（每日/每周/每月）
+        self.retention_policy = self.config.get('backup', 'retention_policy', fallback='age')
+        self.keep_full_backups = self.config.getint('backup', 'keep_full_backups', fallback=7)
+        self.gfs = tuple(self.config.getint('backup', f'gfs_{period}', fallback=default)
+                         for period, default in (('daily', 7), ('weekly', 4), ('monthly', 12)))
         self.compress_backup = self.config.getboolean('backup', 'compress_backup', fallback=True)
+        # 压缩方式 gzip / zstd，线程数大于 1 时多核并行压缩（gzip 输出与 pigz 兼容）
+        self.compress_method = self.config.get('backup', 'compress_method', fallback='gzip')
+        self.compress_level = self.config.getint('backup', 'compress_level', fallback=6)
+        self.compress_workers = self.config.getint('backup', 'compress_workers', fallback=os.cpu_count() or 1)
 
         # 创建备份目录
         os.makedirs(self.backup_dir, exist_ok=True)
@@ -50,21 +66,8 @@ class MySQLNativeBackup:
         if not self.database:
             raise ValueError("Database name must be specified in config file")
 
-    def _execute_command(self, command):
-        """执行命令并记录日志"""
-        logger.info(f"Executing command: {' '.join(command)}")
-        try:
-            result = subprocess.run(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True
-            )
-            logger.debug(f"Command output: {result.stdout.decode('utf-8')}")
-            return True
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Command failed: {e.stderr.decode('utf-8')}")
-            return False
+        # 备份索引：每次备份完成时登记，清理时按索引计算过期备份
+        self.catalog = BackupCatalog(os.path.join(self.backup_dir, 'catalog.db'))
 
     def _get_backup_filename(self, backup_type):
         """生成备份文件名"""
@@ -77,25 +80,14 @@ class MySQLNativeBackup:
             raise ValueError("Invalid backup type")
 
         if self.compress_backup:
-            return base_name + '.gz'
+            return base_name + SUFFIXES[self.compress_method]
         return base_name
 
-    def _compress_file(self, filepath):
-        """压缩文件"""
-        if not self.compress_backup:
-            return filepath
-
-        compressed_path = filepath + '.gz'
-        try:
-            with open(filepath, 'rb') as f_in:
-                with gzip.open(compressed_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            os.remove(filepath)
-            logger.info(f"Compressed backup file: {compressed_path}")
-            return compressed_path
-        except Exception as e:
-            logger.error(f"Failed to compress file {filepath}: {str(e)}")
-            return filepath
+    def _stream(self, command, backup_path):
+        """按配置的压缩方式把命令输出流式写入备份文件"""
+        return stream_command(command, backup_path, compress=self.compress_backup,
+                              level=self.compress_level, method=self.compress_method,
+                              workers=self.compress_workers)
 
     def full_backup(self):
         """执行完全备份"""
@@ -104,12 +96,6 @@ class MySQLNativeBackup:
         filename = self._get_backup_filename('full')
         backup_path = os.path.join(self.backup_dir, 'full', filename)
 
-        # 如果是压缩备份，先备份到临时文件再压缩
-        if self.compress_backup:
-            temp_path = backup_path.replace('.gz', '')
-        else:
-            temp_path = backup_path
-
         command = [
             'mysqldump',
             f'--host={self.mysql_host}',
@@ -125,26 +111,88 @@ class MySQLNativeBackup:
             self.database
         ]
 
-        # 重定向输出到文件
-        with open(temp_path, 'w') as f:
-            process = subprocess.Popen(
-                command,
-                stdout=f,
-                stderr=subprocess.PIPE
-            )
-            _, stderr = process.communicate()
+        # 输出边压缩边写入最终文件，不再先写未压缩的临时文件
+        try:
+            result = self._stream(command, backup_path)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Full backup failed: {e.stderr.decode('utf-8', errors='replace')}")
+            return False
 
-            if process.returncode != 0:
-                logger.error(f"Full backup failed: {stderr.decode('utf-8')}")
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                return False
+        self.catalog.record(self.database, 'full', backup_path, result['bytes_out'], result['sha256'])
+        logger.info(f"Full backup completed successfully: {backup_path} "
+                    f"({result['bytes_in']} -> {result['bytes_out']} bytes, sha256 {result['sha256']}, "
+                    f"{result['elapsed']}s)")
+        return True
 
-        # 如果需要压缩
-        if self.compress_backup:
-            self._compress_file(temp_path)
+    def parallel_backup(self, workers=4, chunk_rows=1000000):
+        """并行逻辑备份：同一一致性快照下多个连接按表/主键范围并发导出，每块单独压缩"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_dir = os.path.join(self.backup_dir, 'full', f"{self.database}_parallel_{timestamp}")
+        logger.info(f"Starting parallel backup for database: {self.database} with {workers} connections")
+
+        dumper = ParallelDumper(self.mysql_host, self.mysql_port, self.mysql_user, self.mysql_password,
+                                self.database, workers=workers, chunk_rows=chunk_rows,
+                                method=self.compress_method if self.compress_backup else 'none',
+                                level=self.compress_level)
+        try:
+            metadata = dumper.dump(output_dir)
+        except Exception as e:
+            logger.error(f"Parallel backup failed: {str(e)}")
+            shutil.rmtree(output_dir, ignore_errors=True)
+            return False
 
-        logger.info(f"Full backup completed successfully: {backup_path}")
+        self.catalog.record(self.database, 'full', output_dir)
+        logger.info(f"Parallel backup completed successfully: {output_dir} "
+                    f"({len(metadata['chunks'])} chunks, binlog {metadata['binlog']}, {metadata['elapsed']}s)")
+        return True
+
+    def dedup_backup(self):
+        """去重全量备份：未压缩的 mysqldump 输出按内容切块存入 repo，只保存与历史备份不同的块"""
+        logger.info(f"Starting deduplicated backup for database: {self.database}")
+        repository = BackupRepository(os.path.join(self.backup_dir, 'repo'), level=self.compress_level)
+        command = [
+            'mysqldump',
+            f'--host={self.mysql_host}',
+            f'--port={self.mysql_port}',
+            f'--user={self.mysql_user}',
+            f'--password={self.mysql_password}',
+            '--single-transaction',
+            '--master-data=2',
+            '--routines',
+            '--triggers',
+            '--events',
+            # 每行一条 INSERT，少量行变化只影响附近的块
+            '--skip-extended-insert',
+            self.database
+        ]
+        try:
+            snapshot = repository.backup_command(self.database, command, f"{self.database}.sql")
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Deduplicated backup failed: {e.stderr.decode('utf-8', errors='replace')}")
+            return False
+
+        stats = snapshot['stats']
+        logger.info(f"Deduplicated backup completed successfully: {snapshot['id']} "
+                    f"({stats['bytes']} bytes, {stats['bytes_stored']} bytes new, {stats['elapsed']}s)")
+
+        # keep 策略保留最近 N 个快照，其它策略按全量备份保留天数清理
+        if self.retention_policy == 'keep':
+            removed = repository.prune(self.database, keep=self.keep_full_backups)
+        else:
+            removed = repository.prune(self.database, days=self.full_backup_retention)
+        if removed:
+            logger.info(f"Pruned {len(removed)} old snapshots, removed {repository.gc()} unreferenced chunks")
+        return True
+
+    def parallel_restore(self, backup_path, workers=4, database=None):
+        """并行恢复 parallel_backup 生成的备份目录"""
+        restorer = ParallelRestorer(self.mysql_host, self.mysql_port, self.mysql_user, self.mysql_password,
+                                    workers=workers)
+        try:
+            restorer.restore(backup_path, database)
+        except Exception as e:
+            logger.error(f"Parallel restore failed: {str(e)}")
+            return False
         return True
 
     def incremental_backup(self):
@@ -195,12 +243,7 @@ class MySQLNativeBackup:
         filename = self._get_backup_filename('inc')
         backup_path = os.path.join(self.backup_dir, 'inc', filename)
 
-        # 如果是压缩备份，先备份到临时文件再压缩
-        if self.compress_backup:
-            temp_path = backup_path.replace('.gz', '')
-        else:
-            temp_path = backup_path
-
+        # 不指定 --result-file 时 mysqlbinlog 输出到标准输出，与全量备份一样流式压缩
         command = [
             'mysqlbinlog',
             f'--host={self.mysql_host}',
@@ -208,51 +251,96 @@ class MySQLNativeBackup:
             f'--user={self.mysql_user}',
             f'--password={self.mysql_password}',
             '--read-from-remote-server',
-            '--result-file=' + temp_path,
             prev_log_file
         ]
 
-        if not self._execute_command(command):
+        logger.info(f"Streaming binary log {prev_log_file} to {backup_path}")
+        try:
+            result = self._stream(command, backup_path)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Command failed: {e.stderr.decode('utf-8', errors='replace')}")
             return False
 
-        # 如果需要压缩
-        if self.compress_backup:
-            self._compress_file(temp_path)
-
-        logger.info(f"Incremental backup completed successfully: {backup_path}")
+        self.catalog.record(self.database, 'inc', backup_path, result['bytes_out'], result['sha256'])
+        logger.info(f"Incremental backup completed successfully: {backup_path} (sha256 {result['sha256']})")
         return True
 
+    def follow_binlogs(self, segment_bytes=64 * 1024 * 1024, segment_seconds=300):
+        """持续归档 binlog（长期运行），替代定时 FLUSH BINARY LOGS 的增量备份"""
+        follower = BinlogFollower(self.mysql_host, self.mysql_port, self.mysql_user, self.mysql_password,
+                                  os.path.join(self.backup_dir, 'binlog'), segment_bytes=segment_bytes,
+                                  segment_seconds=segment_seconds,
+                                  method=self.compress_method if self.compress_backup else 'none',
+                                  level=self.compress_level)
+        logger.info(f"Starting binlog follower into {follower.archive_dir}")
+        try:
+            follower.run()
+        except KeyboardInterrupt:
+            logger.info("Binlog follower stopped")
+
+    def locate_point_in_time(self, target_time, start_binlog=None, start_pos=None):
+        """
+        查找恢复到 target_time 需要的 binlog 分段
+        未指定起点时使用 target_time 之前最近一次全量备份记录的 binlog 位置
+        """
+        if start_binlog is None:
+            base = self.catalog.latest(self.database, 'full', before=target_time.timestamp())
+            if base is None:
+                raise LookupError(f"No full backup of {self.database} before {target_time}")
+            start_binlog, start_pos = self._backup_binlog_position(base['path'])
+            logger.info(f"Recovering from full backup {base['path']} at {start_binlog}:{start_pos}")
+        catalog = SegmentCatalog(os.path.join(self.backup_dir, 'binlog', 'segments.db'))
+        try:
+            return catalog.locate(target_time, start_binlog, start_pos or 4)
+        finally:
+            catalog.close()
+
+    @staticmethod
+    def _backup_binlog_position(backup_path):
+        """读取全量备份对应的 binlog 位置：并行备份取 metadata.json，mysqldump 取 --master-data 写入的注释"""
+        if os.path.isdir(backup_path):
+            with open(os.path.join(backup_path, 'metadata.json')) as f:
+                binlog = json.load(f)['binlog']
+            if binlog:
+                return binlog['file'], binlog['position']
+        else:
+            pattern = re.compile(rb"(?:MASTER|SOURCE)_LOG_FILE='([^']+)',\s*(?:MASTER|SOURCE)_LOG_POS=(\d+)")
+            with open_compressed(backup_path) as f:
+                # 注释位于文件开头，只读取开头一段
+                match = pattern.search(f.read(65536))
+            if match:
+                return match.group(1).decode(), int(match.group(2))
+        raise LookupError(f"No binlog position recorded in {backup_path}")
+
     def cleanup_old_backups(self):
-        """清理旧的备份文件"""
-        logger.info("Starting cleanup of old backups")
-
-        # 清理完全备份
-        full_backup_dir = os.path.join(self.backup_dir, 'full')
-        cutoff_date = datetime.now() - timedelta(days=self.full_backup_retention)
-        self._delete_old_files(full_backup_dir, cutoff_date)
-
-        # 清理增量备份
-        inc_backup_dir = os.path.join(self.backup_dir, 'inc')
-        cutoff_date = datetime.now() - timedelta(days=self.inc_backup_retention)
-        self._delete_old_files(inc_backup_dir, cutoff_date)
-
-        logger.info("Cleanup completed")
-
-    def _delete_old_files(self, directory, cutoff_date):
-        """删除指定目录中早于cutoff_date的文件"""
-        if not os.path.exists(directory):
-            return
-
-        for filename in os.listdir(directory):
-            filepath = os.path.join(directory, filename)
-            if os.path.isfile(filepath):
-                file_time = datetime.fromtimestamp(os.path.getmtime(filepath))
-                if file_time < cutoff_date:
-                    try:
-                        os.remove(filepath)
-                        logger.info(f"Deleted old backup: {filepath}")
-                    except Exception as e:
-                        logger.error(f"Failed to delete {filepath}: {str(e)}")
+        """按保留策略清理旧备份：过期集合由索引查询得出，不再遍历备份目录"""
+        logger.info(f"Starting cleanup of old backups (policy: {self.retention_policy})")
+
+        # 启用索引之前的旧备份只需登记一次（已登记时直接返回）
+        self._import_existing_backups()
+
+        if self.retention_policy == 'keep':
+            expired = self.catalog.plan_keep_full(self.database, self.keep_full_backups)
+        elif self.retention_policy == 'gfs':
+            expired = self.catalog.plan_gfs(self.database, *self.gfs)
+        else:
+            expired = self.catalog.plan_age(self.database, self.full_backup_retention, self.inc_backup_retention)
+
+        deleted, errors = self.catalog.delete(expired)
+        for error in errors:
+            logger.error(f"Failed to delete {error}")
+        logger.info(f"Cleanup completed, deleted {deleted} backups")
+
+    def _import_existing_backups(self):
+        """登记启用索引之前留下的备份（每个目录仅执行一次）"""
+        database = re.escape(self.database)
+        count = self.catalog.import_directory(self.database, os.path.join(self.backup_dir, 'full'), {
+            'full': rf'{database}_(full_\d{{8}}_\d{{6}}\.sql(\.gz|\.zst)?|parallel_\d{{8}}_\d{{6}})$'
+        })
+        count += self.catalog.import_directory(self.database, os.path.join(self.backup_dir, 'inc'), {
+            'inc': rf'{database}_inc_\d{{8}}_\d{{6}}\.sql(\.gz|\.zst)?$'
+        })
+        logger.info(f"Imported {count} existing backups into the catalog")
 
 
 def main():
@@ -261,13 +349,39 @@ def main():
     parser.add_argument('--inc', action='store_true', help='Perform an incremental backup')
     parser.add_argument('--cleanup', action='store_true', help='Clean up old backups')
     parser.add_argument('--config', default='mysql_backup.ini', help='Path to config file')
+    parser.add_argument('--parallel', type=int, default=0,
+                        help='Dump/restore with N parallel connections from one consistent snapshot')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Store the full backup in the chunk-deduplicated repository')
+    parser.add_argument('--restore', metavar='BACKUP_DIR', help='Restore a parallel backup directory')
+    parser.add_argument('--follow', action='store_true', help='Continuously archive binary logs')
+    parser.add_argument('--pitr', metavar='DATETIME',
+                        help='List binlog segments needed to recover to "YYYY-mm-dd HH:MM:SS"')
+    parser.add_argument('--start-binlog', metavar='FILE',
+                        help='Binlog file to start --pitr from (default: from the latest full backup)')
+    parser.add_argument('--start-pos', type=int, default=4, help='Binlog position to start --pitr from')
 
     args = parser.parse_args()
 
     try:
         backup = MySQLNativeBackup(args.config)
 
-        if args.full:
+        if args.follow:
+            backup.follow_binlogs()
+        elif args.pitr:
+            plan = backup.locate_point_in_time(datetime.strptime(args.pitr, '%Y-%m-%d %H:%M:%S'),
+                                               args.start_binlog, args.start_pos)
+            for segment in plan['segments']:
+                logger.info(f"{segment['file']} {segment['binlog']}:{segment['start_pos']}-{segment['end_pos']}")
+            logger.info(f"Replay with mysqlbinlog --start-position={plan['start_pos']} "
+                        f"--stop-datetime='{plan['stop_datetime']}' (first file {plan['start_binlog']})")
+        elif args.restore:
+            backup.parallel_restore(args.restore, workers=args.parallel or 4)
+        elif args.dedup:
+            backup.dedup_backup()
+        elif args.full and args.parallel:
+            backup.parallel_backup(workers=args.parallel)
+        elif args.full:
             backup.full_backup()
         elif args.inc:
             backup.incremental_backup()
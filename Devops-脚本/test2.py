@@ -171,21 +171,97 @@ class NetworkInspector:
 class ServiceInspector:
     """服务检查"""
 
+    # systemd 单元状态缓存：{单元名: {'status': ..., 'load_state': ..., ...}}
+    _unit_cache = {}
+    _unit_cache_time = {}
+    UNIT_CACHE_TTL = 30
+
+    @staticmethod
+    def _unit_name(service_name):
+        """补全 systemd 单元名"""
+        return service_name if '.' in service_name else f"{service_name}.service"
+
     @staticmethod
-    def check_service(service_name):
+    def _parse_systemctl_show(output):
+        """解析 systemctl show 输出，每个单元一段，段之间以空行分隔"""
+        blocks = []
+        current = {}
+        for line in output.splitlines():
+            if not line.strip():
+                if current:
+                    blocks.append(current)
+                    current = {}
+                continue
+            key, _, value = line.partition('=')
+            current[key] = value
+        if current:
+            blocks.append(current)
+        return blocks
+
+    @staticmethod
+    def _unit_status(props):
+        """将 systemd 属性归纳为 running/stopped/failed/not_found/unknown"""
+        if props.get('LoadState') == 'not-found':
+            return 'not_found'
+        active = props.get('ActiveState')
+        if active == 'active':
+            return 'running' if props.get('SubState') in ('running', 'exited', 'listening') else 'unknown'
+        if active == 'inactive':
+            return 'stopped'
+        if active == 'failed':
+            return 'failed'
+        return 'unknown'
+
+    @classmethod
+    def query_services(cls, service_names, timeout=5, use_cache=True):
+        """一次 systemctl show 调用批量查询全部服务单元状态"""
+        units = [cls._unit_name(name) for name in service_names]
+        now = time.monotonic()
+        missing = [unit for unit in units
+                   if not use_cache or now - cls._unit_cache_time.get(unit, 0) > cls.UNIT_CACHE_TTL]
+
+        if missing:
+            output = subprocess.check_output(
+                ['systemctl', 'show', '--no-pager',
+                 '--property=Id,LoadState,ActiveState,SubState,MainPID', *missing],
+                stderr=subprocess.STDOUT, timeout=timeout
+            ).decode('utf-8', errors='ignore')
+            blocks = cls._parse_systemctl_show(output)
+            if len(blocks) != len(missing):
+                raise RuntimeError(f"systemctl show returned {len(blocks)} units, expected {len(missing)}")
+            # systemctl show 按参数顺序输出，别名单元（如 sshd -> ssh）的 Id 可能与请求名不同
+            for unit, props in zip(missing, blocks):
+                cls._unit_cache[unit] = {
+                    'unit': props.get('Id', unit),
+                    'status': cls._unit_status(props),
+                    'load_state': props.get('LoadState'),
+                    'active_state': props.get('ActiveState'),
+                    'sub_state': props.get('SubState'),
+                    'main_pid': int(props.get('MainPID') or 0)
+                }
+                cls._unit_cache_time[unit] = now
+
+        return {name: cls._unit_cache[unit] for name, unit in zip(service_names, units)}
+
+    @classmethod
+    def check_services(cls, service_names, timeout=5):
+        """批量检查服务状态，返回 {服务名: 状态}"""
+        if platform.system() == 'Linux':
+            try:
+                return {name: info['status'] for name, info in cls.query_services(service_names, timeout).items()}
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, RuntimeError, OSError) as e:
+                logger.warning(f"Batched systemd query failed, falling back to per-service checks: {str(e)}")
+        return {name: cls.check_service(name, timeout=timeout) for name in service_names}
+
+    @classmethod
+    def check_service(cls, service_name, timeout=5):
         """检查服务状态"""
         try:
             if platform.system() == 'Linux':
-                output = subprocess.check_output(['systemctl', 'status', service_name], stderr=subprocess.STDOUT)
-                output = output.decode('utf-8')
-                if 'active (running)' in output:
-                    return 'running'
-                elif 'inactive (dead)' in output:
-                    return 'stopped'
-                else:
-                    return 'unknown'
+                return cls.query_services([service_name], timeout)[service_name]['status']
             elif platform.system() == 'Windows':
-                output = subprocess.check_output(['sc', 'query', service_name], stderr=subprocess.STDOUT)
+                output = subprocess.check_output(['sc', 'query', service_name], stderr=subprocess.STDOUT,
+                                                 timeout=timeout)
                 output = output.decode('utf-8')
                 if 'RUNNING' in output:
                     return 'running'
@@ -197,6 +273,12 @@ class ServiceInspector:
                 return 'unsupported'
         except subprocess.CalledProcessError:
             return 'not_found'
+        except subprocess.TimeoutExpired:
+            return 'timeout'
+        except (RuntimeError, OSError) as e:
+            # 批量查询失败后的逐个回退也可能失败（如 systemctl 不可用），不能中断整个巡检
+            logger.warning(f"Failed to check service {service_name}: {str(e)}")
+            return 'error'
 
     @staticmethod
     def check_process(process_name):
@@ -644,7 +726,7 @@ def main():
     # 服务检查
     services = ['sshd', 'nginx', 'mysql', 'postgresql', 'redis'] if platform.system() == 'Linux' else ['MySQL',
                                                                                                        'MSSQLSERVER']
-    data['service_status'] = {service: ServiceInspector.check_service(service) for service in services}
+    data['service_status'] = ServiceInspector.check_services(services)
     data['process_status'] = {
         'python': ServiceInspector.check_process('python'),
         'java': ServiceInspector.check_process('java')
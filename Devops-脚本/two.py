@@ -1,35 +1,71 @@
-import re
+import heapq
 from collections import defaultdict
+from log_matcher import MultiPatternMatcher
+from log_checkpoint import LogCheckpointStore
+from log_mapreduce import LogMapReduce
 
+# 错误级别和IP合并为一个正则，每行只扫描一次
+LINE_MATCHER = MultiPatternMatcher({
+    'level': r'ERROR|WARNING|CRITICAL',
+    'ip': r'\d+\.\d+\.\d+\.\d+'
+})
 
 
-def analyze_log(log_file):
+def count_lines(lines, error_counts, ip_counts):
+    """统计错误类型和访问IP，结果累加到传入的计数器中"""
+    for line in lines:
+        found = LINE_MATCHER.first_matches(line)
+        # 统计错误类型
+        if 'level' in found:
+            error_counts[found['level']] += 1
+
+        # 统计IP访问
+        if 'ip' in found:
+            ip_counts[found['ip']] += 1
+
+
+def map_lines(lines):
+    """map-reduce 的 map 阶段：统计一个区间内的行"""
     error_counts = defaultdict(int)
     ip_counts = defaultdict(int)
+    count_lines(lines, error_counts, ip_counts)
+    return {'error_counts': error_counts, 'ip_counts': ip_counts}
 
-    with open(log_file, 'r') as f:
-        for line in f:
-            # 统计错误类型
-            error_match = re.search(r'ERROR|WARNING|CRITICAL', line)
-            if error_match:
-                error_type = error_match.group()
-                error_counts[error_type] += 1
 
-            # 统计IP访问
-            ip_match = re.search(r'\d+\.\d+\.\d+\.\d+', line)
-            if ip_match:
-                ip = ip_match.group()
-                ip_counts[ip] += 1
+def analyze_log(log_file, checkpoint_file=None, workers=1):
+    """
+    分析日志；指定检查点文件时只处理上次之后新增的内容，并与历史结果累加
+    workers 大于 1 时把文件切块后用多进程并行统计（log_file 也可以是文件列表）
+    """
+    if checkpoint_file:
+        store = LogCheckpointStore(checkpoint_file)
+        totals = store.aggregates(log_file)
+        error_counts = defaultdict(int, totals.get('error_counts', {}))
+        ip_counts = defaultdict(int, totals.get('ip_counts', {}))
+        count_lines(store.read_new_lines(log_file), error_counts, ip_counts)
+        totals.update(error_counts=error_counts, ip_counts=ip_counts)
+        store.save()
+    elif workers > 1 or not isinstance(log_file, str):
+        result = LogMapReduce(map_lines, workers=workers).run(log_file)
+        error_counts = result.get('error_counts', {})
+        ip_counts = result.get('ip_counts', {})
+    else:
+        error_counts = defaultdict(int)
+        ip_counts = defaultdict(int)
+        with open(log_file, 'r') as f:
+            count_lines(f, error_counts, ip_counts)
 
     print("=== 错误统计 ===")
     for error, count in error_counts.items():
         print(f"{error}: {count}次")
 
     print("\n=== 访问IP统计 ===")
-    for ip, count in sorted(ip_counts.items(), key=lambda x: x[1], reverse=True)[:5]:
+    for ip, count in heapq.nlargest(5, ip_counts.items(), key=lambda x: x[1]):
         print(f"{ip}: {count}次")
 
 
 if __name__ == "__main__":
     log_file = input("请输入日志文件路径: ")
-    analyze_log(log_file)
\ No newline at end of file
+    checkpoint_file = input("检查点文件路径（留空则全量分析）: ").strip() or None
+    workers = int(input("并行进程数（默认1）: ").strip() or 1)
+    analyze_log(log_file, checkpoint_file, workers)
\ No newline at end of file
@@ -13,14 +13,18 @@ from datetime import datetime
 from jinja2 import Template
 
 import yaml
-import paramiko
+
+from ssh_pool import SSHSessionPool
 
 class ConfigManager:
     # 初始化加载服务器的配置文件
-    def __init__(self, config_file='servers.yaml'):
+    def __init__(self, config_file='servers.yaml', workers=50):
         self.servers = self.load_config(config_file)
         self.backup_dir = 'config_backups'
         os.makedirs(self.backup_dir, exist_ok=True)
+        # 每台服务器只建立一次连接，备份、上传和执行命令都复用它
+        self.workers = workers
+        self.pool = SSHSessionPool(max_workers=workers, max_per_host=4)
 
     # 读取并加载yaml格式的配置文件
     def load_config(self, config_file):
@@ -28,31 +32,21 @@ class ConfigManager:
             # 安全加载safe_load的内容
             return yaml.safe_load(f)
 
-    # 与远程主机建立连接
+    # 从连接池获取与远程主机的连接，调用方不要关闭它
     def get_ssh_client(self, server):
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        client.connect(
-            hostname=server['192.168.1.11'],
-            port=server.get('port', 22),
-            username=server['root'],
-            password=server.get('1'),
-            # 如果使用秘钥登录，则不需要使用密码
-            key_filename=server.get('key_file')
-        )
-        return client
+        # server 中的 host/port/username/password/key_file 由连接池读取，使用秘钥登录时不需要密码
+        return self.pool.get_client(server)
 
     def get_file_content(self, server, remote_path):
-        ssh = self.get_ssh_client(server)
-        sftp = ssh.open_sftp()
+        sftp = self.pool.open_sftp(server)
 
         try:
             with sftp.file(remote_path, 'r') as f:
                 content = f.read().decode('utf-8')
                 return content
-        except:
+        finally:
+            # 只关闭 SFTP channel，SSH 连接留在连接池中
             sftp.close()
-            ssh.close()
 
     def backup_config(self, server, remote_path):
         # 备份远程服务器上的配置文件
@@ -94,16 +88,17 @@ class ConfigManager:
         return template.render(**context)
 
     def deploy_config(self, server, remote_path, content):
-        ssh = self.get_ssh_client(server)
-        sftp = ssh.open_sftp()
-
         # 备份当前配置文件
         self.backup_config(server, remote_path)
 
         # 上传新配置文件到远程服务器的临时目录
         temp_path = f"/tmp/{os.path.basename(remote_path)}.{datetime.now().timestamp()}"
-        with sftp.file(temp_path, 'w') as f:
-            f.write(content)
+        sftp = self.pool.open_sftp(server)
+        try:
+            with sftp.file(temp_path, 'w') as f:
+                f.write(content)
+        finally:
+            sftp.close()
 
         commands = [
             f"sudo cp {temp_path} {remote_path}",   # 复制文件
@@ -113,17 +108,14 @@ class ConfigManager:
         ]
 
         for cmd in commands:
-            stdin, stdout, stderr = ssh.exec_command(cmd)
+            # 每条命令在同一连接上开新的 channel 执行
+            result = self.pool.exec_command(server, cmd)
             # 检查命令执行结果
-            if stdout.channel.recv_exit_status() !=0:
-                print(f"错误执行 {cmd} on {server['host']}: {stderr.read().decode()}")
-                sftp.close()
-                ssh.close()
+            if result['exit_code'] != 0:
+                print(f"错误执行 {cmd} on {server['host']}: {result['error'] or result['stderr']}")
                 return False
 
         print(f"Config deployed successfully to {server['host']}:{remote_path}")  # 输出部署成功信息
-        sftp.close()
-        ssh.close()
         return True
 
     def check_configs(self):
@@ -171,7 +163,8 @@ class ConfigManager:
         # 批量部署配置文件到所有服务器
         content = self.generate_config(template_file, context_file)  # 生成配置文件内容
 
-        with ThreadPoolExecutor(max_workers=5) as executor:  # 创建线程池，最大工作线程数为5
+        # 连接由连接池复用，线程数与连接池的全局并发上限一致
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
             futures = []
             for server in self.servers:
                 for config_file in server['config_files']:
@@ -208,12 +201,13 @@ def main():
     # 添加位置参数
     deploy_parser.add_argument('template', help='模板文件')
     deploy_parser.add_argument('context', help='文本文件')
+    parser.add_argument('--workers', type=int, default=50, help='并发服务器数')
 
     # 检测输入参数
     args = parser.parse_args()
 
     # 生成实例
-    manager = ConfigManager()
+    manager = ConfigManager(workers=args.workers)
 
     if args.command == 'check':
         results = manager.check_configs()
@@ -233,5 +227,8 @@ def main():
         else:
             print("Some configs failed to deploy")  # 输出部署失败信息
 
+    # 关闭连接池中的所有连接
+    manager.pool.close()
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,42 +1,40 @@
 # monitor.py
-from flask import Flask, render_template
+from flask import Flask, render_template, request
+import os
+import sys
 import psutil
-import sqlite3
 import threading
 import time
+from metrics_store import MetricsStore
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from host_metrics import get_host_metrics
 
 app = Flask(__name__)
 DB_FILE = 'monitor.db'
+store = None
 
 
 def init_db():
     """初始化数据库"""
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute('''CREATE TABLE IF NOT EXISTS metrics (
-                 id INTEGER PRIMARY KEY,
-                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                 cpu REAL,
-                 memory REAL,
-                 disk REAL)''')
-    conn.commit()
-    conn.close()
+    global store
+    store = MetricsStore(DB_FILE)
 
 
 def collect_metrics():
     """收集系统指标"""
-    cpu = psutil.cpu_percent(interval=1)
-    mem = psutil.virtual_memory().percent
-    disk = psutil.disk_usage('/').percent
+    snapshot = get_host_metrics().latest()
+    cpu = snapshot['cpu_percent']
+    mem = snapshot['memory'].percent
+    # 容器等环境中分区列表可能不含根目录
+    root = snapshot['disks'].get('/')
+    disk = root[1].percent if root else psutil.disk_usage('/').percent
     return cpu, mem, disk
 
 
 def save_to_db(cpu, mem, disk):
-    """保存数据到数据库"""
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute("INSERT INTO metrics (cpu, memory, disk) VALUES (?, ?, ?)",
-                 (cpu, mem, disk))
-    conn.commit()
-    conn.close()
+    """保存数据到数据库（批量写入，由 MetricsStore 负责刷新）"""
+    store.add(cpu, mem, disk)
 
 
 def collector_loop():
@@ -50,20 +48,12 @@ def collector_loop():
 @app.route('/')
 def dashboard():
     """监控仪表盘"""
-    conn = sqlite3.connect(DB_FILE)
-
     # 获取最新数据
-    current = conn.execute(
-        "SELECT cpu, memory, disk FROM metrics ORDER BY timestamp DESC LIMIT 1"
-    ).fetchone()
-
-    # 获取历史数据（最近2小时）
-    history = conn.execute(
-        "SELECT timestamp, cpu, memory, disk FROM metrics "
-        "WHERE timestamp > datetime('now', '-2 hours')"
-    ).fetchall()
+    current = store.latest()
 
-    conn.close()
+    # 获取历史数据，?hours= 指定范围，自动选择原始数据或 5m/1h 汇总表
+    hours = request.args.get('hours', 2, type=float)
+    history = store.query(seconds=hours * 3600)
 
     return render_template('dashboard.html',
                            current=current,
@@ -0,0 +1,142 @@
+# metrics_store.py
+import sqlite3
+import threading
+import time
+
+# 原始数据与汇总表：(表名, 每个点代表的秒数, 保留秒数)
+TIERS = [
+    ('metrics', 60, 2 * 86400),
+    ('metrics_5m', 300, 30 * 86400),
+    ('metrics_1h', 3600, 365 * 86400),
+]
+
+# 汇总规则：(目标表, 来源表, 分桶表达式)，来源为原始表时每行样本数按 1 计
+ROLLUPS = [
+    ('metrics_5m', 'metrics', "datetime((CAST(strftime('%s', timestamp) AS INTEGER) / 300) * 300, 'unixepoch')"),
+    ('metrics_1h', 'metrics_5m', "strftime('%Y-%m-%d %H:00:00', timestamp)"),
+]
+
+
+class MetricsStore:
+    """
+    监控数据存储
+    单个持久连接 + WAL，批量写入，按 1m -> 5m -> 1h 自动汇总并按保留期清理，
+    查询时根据时间范围自动选择最粗但足够细的表
+    """
+
+    def __init__(self, db_file='monitor.db', batch_size=10, flush_interval=300, rollup_interval=300):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rollup_interval = rollup_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.last_rollup = 0
+        self.lock = threading.Lock()
+
+        # Flask 请求线程和采集线程共用一个连接，由 lock 串行化
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+
+    def _init_schema(self):
+        with self.lock, self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS metrics (
+                         id INTEGER PRIMARY KEY,
+                         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                         cpu REAL,
+                         memory REAL,
+                         disk REAL)''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_metrics_timestamp ON metrics (timestamp)")
+            for table, _, _ in TIERS[1:]:
+                self.conn.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+                             timestamp DATETIME PRIMARY KEY,
+                             cpu REAL,
+                             memory REAL,
+                             disk REAL,
+                             cpu_max REAL,
+                             samples INTEGER)''')
+
+    def add(self, cpu, mem, disk, timestamp=None):
+        """缓存一条采样，攒够一批或超过刷新间隔时批量写入"""
+        timestamp = timestamp or time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        with self.lock:
+            self.buffer.append((timestamp, cpu, mem, disk))
+            due = (len(self.buffer) >= self.batch_size
+                   or time.monotonic() - self.last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """把缓存的采样一次性写入数据库，必要时执行汇总和清理"""
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+            if rows:
+                with self.conn:
+                    self.conn.executemany(
+                        "INSERT INTO metrics (timestamp, cpu, memory, disk) VALUES (?, ?, ?, ?)", rows)
+            self.last_flush = time.monotonic()
+        if time.monotonic() - self.last_rollup >= self.rollup_interval:
+            self.rollup()
+
+    def rollup(self):
+        """增量汇总：只重算目标表最后一个桶（可能尚未完整）及之后的数据，然后清理过期数据"""
+        with self.lock, self.conn:
+            for target, source, bucket in ROLLUPS:
+                if source == 'metrics':
+                    cpu, memory, disk = 'AVG(cpu)', 'AVG(memory)', 'AVG(disk)'
+                    cpu_max, samples = 'MAX(cpu)', 'COUNT(*)'
+                else:
+                    # 按样本数加权，保证 1h 均值与直接从原始数据计算一致
+                    cpu = 'SUM(cpu * samples) / SUM(samples)'
+                    memory = 'SUM(memory * samples) / SUM(samples)'
+                    disk = 'SUM(disk * samples) / SUM(samples)'
+                    cpu_max, samples = 'MAX(cpu_max)', 'SUM(samples)'
+                self.conn.execute(f'''
+                    INSERT OR REPLACE INTO {target} (timestamp, cpu, memory, disk, cpu_max, samples)
+                    SELECT {bucket} AS bucket, {cpu}, {memory}, {disk}, {cpu_max}, {samples}
+                    FROM {source}
+                    WHERE timestamp >= COALESCE((SELECT MAX(timestamp) FROM {target}), '')
+                    GROUP BY bucket''')
+
+            for table, _, retention in TIERS:
+                self.conn.execute(f"DELETE FROM {table} WHERE timestamp < datetime('now', ?)",
+                                  (f'-{retention} seconds',))
+        self.last_rollup = time.monotonic()
+
+    def latest(self):
+        """最新一条采样，优先取尚未写入数据库的缓存"""
+        with self.lock:
+            if self.buffer:
+                return self.buffer[-1][1:]
+            return self.conn.execute(
+                "SELECT cpu, memory, disk FROM metrics ORDER BY timestamp DESC LIMIT 1"
+            ).fetchone()
+
+    @staticmethod
+    def choose_table(seconds, min_points=60):
+        """选择保留期覆盖该范围、且点数不少于 min_points 的最粗粒度表"""
+        covering = [tier for tier in TIERS if tier[2] >= seconds] or TIERS[-1:]
+        for table, resolution, _ in reversed(covering):
+            if seconds / resolution >= min_points:
+                return table
+        return covering[0][0]
+
+    def query(self, seconds=7200, min_points=60):
+        """查询最近 seconds 秒的数据：[(timestamp, cpu, memory, disk)]"""
+        table = self.choose_table(seconds, min_points)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT timestamp, cpu, memory, disk FROM {table} "
+                f"WHERE timestamp > datetime('now', ?) ORDER BY timestamp",
+                (f'-{int(seconds)} seconds',)
+            ).fetchall()
+            if table == 'metrics':
+                # 缓存中的采样总是比已写入的更新
+                rows.extend(self.buffer)
+        return rows
+
+    def close(self):
+        self.flush()
+        self.conn.close()
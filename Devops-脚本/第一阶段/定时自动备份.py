@@ -1,25 +1,34 @@
 # 每天凌晨3点自动备份指定目录到 /backup
 #
-# 备份文件按日期命名（如 backup_20230715.tar.gz）
+# 备份文件按日期命名（如 backup_20230715.tar.gz）；
+# 使用 --dedup 时改为存入去重仓库 /backup/repo，每次生成一个快照（如 20230715-030000-html.json.gz）
 #
 # 记录备份日志到 /var/log/backup.log
+import argparse
 import os
+import sys
 import schedule
 import time
 import shutil
 from datetime import datetime
 
-def backup_directory(source_dir, backup_dir = "/backup"):
-    "执行目录备份"
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dedup_store import BackupRepository
+
+def backup_directory(source_dir, backup_dir = "/backup", dedup=False, keep=7):
+    "执行目录备份：默认打包为 tar.gz，dedup=True 时存入去重仓库，每天只保存新增或变化的数据块"
     if not os.path.exists(source_dir):
         log_message(f"错误: 源目录不存在 {source_dir}")
         return
 
-    os.makedir(backup_dir,exist_ok=True)
+    os.makedirs(backup_dir,exist_ok=True)
+    if dedup:
+        backup_to_repository(source_dir, os.path.join(backup_dir, "repo"), keep)
+        return
+
     timestamp = datetime.now().strftime("%Y%m%d-%H")
     backup_name = f"backup_{timestamp}.tar.gz"
-    backup_path = os.path.join(source_dir, backup_name)
-
+    backup_path = os.path.join(backup_dir, backup_name)
 
     try:
         shutil.make_archive(
@@ -27,23 +36,49 @@ def backup_directory(source_dir, backup_dir = "/backup"):
             'gztar',
             source_dir
         )
+        log_message(f"备份成功: {backup_path}")
+    except Exception as e:
+        log_message(f"备份失败: {str(e)}")
+
+def backup_to_repository(source_dir, repo_dir, keep):
+    "存入去重仓库，只保留最近 keep 个快照"
+    repository = BackupRepository(repo_dir)
+
+    try:
+        snapshot = repository.backup(source_dir)
+        stats = snapshot['stats']
+        log_message(f"备份成功: {snapshot['id']} 文件 {stats['files']} 个，变化 {stats['changed']} 个，"
+                    f"新增存储 {stats['bytes_stored']} 字节，耗时 {stats['elapsed']}s")
+        for error in stats['errors']:
+            log_message(f"警告: 读取失败 {error}")
+        # 删除快照后回收不再被引用的数据块
+        removed = repository.prune(snapshot['name'], keep=keep)
+        if removed:
+            log_message(f"已删除 {len(removed)} 个旧快照，回收 {repository.gc()} 个数据块")
     except Exception as e:
         log_message(f"备份失败: {str(e)}")
 
 def log_message(message):
     timestamp = datetime.now().strftime("%Y%m%d-%H")
-    log_entry = f"[{timestamp} {message}\n]"
+    log_entry = f"[{timestamp}] {message}\n"
     with open("/var/log/backup.log","a") as f:
         f.write(log_entry)
     print(log_entry.strip())
 
-schedule.every().day.at("03:00").do(
-    backup_directory,
-    source_dir="/var/www/html"
-)
-
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='每天凌晨 3 点备份 /var/www/html')
+    parser.add_argument('--dedup', action='store_true', help='存入去重仓库 /backup/repo，只保存变化的数据块')
+    parser.add_argument('--keep', type=int, default=7, help='去重仓库保留的快照数')
+    args = parser.parse_args()
+
+    schedule.every().day.at("03:00").do(
+        backup_directory,
+        source_dir="/var/www/html",
+        dedup=args.dedup,
+        keep=args.keep
+    )
+
     print("备份服务启动，等待执行")
     while True:
         schedule.run_pending()
-        time.sleep(60)
\ No newline at end of file
+        time.sleep(60)
@@ -1,36 +1,41 @@
-import socket
-import concurrent.futures
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from port_prober import expand_targets, probe_many, probe_port
 
 
 def check_port(host, port, timeout=2):
     """检查指定端口是否开放"""
-    try:
-        with socket.create_connection((host, port), timeout=timeout):
-            return True
-    except (socket.timeout, ConnectionRefusedError):
-        return False
+    return asyncio.run(probe_port(host, port, timeout=timeout))['status'] == 'open'
 
 
-def port_scanner(host, ports):
+def port_scanner(host, ports, concurrency=500, timeout=2, grab_banner=False):
     """
     批量扫描主机端口
-    :param host: 目标主机
+    :param host: 目标主机、主机列表或网段
     :param ports: 端口列表
     """
-    print(f"扫描 {host} 的端口状态...")
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=50) as executor:
-        futures = {executor.submit(check_port, host, port): port for port in ports}
-
-        for future in concurrent.futures.as_completed(futures):
-            port = futures[future]
-            try:
-                if future.result():
-                    print(f"🟢 端口 {port} 开放")
-            except Exception as e:
-                print(f"❌ 扫描 {port} 出错: {str(e)}")
-
-
-# 扫描常见服务端口
-common_ports = [21, 22, 80, 443, 3306, 6379, 8080]
-port_scanner("192.168.1.100", common_ports)
\ No newline at end of file
+    hosts = [host] if isinstance(host, str) else list(host)
+    print(f"扫描 {', '.join(hosts)} 的端口状态...")
+
+    async def run():
+        open_ports = []
+        async for result in probe_many(expand_targets(hosts, ports), concurrency=concurrency,
+                                       timeout=timeout, grab_banner=grab_banner):
+            if result['status'] == 'open':
+                banner = f" [{result['banner']}]" if result['banner'] else ''
+                print(f"🟢 {result['host']} 端口 {result['port']} 开放{banner}")
+                open_ports.append(result)
+            elif result['status'] == 'error':
+                print(f"❌ 扫描 {result['host']}:{result['port']} 出错: {result['error']}")
+        return open_ports
+
+    return asyncio.run(run())
+
+
+if __name__ == '__main__':
+    # 扫描常见服务端口
+    common_ports = [21, 22, 80, 443, 3306, 6379, 8080]
+    port_scanner("192.168.1.100", common_ports, grab_banner=True)
@@ -1,7 +1,12 @@
+import os
+import sys
 import psutil
 import platform
 import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cpu_sampler import get_sampler
+
 
 def server_health_check():
     """综合服务器健康检查"""
@@ -13,7 +18,7 @@ def server_health_check():
     }
 
     # 1. CPU检查
-    cpu_usage = psutil.cpu_percent(interval=1)
+    cpu_usage = get_sampler(track_processes=False).host_percent()
     cpu_status = "OK" if cpu_usage < 80 else "WARNING"
     report["checks"].append({
         "name": "CPU使用率",
@@ -1,8 +1,14 @@
+import argparse
 import os
-import shutil
+import sys
+import tarfile
 import datetime
 
-def create_backup(source_dir, dest_dir):
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backup_stream import SUFFIXES, CompressedWriter
+from dedup_store import BackupRepository
+
+def create_backup(source_dir, dest_dir, method='gzip', level=6, workers=None):
     if not os.path.exists(source_dir):
         print(f"错误: 源目录不存在 {source_dir}")
         return False
@@ -12,14 +18,48 @@ def create_backup(source_dir, dest_dir):
 
     # 生成带时间戳的备份文件名
     timestamp = datetime.datetime.now().strftime("%Y%m%d-%H")
-    backup_name = f"backup_{os.path.basename(source_dir)}_{timestamp}.tar.gz"
+    backup_name = f"backup_{os.path.basename(source_dir)}_{timestamp}.tar{SUFFIXES[method]}"
     backup_path = os.path.join(dest_dir,backup_name)
 
-    # 创建压缩包
-    shutil.make_archive(backup_path.replace('.tar.gz', ''), 'gztar', source_dir)
-    print(f"备份创建成功: {backup_path}")
+    # 创建压缩包：tar 流式写入多线程压缩器，默认使用全部 CPU 核心
+    writer = CompressedWriter(backup_path, method, level, workers or os.cpu_count() or 1)
+    try:
+        with tarfile.open(fileobj=writer, mode='w|') as tar:
+            tar.add(source_dir, arcname='.')
+        checksum = writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    print(f"备份创建成功: {backup_path} (sha256 {checksum})")
     return backup_path
 
+def create_dedup_backup(source_dir, repo_dir, workers=None, keep=7):
+    """增量去重备份：只读取变化的文件，只存储仓库中没有的数据块；只保留最近 keep 个快照"""
+    if not os.path.exists(source_dir):
+        print(f"错误: 源目录不存在 {source_dir}")
+        return False
+
+    repository = BackupRepository(repo_dir, workers)
+    snapshot = repository.backup(source_dir)
+    stats = snapshot['stats']
+    print(f"快照创建成功: {snapshot['id']} (变化文件 {stats['changed']}/{stats['files']}, "
+          f"读取 {stats['bytes_read']} 字节, 新增存储 {stats['bytes_stored']} 字节)")
+    for error in stats['errors']:
+        print(f"警告: {error}")
+
+    removed = repository.prune(snapshot['name'], keep=keep)
+    if removed:
+        print(f"已删除 {len(removed)} 个旧快照，回收 {repository.gc()} 个数据块")
+    return snapshot['id']
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='目录备份')
+    parser.add_argument('--dedup', action='store_true', help='存入去重仓库 /backups/web/repo，只保存变化的数据块')
+    parser.add_argument('--keep', type=int, default=7, help='去重仓库保留的快照数')
+    args = parser.parse_args()
+
     # 备份目录
-    create_backup("/var/www/html","/backups/web")
\ No newline at end of file
+    if args.dedup:
+        create_dedup_backup("/var/www/html", "/backups/web/repo", keep=args.keep)
+    else:
+        create_backup("/var/www/html","/backups/web")
\ No newline at end of file
@@ -1,37 +1,41 @@
+import os
+import sys
 import time
-import psutil
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from proc_table import ProcessTable
 
 
 def monitor_process(resource_type='memory', threshold=500, interval=3):
     print(f'开始监控{resource_type.upper()} 占用... (ctrl + c 退出)')
 
     try:
+        # 每个周期只遍历一次 /proc，内存和 CPU 检查都基于同一份快照
+        previous = ProcessTable.scan()
         while True:
+            time.sleep(interval)
+            snapshot = ProcessTable.scan()
             found = False
-            for proc in psutil.process_iter(['pid', 'name', 'memory_info', 'cpu_percent']):
-                try:
-                    # 内存监控模式
-                    if resource_type == 'memory':
-                        mem_mb = proc.info['memory_info'].rss / 1024 / 1024
-                        if mem_mb > threshold:
-                            print(f"🚨 内存超标 [{proc.info['name']}]: "
-                                  f"{mem_mb:.1f}MB > {threshold}MB (PID:{proc.info['pid']})")
-                            found = True
-
-                    # CPU监控模式
-                    elif resource_type == 'cpu':
-                        # 获取1秒内的CPU使用率
-                        proc.info['cpu_percent'] = proc.cpu_percent(interval=1)
-                        if proc.info['cpu_percent'] > threshold:
-                            print(f"🚨 CPU超标 [{proc.info['name']}]: "
-                                  f"{proc.info['cpu_percent']:.1f}% > {threshold}% (PID:{proc.info['pid']})")
-                            found = True
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-
-                if not found:
-                    print(f"🆗 CPU正常 [{proc.info['name']}]: ")
-                    time.sleep(interval)
+
+            # 内存监控模式
+            if resource_type == 'memory':
+                for proc in snapshot.rss_above(threshold * 1024 * 1024):
+                    mem_mb = proc['rss'] / 1024 / 1024
+                    print(f"🚨 内存超标 [{proc['name']}]: "
+                          f"{mem_mb:.1f}MB > {threshold}MB (PID:{proc['pid']})")
+                    found = True
+
+            # CPU监控模式：与上一周期的快照比较，得到整个周期内的平均CPU使用率
+            elif resource_type == 'cpu':
+                for pid, cpu_percent in snapshot.cpu_percent(previous).items():
+                    if cpu_percent > threshold:
+                        print(f"🚨 CPU超标 [{snapshot.get(pid)['name']}]: "
+                              f"{cpu_percent:.1f}% > {threshold}% (PID:{pid})")
+                        found = True
+
+            if not found:
+                print(f"🆗 {resource_type.upper()}正常 (共 {len(snapshot)} 个进程)")
+            previous = snapshot
 
     except KeyboardInterrupt:
         print("\n监控已停止")
@@ -1,32 +1,31 @@
-import paramiko
+import os
+import sys
 from pathlib import Path
 
-def deploy_ssh_key(hosts, username, password, pub_key_path="~/.ssh/id_rsa"):
-    pub_key = Path(pub_key_path).expanduser().readtext()
-    for host in hosts:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        try:
-            ssh.connect(host, username=username, password=password)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ssh_pool import SSHSessionPool
 
-            stdin, stdout, stderr = ssh.exec_command(
-                'mkdir -p ~/.ssh && grep -q "{}" ~/.ssh/authorized_keys || echo "{}" >> ~/.ssh/authorized_keys'.format(
-                    pub_key.strip(), pub_key))
 
-            if stderr.read():
+def deploy_ssh_key(hosts, username, password, pub_key_path="~/.ssh/id_rsa.pub"):
+    pub_key = Path(pub_key_path).expanduser().read_text().strip()
+    command = 'mkdir -p ~/.ssh && grep -q "{}" ~/.ssh/authorized_keys || echo "{}" >> ~/.ssh/authorized_keys'.format(
+        pub_key, pub_key)
+
+    # 所有主机并发推送，结果按完成顺序输出
+    with SSHSessionPool(username=username, password=password, max_workers=20) as pool:
+        for result in pool.run(hosts, command):
+            host = result['host']
+            if result['error']:
+                print(f"[{host}] 连接异常: {result['error']}")
+            elif result['exit_code'] != 0 or result['stderr']:
                 print(f"[{host}] 公钥部署失败")
             else:
                 print(f"[{host}] 公钥部署成功")
 
-        except Exception as e:
-            print(f"[{host}] 连接异常: {str(e)}")
-        finally:
-            ssh.close()
-
 
 if __name__ == '__main__':
     deploy_ssh_key(
         hosts=["192.168.1.11", "192.168.1.12", "192.168.1.13"],
         username = "root",
         password = "123456"
-    )
\ No newline at end of file
+    )
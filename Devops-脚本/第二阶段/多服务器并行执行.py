@@ -1,26 +1,43 @@
-import paramiko
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ssh_pool import SSHSessionPool, run_on_hosts
+
+# 同一主机上的多条命令复用一个已认证的连接
+pool = SSHSessionPool(max_workers=20, max_per_host=4)
+
 
 def run_remote_command(host, command, username, key_filename="~/.ssh/id_rsa"):
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-    try:
-        ssh.connect(host,username=username, key_filename=key_filename)
-        stdin, stdout, stderr = ssh.exec_command(command)
-        return f"{host}: {stdout.read().decode().strip()}"
-    except Exception as e:
-        return f"{host}: ERROR - {str(e)}"
-    finally:
-        ssh.close()
-
-
-hosts= [f"192.168.1.{i}" for i in range(101, 111)]
-with ThreadPoolExecutor(max_workers=5 ) as executor:
-    results = list(executor.map(
-        lambda h: run_remote_command(h, "uptime," "root"),
-        hosts
-    ))
-
-for result in results:
-    print(result)
\ No newline at end of file
+    result = pool.exec_command(
+        {'host': host, 'username': username, 'key_file': key_filename}, command)
+    if result['error']:
+        return f"{host}: ERROR - {result['error']}"
+    return f"{host}: {result['stdout']}"
+
+
+async def fan_out(hosts, command, concurrency=500, timeout=60):
+    """异步批量执行，每完成一台主机就输出一行，并显示总进度"""
+    failed = []
+
+    def progress(done, total, result):
+        if done % 100 == 0 or done == total:
+            print(f"进度: {done}/{total}")
+
+    async for result in run_on_hosts(hosts, command, concurrency=concurrency,
+                                     timeout=timeout, progress=progress):
+        if result['error'] or result['exit_code'] != 0:
+            failed.append(result['host'])
+            print(f"{result['host']}: ERROR - {result['error'] or result['stderr']} ({result['elapsed']}s)")
+        else:
+            print(f"{result['host']}: {result['stdout']} ({result['elapsed']}s)")
+    return failed
+
+
+if __name__ == '__main__':
+    hosts = [{'host': f"192.168.1.{i}", 'username': "root", 'key_file': "~/.ssh/id_rsa"}
+             for i in range(101, 111)]
+    failed = asyncio.run(fan_out(hosts, "uptime"))
+    print(f"失败主机: {len(failed)}")
+    pool.close()
@@ -1,29 +1,398 @@
-import paramiko
-from scp import SCPClient
+import hashlib
+import json
+import math
+import mmap
 import os
-import filecmp
+import select
+import tempfile
+import time
+import zlib
+
+import paramiko
+
+# 远程端只依赖 python3 标准库，脚本通过 stdin 传给 "python3 -"，不需要在服务器上部署任何文件
+REMOTE_MANIFEST = r'''
+import json, os, sys
+root = sys.argv[1]
+files, dirs = {}, []
+for base, subdirs, names in os.walk(root):
+    dirs.append(os.path.relpath(base, root))
+    for name in names:
+        path = os.path.join(base, name)
+        try:
+            st = os.lstat(path)
+        except OSError:
+            continue
+        files[os.path.relpath(path, root)] = [st.st_size, int(st.st_mtime)]
+json.dump({'files': files, 'dirs': dirs}, sys.stdout)
+'''
+
+REMOTE_SIGNATURES = r'''
+import hashlib, json, os, sys, zlib
+root, request = sys.argv[1], json.loads(REQUEST)
+result = {}
+for rel, block_size in request.items():
+    blocks = []
+    with open(os.path.join(root, rel), 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            blocks.append([zlib.adler32(block), hashlib.md5(block).hexdigest()])
+    result[rel] = blocks
+json.dump(result, sys.stdout)
+'''
+
+REMOTE_PATCH = r'''
+import json, os, sys
+root, ops_file, data_file = sys.argv[1:4]
+with open(ops_file) as f:
+    bundle = json.load(f)
+with open(data_file, 'rb') as data:
+    for rel, entry in bundle.items():
+        target = os.path.join(root, rel)
+        tmp = target + '.sync-tmp'
+        block_size = entry['block_size']
+        with open(target, 'rb') as old, open(tmp, 'wb') as new:
+            for kind, start, length in entry['ops']:
+                if kind == 'c':
+                    old.seek(start * block_size)
+                    new.write(old.read(length * block_size))
+                else:
+                    data.seek(start)
+                    new.write(data.read(length))
+        os.chmod(tmp, entry['mode'])
+        os.utime(tmp, (entry['mtime'], entry['mtime']))
+        os.replace(tmp, target)
+os.remove(ops_file)
+os.remove(data_file)
+'''
+
+MOD_ADLER = 65521
+
+
+def choose_block_size(size):
+    """与 rsync 类似按文件大小的平方根选择块大小，限制在 4KB ~ 128KB"""
+    return max(4096, min(128 * 1024, 1 << max(0, math.ceil(math.log2(math.isqrt(size) or 1)))))
+
+
+def file_signatures(path, block_size):
+    """按块计算 (adler32 弱校验, md5 强校验)，与远程脚本的算法一致"""
+    blocks = []
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            blocks.append([zlib.adler32(block), hashlib.md5(block).hexdigest()])
+    return blocks
+
+
+def compute_delta(path, blocks, block_size, literals):
+    """
+    rsync 式差异计算：先按块对齐比较，对不上时用滚动校验逐字节寻找旧文件中的块，
+    未变化的区域只需要 C 实现的 adler32，逐字节滚动只发生在修改过的区域
+    :param blocks: 远程旧文件的块签名
+    :param literals: 字面数据写入的临时文件，返回的 'l' 操作记录其中的偏移
+    :return: [('c', 旧块序号, 连续块数) | ('l', 偏移, 长度)], 字面数据字节数
+    """
+    index = {}
+    for number, (weak, strong) in enumerate(blocks):
+        index.setdefault(weak, []).append((strong, number))
+
+    ops = []
+    literal_bytes = 0
+
+    def emit_copy(number):
+        if ops and ops[-1][0] == 'c' and ops[-1][1] + ops[-1][2] == number:
+            ops[-1] = ('c', ops[-1][1], ops[-1][2] + 1)
+        else:
+            ops.append(('c', number, 1))
+
+    def emit_literal(chunk):
+        nonlocal literal_bytes
+        if not chunk:
+            return
+        offset = literals.tell()
+        literals.write(chunk)
+        literal_bytes += len(chunk)
+        if ops and ops[-1][0] == 'l' and ops[-1][1] + ops[-1][2] == offset:
+            ops[-1] = ('l', ops[-1][1], ops[-1][2] + len(chunk))
+        else:
+            ops.append(('l', offset, len(chunk)))
+
+    def lookup(weak, window):
+        candidates = index.get(weak)
+        if candidates:
+            strong = hashlib.md5(window).hexdigest()
+            for candidate, number in candidates:
+                if candidate == strong:
+                    return number
+        return None
+
+    size = os.path.getsize(path)
+    if size == 0:
+        return ops, 0
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        pos = 0
+        while pos < size:
+            window = data[pos:pos + block_size]
+            number = lookup(zlib.adler32(window), window)
+            if number is not None:
+                emit_copy(number)
+                pos += len(window)
+                continue
+
+            # 对齐位置没有命中，在一个块的范围内滚动查找（处理插入和删除造成的偏移）
+            n = len(window)
+            a = zlib.adler32(window) & 0xffff
+            b = zlib.adler32(window) >> 16
+            start, found = pos, None
+            while start + n < size and start - pos < block_size:
+                out_byte, in_byte = data[start], data[start + n]
+                a = (a - out_byte + in_byte) % MOD_ADLER
+                b = (b - n * out_byte + a - 1) % MOD_ADLER
+                start += 1
+                weak = (b << 16) | a
+                if weak in index:
+                    found = lookup(weak, data[start:start + n])
+                    if found is not None:
+                        break
+            if found is not None:
+                emit_literal(data[pos:start])
+                emit_copy(found)
+                pos = start + n
+            elif start == pos:
+                # 文件末尾不足以滚动的最后一段
+                emit_literal(window)
+                pos += n
+            else:
+                emit_literal(data[pos:start])
+                pos = start
+    return ops, literal_bytes
+
+
+class ManifestCache:
+    """
+    本地清单缓存：记录上次同步后远程文件的 (大小, 修改时间, 块签名)
+    远程文件未被改动时直接使用缓存的签名，不需要在服务器上重新读取计算
+    """
+
+    def __init__(self, path, target):
+        self.path = path
+        self.target = target
+        self.data = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+        self.entries = self.data.setdefault(target, {})
+
+    def signatures(self, rel, size, mtime, block_size):
+        entry = self.entries.get(rel)
+        if entry and entry['size'] == size and entry['mtime'] == mtime and entry['block_size'] == block_size:
+            return entry['blocks']
+        return None
+
+    def update(self, rel, size, mtime, block_size, blocks):
+        self.entries[rel] = {'size': size, 'mtime': mtime, 'block_size': block_size, 'blocks': blocks}
+
+    def prune(self, existing):
+        for rel in set(self.entries) - set(existing):
+            del self.entries[rel]
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+
+def run_remote_python(ssh, script, *args):
+    """在远程执行一段 python3 脚本并解析其 JSON 输出"""
+    command = 'python3 - ' + ' '.join("'" + arg.replace("'", "'\\''") + "'" for arg in args)
+    stdin, stdout, stderr = ssh.exec_command(command)
+    stdin.write(script)
+    stdin.channel.shutdown_write()
+    output, error = read_channel(stdout.channel)
+    if stdout.channel.recv_exit_status() != 0:
+        raise RuntimeError(f"远程脚本执行失败: {error.decode('utf-8', errors='replace')}")
+    return json.loads(output) if output else None
+
+
+def read_channel(channel):
+    """同时读取 stdout 和 stderr，避免远端错误输出写满窗口后双方互相等待"""
+    stdout, stderr = [], []
+    while True:
+        if channel.recv_ready():
+            stdout.append(channel.recv(32768))
+        elif channel.recv_stderr_ready():
+            stderr.append(channel.recv_stderr(32768))
+        elif channel.exit_status_ready() and channel.eof_received:
+            break
+        else:
+            select.select([channel], [], [], 1.0)
+    # 退出状态到达后把残留数据读完
+    while channel.recv_ready():
+        stdout.append(channel.recv(32768))
+    while channel.recv_stderr_ready():
+        stderr.append(channel.recv_stderr(32768))
+    return b''.join(stdout), b''.join(stderr)
+
+
+def remote_mktemp(ssh):
+    """在远程用 mktemp 创建随机命名的临时目录，避免可预测的 /tmp 路径"""
+    stdin, stdout, stderr = ssh.exec_command('mktemp -d /tmp/.sync-XXXXXXXXXX')
+    output, error = read_channel(stdout.channel)
+    if stdout.channel.recv_exit_status() != 0:
+        raise RuntimeError(f"远程创建临时目录失败: {error.decode('utf-8', errors='replace')}")
+    return output.decode('utf-8').strip()
+
+
+def upload_file(sftp, local_path, remote_path, chunk_size=1024 * 1024):
+    """流水线方式上传，写请求连续发送不逐个等待确认，完成后原子替换"""
+    tmp = remote_path + '.sync-tmp'
+    with open(local_path, 'rb') as src, sftp.open(tmp, 'wb') as dst:
+        dst.set_pipelined(True)
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            dst.write(chunk)
+    st = os.stat(local_path)
+    sftp.chmod(tmp, st.st_mode & 0o7777)
+    sftp.utime(tmp, (int(st.st_mtime), int(st.st_mtime)))
+    sftp.posix_rename(tmp, remote_path)
+
+
+def sync_files(local_dir, remote_host, remote_dir, username, password=None, key_filename=None,
+               cache_file='.sync_manifest.json'):
+    """
+    增量同步本地目录到远程目录
+    1. 一次远程调用取回远程清单（大小、修改时间）
+    2. 大小和修改时间一致的文件直接跳过；有变化的文件优先使用本地缓存的块签名，
+       缓存失效的文件再一次性请求远程计算签名
+    3. 只上传变化的数据块：新文件直接上传，已有文件上传差异包，由远程脚本一次重组
+    """
+    stats = {'files': 0, 'skipped': 0, 'uploaded': 0, 'patched': 0,
+             'bytes_sent': 0, 'bytes_total': 0, 'elapsed': 0}
+    start_time = time.monotonic()
+    remote_dir = remote_dir.rstrip('/')
+    cache = ManifestCache(cache_file, f"{username}@{remote_host}:{remote_dir}")
 
-def sync_files(local_dir, remote_host, remote_dir, username):
     ssh = paramiko.SSHClient()
     ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    ssh.connect(remote_host, username=username)
+    ssh.connect(remote_host, username=username, password=password, key_filename=key_filename)
+
+    try:
+        ssh.exec_command(f"mkdir -p '{remote_dir}'")[1].channel.recv_exit_status()
+        manifest = run_remote_python(ssh, REMOTE_MANIFEST, remote_dir)
+        remote_files, remote_dirs = manifest['files'], set(manifest['dirs'])
 
-    with SCPClient(ssh.get_transport()) as scp:
-        for root,_, files in os.walk(local_dir):
+        new_files, changed = [], {}
+        local_files = []
+        for root, _, files in os.walk(local_dir):
             for file in files:
                 local_path = os.path.join(root, file)
-                remote_path = os.path.join(remote_dir, os.path.relpath(local_path, local_dir))
+                if os.path.islink(local_path):
+                    continue
+                rel = os.path.relpath(local_path, local_dir)
+                st = os.stat(local_path)
+                local_files.append(rel)
+                stats['files'] += 1
+                stats['bytes_total'] += st.st_size
+
+                remote = remote_files.get(rel)
+                if remote and remote[0] == st.st_size and remote[1] == int(st.st_mtime):
+                    stats['skipped'] += 1
+                    continue
+                if not remote or remote[0] == 0 or st.st_size == 0:
+                    new_files.append(rel)
+                else:
+                    changed[rel] = choose_block_size(remote[0])
+
+        # 缓存未命中的文件，一次调用取回全部签名
+        signatures, missing = {}, {}
+        for rel, block_size in changed.items():
+            size, mtime = remote_files[rel]
+            blocks = cache.signatures(rel, size, mtime, block_size)
+            if blocks is None:
+                missing[rel] = block_size
+            else:
+                signatures[rel] = blocks
+        if missing:
+            script = f"REQUEST = {json.dumps(missing)!r}\n" + REMOTE_SIGNATURES
+            signatures.update(run_remote_python(ssh, script, remote_dir))
+
+        sftp = ssh.open_sftp()
+        try:
+            # 远程清单已包含目录列表，只创建缺少的目录
+            for rel in sorted({os.path.dirname(rel) or '.' for rel in new_files} - remote_dirs):
+                parts = rel.split(os.sep)
+                for depth in range(1, len(parts) + 1):
+                    sub = os.path.join(*parts[:depth])
+                    if sub not in remote_dirs:
+                        sftp.mkdir(f"{remote_dir}/{sub}")
+                        remote_dirs.add(sub)
+
+            for rel in new_files:
+                local_path = os.path.join(local_dir, rel)
+                print(f"上传: {local_path} => {remote_host}:{remote_dir}/{rel}")
+                upload_file(sftp, local_path, f"{remote_dir}/{rel}")
+                stats['uploaded'] += 1
+                stats['bytes_sent'] += os.path.getsize(local_path)
+
+            bundle = {}
+            with tempfile.TemporaryFile() as literals:
+                for rel, block_size in changed.items():
+                    local_path = os.path.join(local_dir, rel)
+                    ops, literal_bytes = compute_delta(local_path, signatures[rel], block_size, literals)
+                    st = os.stat(local_path)
+                    bundle[rel] = {'block_size': block_size, 'ops': ops,
+                                   'mode': st.st_mode & 0o7777, 'mtime': int(st.st_mtime)}
+                    print(f"差异同步: {local_path} => {remote_host}:{remote_dir}/{rel} ({literal_bytes} 字节变化)")
+                    stats['patched'] += 1
+
+                if bundle:
+                    tmp_dir = remote_mktemp(ssh)
+                    token = f"{tmp_dir}/delta"
+                    ops_data = json.dumps(bundle).encode('utf-8')
+                    with sftp.open(token + '.json', 'wb') as f:
+                        f.set_pipelined(True)
+                        f.write(ops_data)
+                    literals.seek(0)
+                    with sftp.open(token + '.bin', 'wb') as f:
+                        f.set_pipelined(True)
+                        while True:
+                            chunk = literals.read(1024 * 1024)
+                            if not chunk:
+                                break
+                            f.write(chunk)
+                    stats['bytes_sent'] += len(ops_data) + literals.tell()
+                    try:
+                        run_remote_python(ssh, REMOTE_PATCH, remote_dir, token + '.json', token + '.bin')
+                    finally:
+                        ssh.exec_command(f"rm -rf '{tmp_dir}'")[1].channel.recv_exit_status()
+        finally:
+            sftp.close()
 
-                # 检查远程文件是否存在及是否相同
-                stdin, stdout, stderr = ssh.exec_command(f"test -f {remote_path} && echo 'exists")
-                if 'exists' in stdout.read().decode('utf-8'):
-                    if filecmp.cmp(local_path,remote_path):
-                        continue
-                print(f"同步: {local_path} => {remote_host}:{remote_path}")
-                scp.put(local_path,remote_path)
+        # 同步后远程文件与本地一致，记录本地签名供下次使用
+        for rel in new_files + list(changed):
+            local_path = os.path.join(local_dir, rel)
+            st = os.stat(local_path)
+            block_size = choose_block_size(st.st_size)
+            cache.update(rel, st.st_size, int(st.st_mtime), block_size, file_signatures(local_path, block_size))
+        cache.prune(local_files)
+        cache.save()
+    finally:
+        ssh.close()
 
-    ssh.close()
+    stats['elapsed'] = round(time.monotonic() - start_time, 2)
+    print(f"同步完成: {stats['files']} 个文件，跳过 {stats['skipped']}，上传 {stats['uploaded']}，"
+          f"差异同步 {stats['patched']}，发送 {stats['bytes_sent']}/{stats['bytes_total']} 字节，"
+          f"耗时 {stats['elapsed']} 秒")
+    return stats
 
 
 if __name__ == '__main__':
-    sync_files("/data/configs", "backup.server.com", "/backup/configs", "ops")
\ No newline at end of file
+    sync_files("/data/configs", "backup.server.com", "/backup/configs", "ops")
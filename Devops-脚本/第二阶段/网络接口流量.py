@@ -1,17 +1,24 @@
-import psutil
+import os
 import sys
 import time
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from host_metrics import get_host_metrics
+
 
 def monitor_network(interface_name, interval):
     log_file_path = f"{interface_name}_traffice.log"
+    # 网卡计数器读自共享指标缓存，按监控间隔刷新
+    metrics = get_host_metrics(interval)
     with open(log_file_path, 'a') as log_file:
         while True:
             try:
-                net_io = psutil.net_io_counters(pernic=True)
+                snapshot = metrics.latest()
+                net_io = snapshot['network']
                 if interface_name in net_io:
                     interface = net_io[interface_name]
-                    log_entry = f"{time.strtime('%Y-%m-%d %H:%M:%S')} -  Bytes Sent: {interface.bytes_sent}, Bytes Received: {interface.bytes_recv}\n"
+                    sampled = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot['timestamp']))
+                    log_entry = f"{sampled} -  Bytes Sent: {interface.bytes_sent}, Bytes Received: {interface.bytes_recv}\n"
                     log_file.write(log_entry)
                     log_file.flush()
                 else:
@@ -20,7 +27,7 @@ def monitor_network(interface_name, interval):
             except Exception as e:
                 print(f"发生错误 {e}")
                 break
-        time.sleep(interval)
+            time.sleep(interval)
 
 
 if __name__ == '__main__':
@@ -1,36 +1,44 @@
 import logging
+import sys
+import tarfile
 from datetime import datetime
-import shutil
 import paramiko
 import smtplib
 from email.mime.text import MIMEText
 import os
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backup_stream import SFTPSink, CompressedWriter
+
 logging.basicConfig(filename = 'backup_log.txt', level = logging.INFO,
                     format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 
-def backup_directory(local_dir, remote_dir, hostname, port, username, password):
+def backup_directory(local_dir, remote_dir, hostname, port, username, password, level=6, workers=None):
     try:
-        backup_file = f"{local_dir}_{datetime.now().strftime('%Y%m%d%H%M%S')}.tar.gz"
-        shutil.make_archive(backup_file.replace('.tar.gz', ''), 'gztar', local_dir)
-        logging.info(f"成功创建备份文件: {backup_file}")
+        backup_file = f"{os.path.basename(local_dir.rstrip('/'))}_{datetime.now().strftime('%Y%m%d%H%M%S')}.tar.gz"
+        remote_path = f"{remote_dir.rstrip('/')}/{backup_file}"
 
         # 通过SSH上传备份文件到远程服务器
         ssh = paramiko.SSHClient()
         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         ssh.connect(hostname, port, username, password)
 
-        # sftp用于文件的传输操作，如上传sftp.put和下载sftp.get
+        # sftp用于文件的传输操作；打包和多线程压缩的输出直接写到远程，不在本地生成备份文件
         sftp = ssh.open_sftp()
-        sftp.put(backup_file, os.path.join(remote_dir, os.path.basename(backup_file)))
-        sftp.close()
-        ssh.close()
-        logging.info(f"成功上传备份文件到  {hostname}:{remote_dir}")
-
-        # 删除本地备份文件
-        os.remove(backup_file)
-        logging.info(f"成功删除本地备份文件: {backup_file}")
+        writer = CompressedWriter(SFTPSink(sftp, remote_path), 'gzip', level, workers or os.cpu_count() or 1)
+        try:
+            with tarfile.open(fileobj=writer, mode='w|') as tar:
+                tar.add(local_dir, arcname='.')
+            checksum = writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            sftp.close()
+            ssh.close()
+        logging.info(f"成功创建并上传备份文件到 {hostname}:{remote_path} "
+                     f"({writer.bytes_in} -> {writer.bytes_out} 字节，sha256 {checksum})")
     except Exception as e:
         logging.info(f"备份失败 {e}")
         send_mail(e)
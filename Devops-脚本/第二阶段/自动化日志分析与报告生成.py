@@ -1,22 +1,60 @@
+import argparse
+import os
 import sys
 import re
 from jinja2 import Template
 
-def analyze_log_file(log_file_path):
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from log_checkpoint import LogCheckpointStore
+from log_mapreduce import LogMapReduce
+
+def extract_errors(lines, error_pattern, errors):
+    for line in lines:
+        # 匹配出来的值给到match
+        match = error_pattern.search(line)
+        if match:
+            # group(0)返回的是整个匹配的内容
+            # 包括前面的ERROR
+            # group(1)仅返回的是(.*)匹配的内容第一个
+            errors.append(match.group(1))
+
+
+def append_errors(history_file, errors):
+    if errors:
+        with open(history_file, 'a', encoding='utf-8') as f:
+            f.writelines(error + '\n' for error in errors)
+
+
+def map_errors(lines):
+    # 多进程分块处理时每个区间调用一次，结果按区间顺序拼接
+    errors = []
+    extract_errors(lines, re.compile(r"ERROR: (.*)"), errors)
+    return {'errors': errors}
+
+
+def analyze_log_file(log_file_path, checkpoint_file=None, workers=1):
     #re.compile 编译正则表达式后的对象可以重复使用，提高效率
     error_pattern = re.compile(r"ERROR: (.*)")
     errors = []
 
     try:
-        with open(log_file_path,'r') as file:
-            for line in file:
-                # 匹配出来的值给到match
-                match = error_pattern.search(line)
-                if match:
-                    # group(0)返回的是整个匹配的内容
-                    # 包括前面的ERROR
-                    # group(1)仅返回的是(.*)匹配的内容第一个
-                    errors.append(match.group(1))
+        if checkpoint_file:
+            # 增量模式：只读取上次之后追加的内容并只返回新增的错误；检查点里只保存计数，
+            # 完整的错误列表追加写入旁边的历史文件，检查点大小不随历史增长
+            store = LogCheckpointStore(checkpoint_file)
+            totals = store.aggregates(log_file_path)
+            history_file = f"{checkpoint_file}.{os.path.basename(log_file_path)}.errors"
+            extract_errors(store.read_new_lines(log_file_path), error_pattern, errors)
+            append_errors(history_file, errors)
+            totals['error_count'] = totals.get('error_count', 0) + len(errors)
+            store.save()
+            # 报告只包含本次新增的错误，累计数量来自检查点，不再重读历史文件
+            print(f"累计 {totals['error_count']} 个错误，完整列表见 {history_file}")
+        elif workers > 1:
+            errors = LogMapReduce(map_errors, workers=workers).run(log_file_path).get('errors', [])
+        else:
+            with open(log_file_path,'r') as file:
+                extract_errors(file, error_pattern, errors)
     except FileNotFoundError:
         print("日志文件未找到")
         sys.exit(1)
@@ -61,17 +99,17 @@ def generate_html_report(errors, report_file_path):
         sys.exit(1)
 
 
-def main(log_file_path, report_file_path):
-    errors = analyze_log_file(log_file_path)
+def main(log_file_path, report_file_path, checkpoint_file=None, workers=1):
+    errors = analyze_log_file(log_file_path, checkpoint_file, workers=workers)
     print(f"找到 {len(errors)} 个错误")
     generate_html_report(errors, report_file_path)
 
 if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        print(f"用法: python script.py <日志文件路径> <报告文件路径>")
-        sys.exit(1)
-
-    log_file_path = sys.argv[1]
-    report_file_path = sys.argv[2]
+    parser = argparse.ArgumentParser(description='日志错误分析与 HTML 报告生成')
+    parser.add_argument('log_file_path', help='日志文件路径')
+    parser.add_argument('report_file_path', help='报告文件路径')
+    parser.add_argument('checkpoint_file', nargs='?', help='检查点文件路径（增量模式）')
+    parser.add_argument('--workers', type=int, default=1, help='全量扫描时使用的进程数，默认单进程')
+    args = parser.parse_args()
 
-    main(log_file_path, report_file_path)
\ No newline at end of file
+    main(args.log_file_path, args.report_file_path, args.checkpoint_file, args.workers)
@@ -1,47 +1,189 @@
-import filecmp
+import hashlib
 import os
 import shutil
+import sqlite3
 import paramiko
-from scp import SCPClient
 import time
 import logging
 
+try:
+    import xxhash
+except ImportError:
+    # 没有安装 xxhash 时使用标准库的 blake2b
+    xxhash = None
+
 logging.basicConfig(filename = 'log_collector.log', level=logging.INFO)
-def collect_logs(local_log_dir, backup_log_dir):
+
+
+def new_hasher():
+    return xxhash.xxh3_128() if xxhash else hashlib.blake2b(digest_size=16)
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    hasher = new_hasher()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class FileManifest:
+    """
+    文件清单（SQLite）
+    按 scope 记录每个文件上次处理时的 (大小, mtime_ns, 内容哈希)，
+    大小和修改时间都没变的文件只需一次 stat 即可跳过；stat 变了但哈希相同的文件也不再复制或上传
+    """
+
+    def __init__(self, db_file='log_manifest.db'):
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS files (
+                         scope TEXT,
+                         path TEXT,
+                         size INTEGER,
+                         mtime_ns INTEGER,
+                         digest TEXT,
+                         PRIMARY KEY (scope, path))''')
+
+    def load(self, scope):
+        """一次读出整个 scope：{path: (size, mtime_ns, digest)}"""
+        rows = self.conn.execute("SELECT path, size, mtime_ns, digest FROM files WHERE scope = ?", (scope,))
+        return {path: (size, mtime_ns, digest) for path, size, mtime_ns, digest in rows}
+
+    def save(self, scope, entries, removed=()):
+        """批量写入本轮有变化的记录，并删除已不存在的文件"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (scope, path, size, mtime_ns, digest) VALUES (?, ?, ?, ?, ?)",
+                [(scope, path, size, mtime_ns, digest) for path, (size, mtime_ns, digest) in entries.items()])
+            self.conn.executemany("DELETE FROM files WHERE scope = ? AND path = ?",
+                                  [(scope, path) for path in removed])
+
+    def close(self):
+        self.conn.close()
+
+
+def copy_with_digest(src, dst, chunk_size=1024 * 1024):
+    """复制文件的同时计算哈希，源文件只读取一次"""
+    hasher = new_hasher()
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        while True:
+            chunk = fsrc.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            fdst.write(chunk)
+    shutil.copystat(src, dst)
+    return hasher.hexdigest()
+
+
+def collect_logs(local_log_dir, backup_log_dir, manifest=None):
     if not os.path.exists(backup_log_dir):
         os.makedirs(backup_log_dir)
+    manifest = manifest or FileManifest()
 
+    known = manifest.load('collect')
+    updated, seen = {}, set()
     for root,_ , files in os.walk(local_log_dir):
         for file in files:
             local_path = os.path.join(root,file)
-            backup_path = os.path.join(backup_log_dir,file)
+            # 保留相对目录，避免不同目录下的同名日志互相覆盖
+            rel = os.path.relpath(local_path, local_log_dir)
+            backup_path = os.path.join(backup_log_dir, rel)
+            seen.add(rel)
+            try:
+                st = os.stat(local_path)
+            except OSError:
+                continue
 
-            if os.path.exists(backup_path) and filecmp.cmp(local_path, backup_path, shallow=False):
-                logging.info(f"文件：{local_path} 已存在且相同，跳过")
+            record = known.get(rel)
+            if record and record[:2] == (st.st_size, st.st_mtime_ns) and os.path.exists(backup_path):
+                logging.info(f"文件：{local_path} 未变化，跳过")
                 continue
+            if record and record[0] == st.st_size and os.path.exists(backup_path):
+                # 只有修改时间变化时对比哈希，内容相同就只更新记录
+                digest = file_digest(local_path)
+                if digest == record[2]:
+                    shutil.copystat(local_path, backup_path)
+                    updated[rel] = (st.st_size, st.st_mtime_ns, digest)
+                    logging.info(f"文件：{local_path} 内容相同，跳过")
+                    continue
 
-            # 复制文件到备份目录
-            shutil.copy2(local_path, backup_path)
+            # 复制文件到备份目录，记录复制前的 stat，复制期间被追加的文件下一轮会重新复制
+            os.makedirs(os.path.dirname(backup_path), exist_ok=True)
+            try:
+                digest = copy_with_digest(local_path, backup_path)
+            except OSError as e:
+                logging.error(f"收集日志失败: {local_path}: {e}")
+                continue
+            updated[rel] = (st.st_size, st.st_mtime_ns, digest)
             logging.info(f"收集日志: {local_path} => {backup_path}")
+
+    manifest.save('collect', updated, removed=set(known) - seen)
     return backup_log_dir
 
-def upload_logs(backup_log_dir, remote_host, remote_dir, username, password=None, key_filename=None):
+
+def upload_logs(backup_log_dir, remote_host, remote_dir, username, password=None, key_filename=None,
+                manifest=None):
+    manifest = manifest or FileManifest()
+    scope = f"upload:{username}@{remote_host}:{remote_dir}"
+    uploaded = manifest.load(scope)
+    # 收集阶段已经算过的哈希，备份文件 stat 与其一致时直接复用
+    collected = manifest.load('collect')
+    updated = {}
+
+    pending = []
+    for root,_ , files in os.walk(backup_log_dir):
+        for file in files:
+            local_path = os.path.join(root,file)
+            rel = os.path.relpath(local_path, backup_log_dir)
+            st = os.stat(local_path)
+            record = uploaded.get(rel)
+            if record and record[:2] == (st.st_size, st.st_mtime_ns):
+                continue
+            source = collected.get(rel)
+            if source and source[:2] == (st.st_size, st.st_mtime_ns):
+                digest = source[2]
+            else:
+                digest = file_digest(local_path)
+            if record and record[2] == digest:
+                updated[rel] = (st.st_size, st.st_mtime_ns, digest)
+                continue
+            pending.append((rel, local_path, (st.st_size, st.st_mtime_ns, digest)))
+
+    if not pending:
+        manifest.save(scope, updated)
+        logging.info("没有需要上传的日志")
+        return
+
     ssh = paramiko.SSHClient()
     ssh.load_system_host_keys()
     ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
     ssh.connect(remote_host, username=username, password=password, key_filename=key_filename)
 
-    with SCPClient(ssh.get_transport()) as scp:
-        for root,_ , files in os.walk(backup_log_dir):
-            for file in files:
-                local_path = os.path.join(root,file)
-                remote_path = os.path.join(remote_dir, os.path.relpath(local_path, backup_log_dir))
-
-                # 上传文件到远程服务器
-                scp.put(local_path, remote_path)
-                logging.info(f"上传日志: {local_path} => {remote_path}")
+    sftp = ssh.open_sftp()
+    created = set()
+    try:
+        for rel, local_path, state in pending:
+            remote_path = f"{remote_dir.rstrip('/')}/{rel}"
+            remote_parent = os.path.dirname(remote_path)
+            if remote_parent not in created:
+                ssh.exec_command(f"mkdir -p '{remote_parent}'")[1].channel.recv_exit_status()
+                created.add(remote_parent)
 
-    ssh.close()
+            # 上传文件到远程服务器
+            sftp.put(local_path, remote_path)
+            updated[rel] = state
+            logging.info(f"上传日志: {local_path} => {remote_path}")
+    finally:
+        # 中途失败时已上传的文件也会记录，下一轮不再重复上传
+        manifest.save(scope, updated)
+        sftp.close()
+        ssh.close()
     logging.info(f"日志上传完成")
 
 if __name__ == '__main__':
@@ -52,7 +194,9 @@ if __name__ == '__main__':
     username = "ops"
     password = "123456"
 
+    # 清单放在备份目录之外，避免被当作日志上传
+    manifest = FileManifest('log_manifest.db')
     while True:
-        collect_logs(local_log_dir, backup_log_dir)
-        upload_logs(backup_log_dir, remote_host, remote_dir, username, password)
-        time.sleep(3600)
\ No newline at end of file
+        collect_logs(local_log_dir, backup_log_dir, manifest)
+        upload_logs(backup_log_dir, remote_host, remote_dir, username, password, manifest=manifest)
+        time.sleep(3600)
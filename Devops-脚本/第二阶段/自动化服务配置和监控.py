@@ -1,3 +1,4 @@
+import os
 import smtplib
 import sys
 from email.mime.text import MIMEText
@@ -5,6 +6,9 @@ import paramiko
 import time
 import psutil
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cpu_sampler import get_sampler
+
 def run_ssh_command(ssh_client, command):
     stdin, stdout, stderr = ssh_client.exec_command(command)
     output = stdout.read().decode().strip()
@@ -61,7 +65,7 @@ def send_alert_email(recipient, cpu_usage, memory_used, disk_used, cpu_threshold
 
 
 def get_system_resources():
-    cpu_usage = psutil.cpu_percent(interval=1)
+    cpu_usage = get_sampler(track_processes=False).host_percent()
     memory_info = psutil.virtual_memory()
     disk_info = psutil.disk_usage('/')
 
@@ -0,0 +1,224 @@
+import argparse
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from host_metrics import get_host_metrics
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+    采样线程每轮生成一份完整快照并预先渲染成 Prometheus 文本格式，
+    抓取请求只返回缓存的字节串，不会触发任何采样
+    """
+
+    SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = {}
+        self.pushed = {}
+        self.rendered = b''
+        self.rendered_local = b''
+
+    @staticmethod
+    def _escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def _label_text(self, labels):
+        return ','.join(f'{key}="{self._escape(val)}"' for key, val in labels.items())
+
+    def update(self, samples):
+        """
+        用新快照整体替换本机指标
+        :param samples: [(指标名, 类型, 说明, {标签}, 值)]
+        """
+        metrics = {}
+        for name, metric_type, help_text, labels, value in samples:
+            metric = metrics.setdefault(name, {'type': metric_type, 'help': help_text, 'values': []})
+            metric['values'].append((self._label_text(labels or {}), value))
+        with self.lock:
+            self.local = metrics
+            self.rendered_local = self.render([metrics])
+            self.rendered = self.render([metrics, *self.pushed.values()])
+
+    def push(self, job, body):
+        """接收其他脚本推送的文本格式指标（本地 pushgateway 替身），样本自动加上 job 标签"""
+        metrics = {}
+        job_label = f'job="{self._escape(job)}"'
+        for line in body.decode('utf-8', errors='replace').splitlines():
+            if line.startswith('#'):
+                parts = line.split(None, 3)
+                if len(parts) >= 3 and parts[1] in ('HELP', 'TYPE'):
+                    metric = metrics.setdefault(parts[2], {'type': 'untyped', 'help': '', 'values': []})
+                    metric['help' if parts[1] == 'HELP' else 'type'] = parts[3] if len(parts) > 3 else ''
+                continue
+            match = self.SAMPLE_LINE.match(line)
+            if match:
+                name, labels, value = match.groups()
+                metric = metrics.setdefault(name, {'type': 'untyped', 'help': '', 'values': []})
+                metric['values'].append((f"{labels},{job_label}" if labels else job_label, value))
+        with self.lock:
+            self.pushed[job] = metrics
+            self.rendered = self.render([self.local, *self.pushed.values()])
+
+    def render(self, sources):
+        """同名指标的样本必须连续输出，所以先按指标名合并本机和推送的数据"""
+        merged = {}
+        for metrics in sources:
+            for name, metric in metrics.items():
+                target = merged.setdefault(name, {'type': metric['type'], 'help': metric['help'], 'values': []})
+                target['values'].extend(metric['values'])
+
+        lines = []
+        for name, metric in merged.items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for label_text, value in metric['values']:
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def exposition(self):
+        return self.rendered
+
+
+def host_samples(snapshot):
+    """把共享指标缓存的快照转换为 [(指标名, 类型, 说明, {标签}, 值)]"""
+    samples = [('node_cpu_usage_percent', 'gauge', 'CPU usage since last sample', {}, snapshot['cpu_percent'])]
+    for index, usage in enumerate(snapshot['cpu_per_core']):
+        samples.append(('node_cpu_core_usage_percent', 'gauge', 'Per-core CPU usage', {'cpu': index}, usage))
+
+    if snapshot['load']:
+        for period, value in zip(('1m', '5m', '15m'), snapshot['load']):
+            samples.append(('node_load', 'gauge', 'System load average', {'period': period}, value))
+
+    mem = snapshot['memory']
+    swap = snapshot['swap']
+    samples += [
+        ('node_memory_total_bytes', 'gauge', 'Total physical memory', {}, mem.total),
+        ('node_memory_available_bytes', 'gauge', 'Available memory', {}, mem.available),
+        ('node_memory_usage_percent', 'gauge', 'Memory usage', {}, mem.percent),
+        ('node_swap_usage_percent', 'gauge', 'Swap usage', {}, swap.percent),
+    ]
+
+    for mountpoint, (part, usage) in snapshot['disks'].items():
+        labels = {'device': part.device, 'mountpoint': mountpoint}
+        samples.append(('node_disk_total_bytes', 'gauge', 'Filesystem size', labels, usage.total))
+        samples.append(('node_disk_usage_percent', 'gauge', 'Filesystem usage', labels, usage.percent))
+
+    disk_io = snapshot['disk_io']
+    if disk_io:
+        samples.append(('node_disk_read_bytes_total', 'counter', 'Bytes read from disk', {}, disk_io.read_bytes))
+        samples.append(('node_disk_written_bytes_total', 'counter', 'Bytes written to disk', {},
+                        disk_io.write_bytes))
+
+    for nic, stats in snapshot['network'].items():
+        labels = {'interface': nic}
+        samples.append(('node_network_sent_bytes_total', 'counter', 'Bytes sent', labels, stats.bytes_sent))
+        samples.append(('node_network_received_bytes_total', 'counter', 'Bytes received', labels,
+                        stats.bytes_recv))
+        samples.append(('node_network_errors_total', 'counter', 'Interface errors', labels,
+                        stats.errin + stats.errout))
+
+    samples.append(('node_processes', 'gauge', 'Number of processes', {}, snapshot['process_count']))
+    for proc in snapshot['top_processes']:
+        labels = {'pid': proc['pid'], 'name': proc['name']}
+        samples.append(('node_top_process_cpu_percent', 'gauge', 'CPU usage of the busiest processes', labels,
+                        proc['cpu_percent']))
+        if proc['rss'] is not None:
+            samples.append(('node_top_process_resident_bytes', 'gauge', 'Resident memory of the busiest processes',
+                            labels, proc['rss']))
+
+    samples.append(('node_boot_time_seconds', 'gauge', 'Boot time', {}, snapshot['boot_time']))
+    samples.append(('node_sample_timestamp_seconds', 'gauge', 'Time of the last sample', {}, snapshot['timestamp']))
+    return samples
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics 返回缓存快照；PUT/POST /metrics/job/<job> 接收推送"""
+
+    registry = None
+    push_path = re.compile(r'^/metrics/job/([^/]+)$')
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.exposition()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        match = self.push_path.match(self.path)
+        if not match:
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        self.registry.push(match.group(1), self.rfile.read(length))
+        self.send_response(202)
+        self.end_headers()
+
+    do_POST = do_PUT
+
+    def log_message(self, format, *args):
+        # 每 15 秒一次的抓取不写访问日志
+        pass
+
+
+def push_to_gateway(gateway_url, job, registry, timeout=5):
+    """以 pushgateway 协议推送当前快照（PUT /metrics/job/<job>）"""
+    request = urllib.request.Request(
+        f"{gateway_url.rstrip('/')}/metrics/job/{job}",
+        data=registry.rendered_local,
+        method='PUT',
+        headers={'Content-Type': 'text/plain; version=0.0.4'}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status
+
+
+def serve(port=9101, interval=15, push_url=None, job=None):
+    registry = MetricsRegistry()
+    # 注册表跟随共享指标缓存刷新，不单独采样
+    metrics = get_host_metrics(interval)
+    registry.update(host_samples(metrics.latest()))
+    metrics.add_listener(lambda snapshot: registry.update(host_samples(snapshot)))
+
+    if push_url:
+        job = job or socket.gethostname()
+
+        def push_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    push_to_gateway(push_url, job, registry)
+                except Exception as e:
+                    print(f"推送失败: {e}")
+
+        threading.Thread(target=push_loop, daemon=True).start()
+
+    MetricsHandler.registry = registry
+    server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    print(f"Prometheus exporter 监听 :{port}/metrics，采样间隔 {interval} 秒")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='主机指标 Prometheus exporter')
+    parser.add_argument('--port', type=int, default=9101, help='监听端口')
+    parser.add_argument('--interval', type=int, default=15, help='采样间隔（秒）')
+    parser.add_argument('--push-url', help='pushgateway 地址，如 http://127.0.0.1:9091')
+    parser.add_argument('--job', help='推送时使用的 job 名称，默认主机名')
+    args = parser.parse_args()
+
+    serve(args.port, args.interval, args.push_url, args.job)
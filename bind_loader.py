@@ -0,0 +1,115 @@
+import io
+
+import pandas as pd
+
+# iot_d_bind_device_info 的列顺序，与各导入脚本的 INSERT 语句一致
+COLUMNS = ["id", "device_id", "bind_device_id", "bind_identifier", "bind_explain"]
+
+
+def to_id_text(series):
+    """
+    向量化校验并转换 id 列，返回 (文本形式的 id, 无效值的位置)
+    id 是 19 位整数，超出 float 精度，因此整列按字符串处理，不经过 float 转换
+    """
+    if pd.api.types.is_integer_dtype(series):
+        return series.astype('int64').astype(str), series.index[:0]
+    if pd.api.types.is_float_dtype(series):
+        invalid = series.isna() | (series % 1 != 0)
+        return series.fillna(0).astype('int64').astype(str), series.index[invalid]
+    text = series.astype(str).str.strip()
+    matched = text.str.extract(r'^([+-]?\d+)(?:\.0+)?$', expand=False)
+    return matched, series.index[matched.isna()]
+
+
+def _copy_frames(cur, sql, frames, columns, chunk_rows, after_chunk=None):
+    """把 DataFrame（或 DataFrame 迭代器）按 chunk_rows 行一段内存 CSV 发送给 COPY，返回行数"""
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    total = 0
+    for frame in frames:
+        for start in range(0, len(frame), chunk_rows):
+            buffer = io.StringIO()
+            frame.iloc[start:start + chunk_rows].to_csv(buffer, columns=columns, index=False, header=False)
+            buffer.seek(0)
+            cur.copy_expert(sql, buffer)
+            total += min(chunk_rows, len(frame) - start)
+            if after_chunk:
+                after_chunk()
+    return total
+
+
+def _copy_sql(table, columns):
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    return f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+
+
+def copy_rows(conn, table, frames, columns=COLUMNS, chunk_rows=100000, commit_every_chunk=False):
+    """
+    通过 COPY ... FROM STDIN 批量写入
+    frames 可以是一个 DataFrame，也可以是逐块产出 DataFrame 的迭代器（流式写入，不需要一次性生成全部数据）；
+    每 chunk_rows 行生成一段内存 CSV 发送一次。commit_every_chunk=False 时整批在一个事务中提交，
+    失败全部回滚；为 True 时每块单独提交，失败时之前的块已经写入
+    """
+    try:
+        with conn.cursor() as cur:
+            total = _copy_frames(cur, _copy_sql(table, columns), frames, columns, chunk_rows,
+                                 conn.commit if commit_every_chunk else None)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return total
+
+
+UPSERT_SQL = """
+WITH staged AS (
+    SELECT DISTINCT ON (device_id, bind_device_id) *
+    FROM bind_stage
+    ORDER BY device_id, bind_device_id, seq DESC
+), updated AS (
+    UPDATE {table} t
+    SET bind_identifier = s.bind_identifier, bind_explain = s.bind_explain
+    FROM staged s
+    WHERE t.device_id = s.device_id AND t.bind_device_id = s.bind_device_id
+      AND (t.bind_identifier, t.bind_explain) IS DISTINCT FROM (s.bind_identifier, s.bind_explain)
+    RETURNING 1
+), base AS (
+    SELECT GREATEST(COALESCE(MAX(id), 0), %(floor)s) AS id FROM {table}
+), inserted AS (
+    INSERT INTO {table} ("id", "device_id", "bind_device_id", "bind_identifier", "bind_explain")
+    SELECT base.id + ROW_NUMBER() OVER (ORDER BY s.seq), s.device_id, s.bind_device_id,
+           s.bind_identifier, s.bind_explain
+    FROM staged s CROSS JOIN base
+    WHERE NOT EXISTS (
+        SELECT 1 FROM {table} t WHERE t.device_id = s.device_id AND t.bind_device_id = s.bind_device_id
+    )
+    RETURNING 1
+)
+SELECT (SELECT COUNT(*) FROM updated), (SELECT COUNT(*) FROM inserted)
+"""
+
+
+def upsert_rows(conn, table, frames, start_id=1, chunk_rows=100000):
+    """
+    幂等导入：COPY 到临时表后按 (device_id, bind_device_id) 与现有数据合并
+    已存在且内容相同的绑定不做任何修改，内容变化的只更新 bind_identifier / bind_explain，
+    新绑定由数据库按 MAX(id) 一次性分配连续 id（不小于 start_id），frames 中的 id 列被忽略。
+    导入期间对目标表加 SHARE ROW EXCLUSIVE 锁，并发导入会排队，不会分配到重复 id；
+    整个过程在一个事务中完成，返回 {'staged', 'updated', 'inserted'}
+    """
+    columns = COLUMNS[1:]
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+            # 临时表沿用目标表的列类型，seq 记录导入顺序，新 id 按该顺序分配
+            cur.execute(f"CREATE TEMP TABLE bind_stage ON COMMIT DROP AS "
+                        f"SELECT {', '.join(columns)} FROM {table} WITH NO DATA")
+            cur.execute("ALTER TABLE bind_stage ADD COLUMN seq BIGSERIAL")
+            staged = _copy_frames(cur, _copy_sql('bind_stage', columns), frames, columns, chunk_rows)
+            cur.execute(UPSERT_SQL.format(table=table), {'floor': start_id - 1})
+            updated, inserted = cur.fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {'staged': staged, 'updated': updated, 'inserted': inserted}
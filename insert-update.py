@@ -1,8 +1,11 @@
+import argparse
+import numpy as np
 import pandas as pd
 import psycopg2
-from psycopg2.extras import execute_batch
 import sys
 
+from bind_loader import copy_rows, to_id_text, upsert_rows
+
 # ========== 数据库配置 ==========
 DB_CONFIG = {
     'dbname': 'postgres',
@@ -16,41 +19,68 @@ EXCEL_FILE = "消防点位绑定.xlsx"
 SHEET_NAME = "二号楼"
 TABLE_NAME = '"public"."iot_d_bind_device_info"'
 DEFAULT_START_ID = 1985245409940512930
-
-
-def safe_split(value):
-    if pd.isna(value) or str(value).strip() == '':
-        return []
-    return [x.strip() for x in str(value).split(',') if x.strip()]
-
-
-def expand_row(row):
-    # 拆分四组
-    devs = safe_split(row['device_id'])
-    explains = safe_split(row['bind_explain'])
-    cams = safe_split(row['bind_device_id'])
-    idens = safe_split(row['bind_identifier'])
-
-    # 校验：device_id 和 bind_explain 必须等长
-    if len(devs) != len(explains):
-        raise ValueError(f"device_id ({len(devs)}) 与 bind_explain ({len(explains)}) 数量必须一致")
-
-    # 校验：bind_device_id 和 bind_identifier 必须等长
-    if len(cams) != len(idens):
-        raise ValueError(f"bind_device_id ({len(cams)}) 与 bind_identifier ({len(idens)}) 数量必须一致")
-
-    if not devs or not cams:
-        return []
-
-    records = []
-    # 笛卡尔积：每个 (dev, explain) × 每个 (cam, iden)
-    for dev, exp in zip(devs, explains):
-        for cam, iden in zip(cams, idens):
-            records.append((dev, cam, iden, exp))
-    return records
+GROUP_ROWS = 5000            # 每次展开的 Excel 行数，展开结果逐组流式 COPY 入库
+CHUNK_ROWS = 100000          # 每次 COPY 发送的行数
+
+
+def split_column(series):
+    """
+    按逗号拆分整列（等价于逐行 safe_split）：返回长表 [row, pos, value]
+    row 为原行号，pos 为拆分后在该行内的序号，空值和空白项被丢弃
+    """
+    parts = series.where(series.notna(), '').astype(str).str.split(',').explode().str.strip()
+    parts = parts[parts != '']
+    frame = pd.DataFrame({'row': parts.index, 'value': parts.to_numpy()})
+    frame['pos'] = frame.groupby('row').cumcount()
+    return frame
+
+
+def zip_columns(df, left, right):
+    """拆分两列并按序号配对，两列在每一行的数量必须一致"""
+    a, b = split_column(df[left]), split_column(df[right])
+    counts = pd.DataFrame({'a': a.groupby('row').size(), 'b': b.groupby('row').size()}).reindex(df.index)
+    counts = counts.fillna(0).astype(int)
+    mismatch = counts[counts['a'] != counts['b']]
+    if len(mismatch):
+        first = mismatch.iloc[0]
+        raise ValueError(f"{left} ({first['a']}) 与 {right} ({first['b']}) 数量必须一致")
+    return a.merge(b, on=['row', 'pos'], suffixes=(f'_{left}', f'_{right}'))
+
+
+def expand_rows(df):
+    """
+    展开一组行：device_id/bind_explain 与 bind_device_id/bind_identifier 各自配对后，
+    在同一行内做笛卡尔积，即每个 (dev, explain) × 每个 (cam, iden)
+    """
+    devs = zip_columns(df, 'device_id', 'bind_explain')
+    cams = zip_columns(df, 'bind_device_id', 'bind_identifier')
+    pairs = devs.merge(cams, on='row', suffixes=('_dev', '_cam'))
+    pairs = pairs.sort_values(['row', 'pos_dev', 'pos_cam'], kind='stable')
+    return pd.DataFrame({
+        'device_id': pairs['value_device_id'].to_numpy(),
+        'bind_device_id': pairs['value_bind_device_id'].to_numpy(),
+        'bind_identifier': pairs['value_bind_identifier'].to_numpy(),
+        'bind_explain': pairs['value_bind_explain'].to_numpy(),
+    })
+
+
+def iter_records(df, start_id, stats):
+    """按 GROUP_ROWS 行一组展开，并分配从 start_id 起连续的 id"""
+    next_id = start_id
+    for start in range(0, len(df), GROUP_ROWS):
+        records = expand_rows(df.iloc[start:start + GROUP_ROWS])
+        records.insert(0, 'id', np.arange(next_id, next_id + len(records), dtype=np.int64))
+        next_id += len(records)
+        stats['records'] += len(records)
+        yield records
 
 
 def main():
+    parser = argparse.ArgumentParser(description='展开并导入设备绑定关系')
+    parser.add_argument('--upsert', action='store_true',
+                        help='幂等导入：已存在的绑定不重复插入，新记录的 id 由数据库在现有最大 id 之后分配')
+    args = parser.parse_args()
+
     try:
         df = pd.read_excel(EXCEL_FILE, sheet_name=SHEET_NAME)
         df.columns = df.columns.str.strip()
@@ -60,45 +90,36 @@ def main():
             print(f"❌ 缺少必要列: {required}")
             sys.exit(1)
 
-        # 确定起始 ID（基于 Excel 中已有 id 最大值）
+        # 确定起始 ID（基于 Excel 中已有 id 最大值，按整数文本比较，避免 19 位 id 经过 float 丢失精度）
+        max_id = DEFAULT_START_ID - 1
         if 'id' in df.columns and df['id'].notnull().any():
-            valid_ids = pd.to_numeric(df['id'], errors='coerce').dropna()
-            max_id = int(valid_ids.max()) if not valid_ids.empty else DEFAULT_START_ID - 1
-        else:
-            max_id = DEFAULT_START_ID - 1
+            ids, invalid = to_id_text(df['id'])
+            valid_ids = ids.drop(invalid).astype('int64')
+            if not valid_ids.empty:
+                max_id = int(valid_ids.max())
 
         start_id = max_id + 1
         print(f"基础 id: {max_id}，新记录从 {start_id} 开始")
 
-        # 展开所有行
-        all_records = []
-        for _, row in df.iterrows():
-            if pd.isna(row['device_id']) or pd.isna(row['bind_device_id']):
-                continue
-            all_records.extend(expand_row(row))
+        # 展开所有行（向量化拆分 + explode + 按行 merge 笛卡尔积），边展开边 COPY 入库，整批一个事务
+        df = df[df['device_id'].notna() & df['bind_device_id'].notna()].reset_index(drop=True)
+        stats = {'records': 0}
 
-        print(f"✅ 展开后共 {len(all_records)} 条记录")
-
-        # 生成带 id 的数据
-        data = [
-            (start_id + i, dev, cam, iden, exp)
-            for i, (dev, cam, iden, exp) in enumerate(all_records)
-        ]
-
-        # 插入数据库
         conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        insert_sql = f'''
-            INSERT INTO {TABLE_NAME}
-            ("id", "device_id", "bind_device_id", "bind_identifier", "bind_explain")
-            VALUES (%s, %s, %s, %s, %s)
-        '''
-        execute_batch(cur, insert_sql, data, page_size=1000)
-        conn.commit()
-        cur.close()
-        conn.close()
-
-        print(f"✅ 成功插入 {len(data)} 条记录")
+        try:
+            if args.upsert:
+                result = upsert_rows(conn, TABLE_NAME, iter_records(df, start_id, stats),
+                                     start_id=start_id, chunk_rows=CHUNK_ROWS)
+            else:
+                inserted = copy_rows(conn, TABLE_NAME, iter_records(df, start_id, stats), chunk_rows=CHUNK_ROWS)
+        finally:
+            conn.close()
+
+        print(f"✅ 展开后共 {stats['records']} 条记录")
+        if args.upsert:
+            print(f"✅ 新增 {result['inserted']} 条记录，更新 {result['updated']} 条记录")
+        else:
+            print(f"✅ 成功插入 {inserted} 条记录")
 
     except Exception as e:
         print(f"❌ 错误: {e}")
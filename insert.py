@@ -1,8 +1,10 @@
+import argparse
 import pandas as pd
 import psycopg2
-from psycopg2.extras import execute_batch
 import sys
 
+from bind_loader import COLUMNS, copy_rows, to_id_text, upsert_rows
+
 # ========== 数据库配置 ==========
 DB_CONFIG = {
     'dbname': 'postgres',
@@ -19,7 +21,16 @@ SHEET_NAME = "Sheet1"
 # ========== 表信息 ==========
 TABLE_NAME = '"public"."iot_d_bind_device_info"'
 
+# ========== 导入方式 ==========
+CHUNK_ROWS = 100000          # 每次 COPY 发送的行数
+COMMIT_PER_CHUNK = False     # False：整批一个事务；True：每块单独提交
+
 def main():
+    parser = argparse.ArgumentParser(description='导入设备绑定关系')
+    parser.add_argument('--upsert', action='store_true',
+                        help='幂等导入：按 (device_id, bind_device_id) 去重，新记录的 id 由数据库分配（忽略 Excel 中的 id）')
+    args = parser.parse_args()
+
     try:
         # 1. 读取 Excel
         print("正在读取 Excel 文件...")
@@ -32,40 +43,31 @@ def main():
             print("❌ Excel 缺少必要字段！必须包含：", required_columns)
             sys.exit(1)
 
-        # 3. 转换数据（确保 id 是整数）
-        data = []
-        for _, row in df.iterrows():
-            try:
-                id_val = int(row['id'])
-            except (ValueError, TypeError):
-                print(f"❌ 无效的 id 值: {row['id']}")
-                sys.exit(1)
-            data.append((
-                id_val,
-                str(row['device_id']),
-                str(row['bind_device_id']),
-                str(row['bind_identifier']),
-                str(row['bind_explain'])
-            ))
+        # 3. 转换数据（按列向量化：id 校验为整数，其余字段转为字符串）
+        ids, invalid = to_id_text(df['id'])
+        if len(invalid):
+            print(f"❌ 无效的 id 值: {df.at[invalid[0], 'id']}（共 {len(invalid)} 个）")
+            sys.exit(1)
+        data = pd.DataFrame({'id': ids})
+        for col in COLUMNS[1:]:
+            data[col] = df[col].astype(str)
 
         print(f"✅ 成功加载 {len(data)} 条记录")
 
-        # 4. 连接数据库并插入
+        # 4. 连接数据库并通过 COPY 批量写入
         print("正在连接数据库...")
         conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
 
-        insert_sql = f'''
-            INSERT INTO {TABLE_NAME}
-            ("id", "device_id", "bind_device_id", "bind_identifier", "bind_explain")
-            VALUES (%s, %s, %s, %s, %s)
-        '''
+        if args.upsert:
+            print("正在合并数据...")
+            result = upsert_rows(conn, TABLE_NAME, data, chunk_rows=CHUNK_ROWS)
+            print(f"✅ 共 {result['staged']} 条记录：新增 {result['inserted']} 条，更新 {result['updated']} 条")
+            return
 
         print("正在插入数据...")
-        execute_batch(cur, insert_sql, data, page_size=1000)
-        conn.commit()
+        inserted = copy_rows(conn, TABLE_NAME, data, chunk_rows=CHUNK_ROWS, commit_every_chunk=COMMIT_PER_CHUNK)
 
-        print(f"✅ 成功插入 {len(data)} 条记录到 {TABLE_NAME}")
+        print(f"✅ 成功插入 {inserted} 条记录到 {TABLE_NAME}")
 
     except Exception as e:
         print(f"❌ 发生错误: {e}")
@@ -1,7 +1,10 @@
+import argparse
+import numpy as np
 import pandas as pd
 import json
 import psycopg2
-from math import sqrt
+
+from bind_loader import copy_rows, upsert_rows
 
 # ========== 配置 ==========
 CAMERA_XLSX = "监控设备.xlsx"
@@ -16,6 +19,8 @@ DB_CONFIG = {
 }
 
 START_ID = 1985245409940512789              # 起始ID号
+RADIUS = 125.0                              # 绑定半径（px）
+TABLE_NAME = '"public"."iot_d_bind_device_info"'
 
 # 类型映射
 LAST_TO_EXPLAIN = {
@@ -43,8 +48,53 @@ def extract_point(val):
     except:
         return 0.0
 
+def grid_pairs(cam_xy, fire_xy, radius=RADIUS):
+    """
+    网格邻近匹配：按 radius 大小的网格给消防设备分桶，每个摄像头只与所在格及相邻 8 格中的设备计算距离
+    返回距离 <= radius 的 (摄像头下标, 消防设备下标)，按摄像头、消防设备下标排序
+    """
+    cam_cells = np.floor(cam_xy / radius).astype(np.int64)
+    fire_cells = np.floor(fire_xy / radius).astype(np.int64)
+    low = np.minimum(cam_cells.min(axis=0), fire_cells.min(axis=0))
+    high = np.maximum(cam_cells.max(axis=0), fire_cells.max(axis=0))
+    # 把二维格号压成一个整数键，四周各留一格，邻格偏移不会越界
+    width = high[1] - low[1] + 3
+    cam_keys = (cam_cells[:, 0] - low[0] + 1) * width + (cam_cells[:, 1] - low[1] + 1)
+    fire_keys = (fire_cells[:, 0] - low[0] + 1) * width + (fire_cells[:, 1] - low[1] + 1)
+    order = np.argsort(fire_keys, kind='stable')
+    sorted_keys = fire_keys[order]
+
+    cam_parts, fire_parts = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            keys = cam_keys + dx * width + dy
+            lo = np.searchsorted(sorted_keys, keys, side='left')
+            counts = np.searchsorted(sorted_keys, keys, side='right') - lo
+            total = int(counts.sum())
+            if not total:
+                continue
+            # 展开每个摄像头在该邻格中的全部候选设备
+            cam_idx = np.repeat(np.arange(len(cam_keys)), counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            fire_idx = order[np.repeat(lo, counts) + offsets]
+            delta = cam_xy[cam_idx] - fire_xy[fire_idx]
+            near = np.sqrt((delta * delta).sum(axis=1)) <= radius
+            cam_parts.append(cam_idx[near])
+            fire_parts.append(fire_idx[near])
+
+    if not cam_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    cam_idx, fire_idx = np.concatenate(cam_parts), np.concatenate(fire_parts)
+    ordered = np.lexsort((fire_idx, cam_idx))
+    return cam_idx[ordered], fire_idx[ordered]
+
 # ========== 主逻辑 ==========
 def main():
+    parser = argparse.ArgumentParser(description='摄像头与消防设备就近绑定')
+    parser.add_argument('--upsert', action='store_true',
+                        help='幂等导入：已存在的绑定不重复插入，新记录的 id 由数据库在现有最大 id 之后分配')
+    args = parser.parse_args()
+
     # 1. 读取摄像头
     cam_df = pd.read_excel(CAMERA_XLSX, dtype=str)
     cameras = []
@@ -84,44 +134,41 @@ def main():
     print(f"✅ 加载 {len(cameras)} 个摄像头，{len(fire_devices)} 个消防设备")
 
     # 3. 按 buildNamePath 分组（精确到楼栋+楼层）
-    cam_groups = {}
-    fire_groups = {}
-    for cam in cameras:
-        key = cam['buildNamePath']
-        cam_groups.setdefault(key, []).append(cam)
-    for fire in fire_devices:
-        key = fire['buildNamePath']
-        fire_groups.setdefault(key, []).append(fire)
-
-    # 4. 连接数据库
+    cam_groups = pd.DataFrame(cameras, columns=['device_id', 'device_name', 'buildNamePath', 'x', 'y'])
+    fire_groups = pd.DataFrame(fire_devices, columns=['device_id', 'device_name', 'buildNamePath', 'x', 'y', 'last'])
+    cam_groups = dict(tuple(cam_groups.groupby('buildNamePath', sort=False)))
+    fire_groups = dict(tuple(fire_groups.groupby('buildNamePath', sort=False)))
+
+    # 4. 绑定（仅在相同 buildNamePath 内，网格索引 + NumPy 计算距离）
+    matches = []
+    for buildNamePath in sorted(set(cam_groups.keys()) & set(fire_groups.keys())):
+        cams = cam_groups[buildNamePath]
+        fires = fire_groups[buildNamePath]
+        cam_idx, fire_idx = grid_pairs(cams[['x', 'y']].to_numpy(), fires[['x', 'y']].to_numpy())
+        matches.append(pd.DataFrame({
+            'device_id': fires['device_id'].to_numpy()[fire_idx],
+            'bind_device_id': cams['device_id'].to_numpy()[cam_idx],
+            'bind_identifier': cams['device_name'].to_numpy()[cam_idx],  # 直接用摄像头的 device_name
+            'bind_explain': fires['last'].map(LAST_TO_EXPLAIN).fillna('其他消防设备').to_numpy()[fire_idx],
+        }))
+
+    records = pd.concat(matches, ignore_index=True) if matches else pd.DataFrame(
+        columns=['device_id', 'bind_device_id', 'bind_identifier', 'bind_explain'])
+    records.insert(0, 'id', np.arange(START_ID, START_ID + len(records), dtype=np.int64))
+
+    # 5. 一次 COPY 批量插入
     conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    current_id = START_ID
-    inserted = 0
-
-    # 5. 绑定并插入（仅在相同 buildNamePath 内）
-    for buildNamePath in set(cam_groups.keys()) & set(fire_groups.keys()):
-        for cam in cam_groups[buildNamePath]:
-            for fire in fire_groups[buildNamePath]:
-                dx = cam['x'] - fire['x']
-                dy = cam['y'] - fire['y']
-                dist = sqrt(dx*dx + dy*dy)
-                if dist <= 125.0:
-                    bind_identifier = cam['device_name']  # 直接用摄像头的 device_name
-                    bind_explain = LAST_TO_EXPLAIN.get(fire['last'], '其他消防设备')
-                    cur.execute("""
-                        INSERT INTO "public"."iot_d_bind_device_info"
-                        ("id", "device_id", "bind_device_id", "bind_identifier", "bind_explain")
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (current_id, fire['device_id'], cam['device_id'], bind_identifier, bind_explain))
-                    current_id += 1
-                    inserted += 1
-
-    conn.commit()
-    cur.close()
-    conn.close()
-    print(f"✅ 绑定完成！共插入 {inserted} 条记录")
+    try:
+        if args.upsert:
+            result = upsert_rows(conn, TABLE_NAME, records, start_id=START_ID)
+        else:
+            inserted = copy_rows(conn, TABLE_NAME, records)
+    finally:
+        conn.close()
+    if args.upsert:
+        print(f"✅ 绑定完成！新增 {result['inserted']} 条记录，更新 {result['updated']} 条记录")
+    else:
+        print(f"✅ 绑定完成！共插入 {inserted} 条记录")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -12,14 +12,27 @@ import datetime
 import logging
 import json
 import re
+import glob
+import gzip
+from collections import deque
 import argparse
+import threading
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import requests
 import pandas as pd
 import matplotlib.pyplot as plt
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+import queue
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Devops-脚本'))
+from log_matcher import MultiPatternMatcher
+from log_checkpoint import LogCheckpointStore
+from proc_table import ProcessTable
+from cpu_sampler import get_sampler
+from host_metrics import get_host_metrics
+import port_prober
 
 # 配置日志
 logging.basicConfig(
@@ -32,7 +45,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-
 class SystemInspector:
     """系统信息检查"""
 
@@ -52,12 +64,12 @@ class SystemInspector:
         return info
 
     @staticmethod
-    def get_cpu_info():
+    def get_cpu_info(interval=1):
         """获取CPU信息"""
         cpu_info = {
             'physical_cores': psutil.cpu_count(logical=False),
             'total_cores': psutil.cpu_count(logical=True),
-            'cpu_usage': psutil.cpu_percent(interval=1, percpu=True),
+            'cpu_usage': get_sampler(interval, track_processes=False).per_core(),
             'cpu_freq': psutil.cpu_freq().current if hasattr(psutil, 'cpu_freq') else 'N/A'
         }
         return cpu_info
@@ -65,8 +77,9 @@ class SystemInspector:
     @staticmethod
     def get_memory_info():
         """获取内存信息"""
-        mem = psutil.virtual_memory()
-        swap = psutil.swap_memory()
+        snapshot = get_host_metrics().latest()
+        mem = snapshot['memory']
+        swap = snapshot['swap']
         mem_info = {
             'total_memory': f"{mem.total / (1024 ** 3):.2f} GB",
             'available_memory': f"{mem.available / (1024 ** 3):.2f} GB",
@@ -81,9 +94,9 @@ class SystemInspector:
     @staticmethod
     def get_disk_info():
         """获取磁盘信息"""
+        snapshot = get_host_metrics().latest()
         disks = []
-        for part in psutil.disk_partitions(all=False):
-            usage = psutil.disk_usage(part.mountpoint)
+        for part, usage in snapshot['disks'].values():
             disk_info = {
                 'device': part.device,
                 'mountpoint': part.mountpoint,
@@ -95,7 +108,7 @@ class SystemInspector:
             }
             disks.append(disk_info)
 
-        io_counters = psutil.disk_io_counters()
+        io_counters = snapshot['disk_io']
         disk_io = {
             'read_count': io_counters.read_count,
             'write_count': io_counters.write_count,
@@ -113,7 +126,7 @@ class NetworkInspector:
     def get_network_info():
         """获取网络接口信息"""
         net_info = []
-        for name, stats in psutil.net_io_counters(pernic=True).items():
+        for name, stats in get_host_metrics().latest()['network'].items():
             interface = {
                 'interface': name,
                 'bytes_sent': f"{stats.bytes_sent / (1024 ** 2):.2f} MB",
@@ -132,23 +145,18 @@ class NetworkInspector:
     def check_connectivity(host='8.8.8.8', port=53, timeout=3):
         """检查网络连通性"""
         try:
-            socket.setdefaulttimeout(timeout)
-            socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
-            return True
+            # 使用单连接超时，避免修改全局默认超时影响并行中的其他检查
+            with socket.create_connection((host, port), timeout=timeout):
+                return True
         except Exception:
             return False
 
     @staticmethod
-    def check_ports(host='localhost', ports=[22, 80, 443]):
+    def check_ports(host='localhost', ports=[22, 80, 443], timeout=1):
         """检查端口是否开放"""
-        results = {}
-        for port in ports:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            result = sock.connect_ex((host, port))
-            results[port] = 'open' if result == 0 else 'closed'
-            sock.close()
-        return results
+        results = port_prober.scan([(host, port) for port in ports], timeout=timeout)
+        return {result['port']: 'open' if result['status'] == 'open' else 'closed'
+                for result in sorted(results, key=lambda r: r['port'])}
 
     @staticmethod
     def get_connections():
@@ -171,21 +179,97 @@ class NetworkInspector:
 class ServiceInspector:
     """服务检查"""
 
+    # systemd 单元状态缓存：{单元名: {'status': ..., 'load_state': ..., ...}}
+    _unit_cache = {}
+    _unit_cache_time = {}
+    UNIT_CACHE_TTL = 30
+
     @staticmethod
-    def check_service(service_name):
+    def _unit_name(service_name):
+        """补全 systemd 单元名"""
+        return service_name if '.' in service_name else f"{service_name}.service"
+
+    @staticmethod
+    def _parse_systemctl_show(output):
+        """解析 systemctl show 输出，每个单元一段，段之间以空行分隔"""
+        blocks = []
+        current = {}
+        for line in output.splitlines():
+            if not line.strip():
+                if current:
+                    blocks.append(current)
+                    current = {}
+                continue
+            key, _, value = line.partition('=')
+            current[key] = value
+        if current:
+            blocks.append(current)
+        return blocks
+
+    @staticmethod
+    def _unit_status(props):
+        """将 systemd 属性归纳为 running/stopped/failed/not_found/unknown"""
+        if props.get('LoadState') == 'not-found':
+            return 'not_found'
+        active = props.get('ActiveState')
+        if active == 'active':
+            return 'running' if props.get('SubState') in ('running', 'exited', 'listening') else 'unknown'
+        if active == 'inactive':
+            return 'stopped'
+        if active == 'failed':
+            return 'failed'
+        return 'unknown'
+
+    @classmethod
+    def query_services(cls, service_names, timeout=5, use_cache=True):
+        """一次 systemctl show 调用批量查询全部服务单元状态"""
+        units = [cls._unit_name(name) for name in service_names]
+        now = time.monotonic()
+        missing = [unit for unit in units
+                   if not use_cache or now - cls._unit_cache_time.get(unit, 0) > cls.UNIT_CACHE_TTL]
+
+        if missing:
+            output = subprocess.check_output(
+                ['systemctl', 'show', '--no-pager',
+                 '--property=Id,LoadState,ActiveState,SubState,MainPID', *missing],
+                stderr=subprocess.STDOUT, timeout=timeout
+            ).decode('utf-8', errors='ignore')
+            blocks = cls._parse_systemctl_show(output)
+            if len(blocks) != len(missing):
+                raise RuntimeError(f"systemctl show returned {len(blocks)} units, expected {len(missing)}")
+            # systemctl show 按参数顺序输出，别名单元（如 sshd -> ssh）的 Id 可能与请求名不同
+            for unit, props in zip(missing, blocks):
+                cls._unit_cache[unit] = {
+                    'unit': props.get('Id', unit),
+                    'status': cls._unit_status(props),
+                    'load_state': props.get('LoadState'),
+                    'active_state': props.get('ActiveState'),
+                    'sub_state': props.get('SubState'),
+                    'main_pid': int(props.get('MainPID') or 0)
+                }
+                cls._unit_cache_time[unit] = now
+
+        return {name: cls._unit_cache[unit] for name, unit in zip(service_names, units)}
+
+    @classmethod
+    def check_services(cls, service_names, timeout=5):
+        """批量检查服务状态，返回 {服务名: 状态}"""
+        if platform.system() == 'Linux':
+            try:
+                return {name: info['status'] for name, info in cls.query_services(service_names, timeout).items()}
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, RuntimeError, OSError) as e:
+                logger.warning(f"Batched systemd query failed, falling back to per-service checks: {str(e)}")
+        return {name: cls.check_service(name, timeout=timeout) for name in service_names}
+
+    @classmethod
+    def check_service(cls, service_name, timeout=5):
         """检查服务状态"""
         try:
             if platform.system() == 'Linux':
-                output = subprocess.check_output(['systemctl', 'status', service_name], stderr=subprocess.STDOUT)
-                output = output.decode('utf-8')
-                if 'active (running)' in output:
-                    return 'running'
-                elif 'inactive (dead)' in output:
-                    return 'stopped'
-                else:
-                    return 'unknown'
+                return cls.query_services([service_name], timeout)[service_name]['status']
             elif platform.system() == 'Windows':
-                output = subprocess.check_output(['sc', 'query', service_name], stderr=subprocess.STDOUT)
+                output = subprocess.check_output(['sc', 'query', service_name], stderr=subprocess.STDOUT,
+                                                 timeout=timeout)
                 output = output.decode('utf-8')
                 if 'RUNNING' in output:
                     return 'running'
@@ -197,14 +281,37 @@ class ServiceInspector:
                 return 'unsupported'
         except subprocess.CalledProcessError:
             return 'not_found'
-
-    @staticmethod
-    def check_process(process_name):
+        except subprocess.TimeoutExpired:
+            return 'timeout'
+        except (RuntimeError, OSError) as e:
+            # 批量查询失败后的逐个回退也可能失败（如 systemctl 不可用），不能中断整个巡检
+            logger.warning(f"Failed to check service {service_name}: {str(e)}")
+            return 'error'
+
+    # 进程表快照，同一周期内的多次进程查询共用一次 /proc 遍历
+    _process_table = None
+    _process_table_lock = threading.Lock()
+    PROCESS_TABLE_TTL = 1.0
+
+    @classmethod
+    def process_table(cls):
+        """返回不超过 PROCESS_TABLE_TTL 秒的进程表快照"""
+        with cls._process_table_lock:
+            table = cls._process_table
+            if table is None or time.monotonic() - table.timestamp > cls.PROCESS_TABLE_TTL:
+                table = cls._process_table = ProcessTable.scan()
+            return table
+
+    @classmethod
+    def check_process(cls, process_name):
         """检查进程是否存在"""
-        for proc in psutil.process_iter(['name']):
-            if proc.info['name'] == process_name:
-                return True
-        return False
+        return cls.process_table().has_name(process_name)
+
+    @classmethod
+    def check_processes(cls, process_names):
+        """批量检查进程是否存在，返回 {进程名: 是否存在}"""
+        table = cls.process_table()
+        return {name: table.has_name(name) for name in process_names}
 
     @staticmethod
     def check_cron_jobs():
@@ -230,6 +337,77 @@ class ServiceInspector:
         return jobs
 
 
+class LogTailReader:
+    """从文件末尾按固定大小块反向读取日志，内存占用与日志大小无关"""
+
+    ROTATED_PATTERN = re.compile(r'\.(\d+)(\.gz)?$')
+
+    def __init__(self, block_size=64 * 1024, encoding='utf-8'):
+        self.block_size = block_size
+        self.encoding = encoding
+
+    def iter_reverse_lines(self, log_file):
+        """从最后一行开始逐行向前惰性产出（保留行尾换行符）"""
+        with open(log_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            buffer = b''
+            while position > 0:
+                read_size = min(self.block_size, position)
+                position -= read_size
+                f.seek(position)
+                buffer = f.read(read_size) + buffer
+                end = len(buffer)
+                # 最后一个字节可能是本行的换行符，查找时排除它；找不到换行说明行首还在前一个块中
+                while True:
+                    index = buffer.rfind(b'\n', 0, end - 1)
+                    if index == -1:
+                        break
+                    yield buffer[index + 1:end].decode(self.encoding, errors='replace')
+                    end = index + 1
+                buffer = buffer[:end]
+            if buffer:
+                yield buffer.decode(self.encoding, errors='replace')
+
+    def rotated_files(self, log_file):
+        """按从新到旧的顺序列出轮转文件，如 syslog.1、syslog.2.gz"""
+        rotated = []
+        for path in glob.glob(glob.escape(log_file) + '.*'):
+            match = self.ROTATED_PATTERN.search(path[len(log_file):])
+            if match and path[len(log_file):] == match.group(0):
+                rotated.append((int(match.group(1)), path))
+        return [path for _, path in sorted(rotated)]
+
+    def _tail_gzip(self, log_file, n):
+        """gzip 无法从末尾定位，流式解压并只保留最后 n 行"""
+        with gzip.open(log_file, 'rt', encoding=self.encoding, errors='replace') as f:
+            return deque(f, maxlen=n)
+
+    def tail(self, log_file, n=100, include_rotated=True):
+        """返回最后 n 行（按时间顺序），当前文件不足 n 行时继续读取轮转文件"""
+        collected = []
+        for line in self.iter_reverse_lines(log_file):
+            if len(collected) >= n:
+                break
+            collected.append(line)
+
+        if include_rotated:
+            for rotated in self.rotated_files(log_file):
+                remaining = n - len(collected)
+                if remaining <= 0:
+                    break
+                if rotated.endswith('.gz'):
+                    collected.extend(reversed(self._tail_gzip(rotated, remaining)))
+                else:
+                    for line in self.iter_reverse_lines(rotated):
+                        if len(collected) >= n:
+                            break
+                        collected.append(line)
+
+        collected.reverse()
+        return collected
+
+
 class LogInspector:
     """日志检查"""
 
@@ -237,8 +415,7 @@ class LogInspector:
     def analyze_log_file(log_file, pattern=None, last_n_lines=100):
         """分析日志文件"""
         try:
-            with open(log_file, 'r') as f:
-                lines = f.readlines()[-last_n_lines:]
+            lines = LogTailReader().tail(log_file, last_n_lines)
 
             if pattern:
                 matches = [line for line in lines if re.search(pattern, line)]
@@ -252,32 +429,35 @@ class LogInspector:
     def check_error_logs(log_file, error_keywords=['error', 'fail', 'exception', 'critical'], last_n_lines=500):
         """检查错误日志"""
         try:
-            with open(log_file, 'r') as f:
-                lines = f.readlines()[-last_n_lines:]
+            lines = LogTailReader().tail(log_file, last_n_lines)
 
-            errors = []
-            for line in lines:
-                for keyword in error_keywords:
-                    if keyword.lower() in line.lower():
-                        errors.append(line.strip())
-                        break
-            return errors
+            matcher = MultiPatternMatcher(error_keywords, ignore_case=True, literal=True)
+            return [line.strip() for line in lines if matcher.search(line)]
         except Exception as e:
             logger.error(f"Error checking error logs in {log_file}: {str(e)}")
             return []
 
     @staticmethod
-    def count_log_entries(log_file, pattern, time_range='1d'):
-        """统计日志条目"""
+    def count_log_entries(log_file, pattern, time_range='1d', checkpoint_file=None):
+        """统计日志条目；指定检查点文件时只扫描新增内容并累加到历史计数"""
         try:
-            with open(log_file, 'r') as f:
-                lines = f.readlines()
+            regex = re.compile(pattern)
+            if checkpoint_file:
+                store = LogCheckpointStore(checkpoint_file)
+                key = f"{os.path.abspath(log_file)}::{pattern}"
+                totals = store.aggregates(log_file, key=key)
+                # 这里可以添加时间范围过滤逻辑
+                totals['count'] = totals.get('count', 0) + sum(
+                    1 for line in store.read_new_lines(log_file, key=key) if regex.search(line))
+                store.save()
+                return totals['count']
 
             count = 0
-            for line in lines:
-                if re.search(pattern, line):
-                    # 这里可以添加时间范围过滤逻辑
-                    count += 1
+            with open(log_file, 'r') as f:
+                for line in f:
+                    if regex.search(line):
+                        # 这里可以添加时间范围过滤逻辑
+                        count += 1
             return count
         except Exception as e:
             logger.error(f"Error counting log entries in {log_file}: {str(e)}")
@@ -306,9 +486,11 @@ class PerformanceMonitor:
 
         while time.time() < end_time:
             timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-            cpu = psutil.cpu_percent(interval=1)
-            mem = psutil.virtual_memory().percent
-            disk_io = psutil.disk_io_counters()
+            # 读取共享指标缓存，与其它检查使用同一份采样
+            snapshot = get_host_metrics().latest()
+            cpu = snapshot['cpu_percent']
+            mem = snapshot['memory'].percent
+            disk_io = snapshot['disk_io']
 
             self.data['timestamp'].append(timestamp)
             self.data['cpu_usage'].append(cpu)
@@ -425,11 +607,11 @@ class SecurityInspector:
         """检查防火墙状态"""
         try:
             if platform.system() == 'Linux':
-                output = subprocess.check_output(['iptables', '-L'], stderr=subprocess.STDOUT)
+                output = subprocess.check_output(['iptables', '-L'], stderr=subprocess.STDOUT, timeout=5)
                 return output.decode('utf-8')
             elif platform.system() == 'Windows':
                 output = subprocess.check_output(['netsh', 'advfirewall', 'show', 'allprofiles'],
-                                                 stderr=subprocess.STDOUT)
+                                                 stderr=subprocess.STDOUT, timeout=5)
                 return output.decode('utf-8')
             else:
                 return "Unsupported system"
@@ -437,6 +619,118 @@ class SecurityInspector:
             return f"Error checking firewall: {str(e)}"
 
 
+class CollectorEngine:
+    """并行采集引擎：每个检查项作为独立任务在有界线程池中运行，带单项超时和全局时间预算"""
+
+    def __init__(self, max_workers=16, check_timeout=1.8, total_budget=2.0):
+        self.max_workers = max_workers
+        self.check_timeout = check_timeout
+        self.total_budget = total_budget
+        self.tasks = []
+
+    def add(self, key, func, *args, timeout=None, default=None, **kwargs):
+        """注册检查任务，key 为字符串或 (分组, 子项) 元组"""
+        self.tasks.append({
+            'key': key,
+            'func': func,
+            'args': args,
+            'kwargs': kwargs,
+            'timeout': timeout if timeout is not None else self.check_timeout,
+            'default': default
+        })
+
+    @staticmethod
+    def _store(data, key, value):
+        """按 key 写入结果，元组 key 写入对应分组的字典"""
+        if isinstance(key, tuple):
+            data.setdefault(key[0], {})[key[1]] = value
+        else:
+            data[key] = value
+
+    def run(self):
+        """运行全部任务，返回 (采集数据, 每项执行状态)"""
+        data = {}
+        stats = {}
+        start = time.monotonic()
+        budget_deadline = start + self.total_budget
+
+        # 线程无法被强制终止：检查在守护线程中运行，超时的任务在后台自然结束、结果直接丢弃，
+        # 卡住的检查也不会在报告写完后阻止解释器退出
+        work = queue.Queue()
+        pending = {}
+        # 单项超时从工作线程开始执行该检查时计时，排队中的检查只受全局时间预算限制
+        started = {}
+        for task in self.tasks:
+            future = Future()
+            work.put((future, task))
+            pending[future] = task
+        for _ in range(min(self.max_workers, len(self.tasks))):
+            threading.Thread(target=self._worker, args=(work, started), daemon=True).start()
+
+        try:
+            while pending:
+                now = time.monotonic()
+                # 先处理已超过截止时间的任务
+                wake = budget_deadline
+                for future, task in list(pending.items()):
+                    begun = started.get(future)
+                    deadline = budget_deadline if begun is None else min(begun + task['timeout'], budget_deadline)
+                    if not future.done() and now >= deadline:
+                        future.cancel()
+                        self._store(data, task['key'], task['default'])
+                        stats[str(task['key'])] = {'status': 'timeout',
+                                                   'elapsed': round(now - (begun or start), 3)}
+                        logger.warning(f"Check {task['key']} exceeded its time limit")
+                        del pending[future]
+                        continue
+                    # 尚未开始的任务最早在 now + timeout 超时，到时重新计算
+                    wake = min(wake, deadline, (begun or now) + task['timeout'])
+                if not pending:
+                    break
+
+                done, _ = wait(list(pending), timeout=max(0, wake - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = pending.pop(future)
+                    try:
+                        value, elapsed = future.result()
+                        self._store(data, task['key'], value)
+                        stats[str(task['key'])] = {'status': 'ok', 'elapsed': round(elapsed, 3)}
+                    except Exception as e:
+                        self._store(data, task['key'], task['default'])
+                        stats[str(task['key'])] = {'status': 'error', 'error': str(e)}
+                        logger.error(f"Check {task['key']} failed: {str(e)}")
+        finally:
+            # 尚未开始的任务不再执行
+            for future in pending:
+                future.cancel()
+
+        logger.info(f"Collected {len(self.tasks)} checks in {time.monotonic() - start:.2f} seconds")
+        return data, stats
+
+    @classmethod
+    def _worker(cls, work, started):
+        """守护工作线程：依次取任务执行并记录开始时间，队列为空时退出"""
+        while True:
+            try:
+                future, task = work.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            started[future] = time.monotonic()
+            try:
+                future.set_result(cls._timed_call(task))
+            except BaseException as e:
+                future.set_exception(e)
+
+    @staticmethod
+    def _timed_call(task):
+        """执行单个任务并记录耗时"""
+        begin = time.monotonic()
+        value = task['func'](*task['args'], **task['kwargs'])
+        return value, time.monotonic() - begin
+
+
 class ReportGenerator:
     """报告生成"""
 
@@ -622,6 +916,12 @@ def parse_arguments():
                         help='Duration for performance monitoring (seconds)')
     parser.add_argument('--interval', type=int, default=5,
                         help='Interval for performance monitoring (seconds)')
+    parser.add_argument('--workers', type=int, default=16,
+                        help='Number of parallel collector threads')
+    parser.add_argument('--check-timeout', type=float, default=1.8,
+                        help='Timeout for each individual check (seconds)')
+    parser.add_argument('--budget', type=float, default=2.0,
+                        help='Global time budget for the whole collection (seconds)')
     return parser.parse_args()
 
 
@@ -630,46 +930,49 @@ def main():
     args = parse_arguments()
     logger.info("Starting system inspection")
 
-    # 收集数据
-    data = {}
+    # 收集数据：所有检查项并行执行
+    engine = CollectorEngine(max_workers=args.workers, check_timeout=args.check_timeout, total_budget=args.budget)
 
     # 系统信息
-    data['system_info'] = SystemInspector.get_system_info()
-    data['cpu_info'] = SystemInspector.get_cpu_info()
-    data['memory_info'] = SystemInspector.get_memory_info()
-    data['disk_info'] = SystemInspector.get_disk_info()
+    engine.add('system_info', SystemInspector.get_system_info, default={})
+    engine.add('cpu_info', SystemInspector.get_cpu_info, default={})
+    engine.add('memory_info', SystemInspector.get_memory_info, default={})
+    engine.add('disk_info', SystemInspector.get_disk_info, default={})
 
     # 网络信息
-    data['network_info'] = NetworkInspector.get_network_info()
-    data['connectivity'] = NetworkInspector.check_connectivity()
-    data['port_status'] = NetworkInspector.check_ports(ports=[22, 80, 443, 3306, 5432, 6379])
-    data['connections'] = NetworkInspector.get_connections()
+    engine.add('network_info', NetworkInspector.get_network_info, default=[])
+    engine.add('connectivity', lambda: NetworkInspector.check_connectivity(timeout=args.check_timeout), default=False)
+    ports = [22, 80, 443, 3306, 5432, 6379]
+    engine.add('port_status', NetworkInspector.check_ports, ports=ports, default={port: 'unknown' for port in ports})
+    engine.add('connections', NetworkInspector.get_connections, default=[])
 
     # 服务检查
     services = ['sshd', 'nginx', 'mysql', 'postgresql', 'redis'] if platform.system() == 'Linux' else ['MySQL',
                                                                                                        'MSSQLSERVER']
-    data['service_status'] = {service: ServiceInspector.check_service(service) for service in services}
-    data['process_status'] = {
-        'python': ServiceInspector.check_process('python'),
-        'java': ServiceInspector.check_process('java')
-    }
-    data['cron_jobs'] = ServiceInspector.check_cron_jobs()
+    engine.add('service_status', lambda: ServiceInspector.check_services(services, timeout=args.check_timeout),
+               default={service: 'timeout' for service in services})
+    engine.add('process_status', ServiceInspector.check_processes, ['python', 'java'],
+               default={'python': False, 'java': False})
+    engine.add('cron_jobs', ServiceInspector.check_cron_jobs, default=[])
 
     # 日志检查
     if platform.system() == 'Linux':
-        data['error_logs'] = LogInspector.check_error_logs('/var/log/syslog')
+        engine.add('error_logs', LogInspector.check_error_logs, '/var/log/syslog', default=[])
     elif platform.system() == 'Windows':
         log_path = 'C:\\Windows\\System32\\LogFiles\\AppEvent.evt'
         if os.path.exists(log_path):
-            data['error_logs'] = LogInspector.check_error_logs(log_path)
+            engine.add('error_logs', LogInspector.check_error_logs, log_path, default=[])
         else:
             logger.warning(f"Log file not found: {log_path}")
-            data['error_logs'] = []
 
     # 安全检查
-    data['sudoers'] = SecurityInspector.check_sudoers()
-    data['ssh_config'] = SecurityInspector.check_ssh_config()
-    data['firewall_status'] = SecurityInspector.check_firewall()
+    engine.add('sudoers', SecurityInspector.check_sudoers, default='')
+    engine.add('ssh_config', SecurityInspector.check_ssh_config, default='')
+    engine.add('firewall_status', SecurityInspector.check_firewall, default='')
+
+    data, collector_stats = engine.run()
+    data['collector_stats'] = collector_stats
+    data.setdefault('error_logs', [])
 
     # 性能监控
     if args.mode == 'performance':